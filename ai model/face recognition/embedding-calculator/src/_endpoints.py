@@ -11,6 +11,7 @@
 #  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
+from http import HTTPStatus
 from typing import List, Optional
 
 from flask import request
@@ -19,44 +20,51 @@ from werkzeug.exceptions import BadRequest
 
 from src.constants import ENV
 from src.exceptions import NoFaceFoundError
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.facescan.camerasession.camerasession import camera_sessions
+from src.services.facescan.detection_cache import detection_cache
+from src.services.facescan.detection_options import DetectionOptions
 from src.services.facescan.plugins import base, managers
+from src.services.facescan.plugins.cascade import escalation_stats
+from src.services.facescan.plugins.residency import model_residency
 from src.services.facescan.scanner.facescanners import scanner
 from src.services.flask_.constants import ARG
 from src.services.flask_.needs_attached_file import needs_attached_file
+from src.services.flask_.parse_request_arg import parse_boxes, parse_request_number_arg
 from src.services.imgtools.read_img import read_img
+from src.services.memory.governor import memory_governor
+from src.services.tracing.spans import span
 from src.services.utils.pyutils import Constants
 from src.services.imgtools.test.files import IMG_DIR
 import base64
 from src.constants import SKIPPED_PLUGINS
 
 
-class FaceDetection(object):
-    SKIPPING_FACE_DETECTION = False
-
-
-def face_detection_skip_check(face_plugins):
-    if request.values.get("detect_faces") == "false":
-        FaceDetection.SKIPPING_FACE_DETECTION = True
-        restricted_plugins = [plugin for plugin in face_plugins if plugin.name not in SKIPPED_PLUGINS]
-        return restricted_plugins
-    else:
-        return face_plugins
-
-
 def endpoints(app):
     @app.before_first_request
     def init_model() -> None:
         detector = managers.plugin_manager.detector
         face_plugins = managers.plugin_manager.face_plugins
-        face_plugins = face_detection_skip_check(face_plugins)
+        if ENV.PLUGINS_LAZY_LOAD:
+            # models of other plugins are loaded by their first request
+            face_plugins = [managers.plugin_manager.calculator]
+        options = _get_detection_options()
         detector(
             img=read_img(str(IMG_DIR / 'einstein.jpeg')),
             det_prob_threshold=_get_det_prob_threshold(),
-            face_plugins=face_plugins
+            face_plugins=_skip_detection_plugins(face_plugins, options),
+            options=options
         )
         print("Starting to load ML models")
         return None
 
+    @app.after_request
+    def evict_models(response):
+        if model_residency.enabled:
+            # unloading, garbage collection and trimming run after the response is sent
+            response.call_on_close(_evict_models)
+        return response
+
     @app.route('/healthcheck')
     def healthcheck():
         return jsonify(
@@ -67,12 +75,19 @@ def endpoints(app):
     def status_get():
         available_plugins = {p.slug: str(p)
                              for p in managers.plugin_manager.plugins}
+        replica_pools = {p.slug: p.replica_pool.stats()
+                         for p in managers.plugin_manager.pooled_plugins}
         calculator = managers.plugin_manager.calculator
         return jsonify(
             status='OK', build_version=ENV.BUILD_VERSION,
             calculator_version=str(calculator),
             similarity_coefficients=calculator.ml_model.similarity_coefficients,
-            available_plugins=available_plugins
+            available_plugins=available_plugins,
+            replica_pools=replica_pools,
+            detection_cache=detection_cache.stats(),
+            detector_cascade=escalation_stats.stats(),
+            plugin_models=model_residency.stats(),
+            memory=memory_governor.stats()
         )
 
     @app.route('/find_faces_base64', methods=['POST'])
@@ -81,17 +96,23 @@ def endpoints(app):
         face_plugins = managers.plugin_manager.filter_face_plugins(
             _get_face_plugin_names()
         )
-        face_plugins = face_detection_skip_check(face_plugins)
-        rawfile = base64.b64decode(request.get_json()["file"])
+        options = _get_detection_options()
+        face_plugins = _skip_detection_plugins(face_plugins, options)
+        limit = _get_limit()
+        with span('parse_request'):
+            rawfile = base64.b64decode(request.get_json()["file"])
 
-        faces = detector(
+        faces = detector.run_batch(
             img=read_img(rawfile),
             det_prob_threshold=_get_det_prob_threshold(),
-            face_plugins=face_plugins
+            face_plugins=face_plugins,
+            regions=_get_regions_of_interest(),
+            options=options,
+            limit=limit,
+            img_key=detection_cache.get_key(rawfile)
         )
         plugins_versions = {p.slug: str(p) for p in [detector] + face_plugins}
-        faces = _limit(faces, request.values.get(ARG.LIMIT))
-        FaceDetection.SKIPPING_FACE_DETECTION = False
+        faces = _limit(faces, limit)
         return jsonify(plugins_versions=plugins_versions, result=faces)
 
     @app.route('/find_faces', methods=['POST'])
@@ -101,28 +122,86 @@ def endpoints(app):
         face_plugins = managers.plugin_manager.filter_face_plugins(
             _get_face_plugin_names()
         )
-        face_plugins = face_detection_skip_check(face_plugins)
-        faces = detector(
-            img=read_img(request.files['file']),
+        options = _get_detection_options()
+        face_plugins = _skip_detection_plugins(face_plugins, options)
+        limit = _get_limit()
+        file_bytes = request.files['file'].read()
+        faces = detector.run_batch(
+            img=read_img(file_bytes),
             det_prob_threshold=_get_det_prob_threshold(),
-            face_plugins=face_plugins
+            face_plugins=face_plugins,
+            regions=_get_regions_of_interest(),
+            options=options,
+            limit=limit,
+            img_key=detection_cache.get_key(file_bytes)
         )
         plugins_versions = {p.slug: str(p) for p in [detector] + face_plugins}
-        faces = _limit(faces, request.values.get(ARG.LIMIT))
-        FaceDetection.SKIPPING_FACE_DETECTION = False
+        faces = _limit(faces, limit)
         return jsonify(plugins_versions=plugins_versions, result=faces)
 
+    @app.route('/camera_sessions', methods=['POST'])
+    def camera_sessions_post():
+        session = camera_sessions.open()
+        return jsonify(session_id=session.session_id), HTTPStatus.CREATED
+
+    @app.route('/camera_sessions/<session_id>', methods=['DELETE'])
+    def camera_session_delete(session_id):
+        camera_sessions.close(session_id)
+        return '', HTTPStatus.NO_CONTENT
+
+    @app.route('/camera_sessions/<session_id>/find_faces', methods=['POST'])
+    @needs_attached_file
+    def camera_session_find_faces_post(session_id):
+        session = camera_sessions.get(session_id)
+        detector = managers.plugin_manager.detector
+        face_plugins = managers.plugin_manager.filter_face_plugins(
+            _get_face_plugin_names()
+        )
+        options = _get_detection_options()
+        face_plugins = _skip_detection_plugins(face_plugins, options)
+        img = read_img(request.files['file'])
+        limit = _get_limit()
+        # the session keeps tracking every face, so the limit is applied only to the response
+        with session.lock:
+            regions = session.detection_regions(img)
+            faces = detector.run_batch(
+                img=img,
+                det_prob_threshold=_get_det_prob_threshold(),
+                face_plugins=face_plugins,
+                regions=regions,
+                options=options
+            )
+            session.update(faces.to_boxes(), regions)
+        # the frame is not needed for the response
+        del img
+        plugins_versions = {p.slug: str(p) for p in [detector] + face_plugins}
+        # frames without faces are usual for a camera, so they are not an error
+        faces = _limit(faces, limit) if faces else faces
+        return jsonify(plugins_versions=plugins_versions, full_frame_detection=regions is None, result=faces)
+
     @app.route('/scan_faces', methods=['POST'])
     @needs_attached_file
     def scan_faces_post():
-        faces = scanner.scan(
-            img=read_img(request.files['file']),
-            det_prob_threshold=_get_det_prob_threshold()
+        limit = _get_limit()
+        file_bytes = request.files['file'].read()
+        faces = scanner.scan_batch(
+            img=read_img(file_bytes),
+            det_prob_threshold=_get_det_prob_threshold(),
+            options=_get_detection_options(),
+            regions=_get_regions_of_interest(),
+            limit=limit,
+            img_key=detection_cache.get_key(file_bytes)
         )
-        faces = _limit(faces, request.values.get(ARG.LIMIT))
+        faces = _limit(faces, limit)
         return jsonify(calculator_version=scanner.ID, result=faces)
 
 
+def _evict_models():
+    pinned = (managers.plugin_manager.detector, managers.plugin_manager.calculator)
+    if model_residency.evict(memory_governor.rss_mb, pinned):
+        memory_governor.trim()
+
+
 def _get_det_prob_threshold():
     det_prob_threshold_val = request.values.get(ARG.DET_PROB_THRESHOLD)
     if det_prob_threshold_val is None:
@@ -133,6 +212,37 @@ def _get_det_prob_threshold():
     return det_prob_threshold
 
 
+def _get_detection_options() -> DetectionOptions:
+    """ Clients may only lower the detection cost below server-side settings """
+    max_image_side = parse_request_number_arg(ARG.MAX_IMAGE_SIDE, int, ENV.IMG_LENGTH_MIN,
+                                              ENV.IMG_LENGTH_LIMIT, request)
+    min_face_size = parse_request_number_arg(ARG.MIN_FACE_SIZE, int, ENV.FACE_MIN_SIZE, float('inf'), request)
+    pyramid_scale_factor = parse_request_number_arg(ARG.PYRAMID_SCALE_FACTOR, float, ENV.PYRAMID_SCALE_FACTOR_MIN,
+                                                    ENV.PYRAMID_SCALE_FACTOR, request)
+    tile_size = parse_request_number_arg(ARG.TILE_SIZE, int, ENV.IMG_LENGTH_MIN, ENV.IMG_LENGTH_LIMIT, request)
+    tile_size = tile_size or ENV.TILE_SIZE or None
+    tile_overlap = parse_request_number_arg(ARG.TILE_OVERLAP, int, 0, (tile_size or 0) // 2, request)
+    if tile_overlap is None:
+        tile_overlap = min(ENV.TILE_OVERLAP, (tile_size or 0) // 2)
+    return DetectionOptions(max_image_side=max_image_side, min_face_size=min_face_size,
+                            pyramid_scale_factor=pyramid_scale_factor,
+                            tile_size=tile_size,
+                            tile_overlap=tile_overlap,
+                            skip_detection=request.values.get(ARG.DETECT_FACES) == 'false')
+
+
+def _get_regions_of_interest() -> Optional[List[BoundingBoxDTO]]:
+    """ Parts of the image where faces are searched, the whole image if not given """
+    return parse_boxes(ARG.ROI, request.values.getlist(ARG.ROI))
+
+
+def _skip_detection_plugins(face_plugins: List[base.BasePlugin], options: DetectionOptions) -> List[base.BasePlugin]:
+    """ Plugins relying on detected landmarks are useless without detection """
+    if not options.skip_detection:
+        return face_plugins
+    return [plugin for plugin in face_plugins if plugin.name not in SKIPPED_PLUGINS]
+
+
 def _get_face_plugin_names() -> Optional[List[str]]:
     if ARG.FACE_PLUGINS not in request.values:
         return []
@@ -141,6 +251,25 @@ def _get_face_plugin_names() -> Optional[List[str]]:
     ]
 
 
+def _get_limit() -> int:
+    """ Validated before detection, so that plugins run only on the faces to be returned """
+    return _parse_limit(request.values.get(ARG.LIMIT))
+
+
+def _parse_limit(limit: str = None) -> int:
+    """
+    >>> _parse_limit(None), _parse_limit(''), _parse_limit('2')
+    (0, 0, 2)
+    """
+    try:
+        limit = int(limit or 0)
+    except ValueError as e:
+        raise BadRequest('Limit format is invalid (limit >= 0)') from e
+    if not (limit >= 0):
+        raise BadRequest('Limit value is invalid (limit >= 0)')
+    return limit
+
+
 def _limit(faces: List, limit: str = None) -> List:
     """
     >>> _limit([1, 2, 3], None)
@@ -157,11 +286,5 @@ def _limit(faces: List, limit: str = None) -> List:
     if len(faces) == 0:
         raise NoFaceFoundError
 
-    try:
-        limit = int(limit or 0)
-    except ValueError as e:
-        raise BadRequest('Limit format is invalid (limit >= 0)') from e
-    if not (limit >= 0):
-        raise BadRequest('Limit value is invalid (limit >= 0)')
-
+    limit = _parse_limit(limit)
     return faces[:limit] if limit else faces
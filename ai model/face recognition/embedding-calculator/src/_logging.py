@@ -12,12 +12,17 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
+import copy
 import json
 import logging
 import os
+import queue
+import random
 import sys
 import traceback
 import warnings
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List
 
 from yaml import YAMLLoadWarning
 
@@ -26,14 +31,20 @@ from src.services.flask_.logging_context import FlaskRequestContextAdder, reques
 
 
 def init_logging(level):
+    log_format = '%(output)s'
     stream_handler = logging.StreamHandler()
-    stream_handler.addFilter(FlaskRequestContextAdder())
+    stream_handler.setFormatter(logging.Formatter(log_format))
     stream_handler.addFilter(TextFormatter() if ENV.IS_DEV_ENV else JSONFormatter())
+    handler = BackgroundQueueHandler(stream_handler) if ENV.LOGGING_QUEUE else stream_handler
+    handler.addFilter(FlaskRequestContextAdder())
+    sample_rates = parse_sample_rates(ENV.LOGGING_SAMPLE_RATES)
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
     # noinspection PyArgumentList
     logging.basicConfig(level=level,
-                        format='%(output)s',
+                        format=log_format,
                         datefmt='%Y-%m-%d %H:%M:%S',
-                        handlers=[stream_handler])
+                        handlers=[handler])
     _set_logging_levels()
 
 
@@ -45,25 +56,132 @@ class TextFormatter(logging.Filter):
 
         metadata_elements = request, logger, module
         metadata = f"[{' '.join(str(k) for k in metadata_elements if k)}]"
-        record.output = f'[{record.levelname}] {record.msg} {metadata}'
+        record.output = f'[{record.levelname}] {record.getMessage()} {metadata}'
         return True
 
 
 class JSONFormatter(logging.Filter):
     def filter(self, record):
-        traceback_str = traceback.format_exc()
         record.output = json.dumps({
             'severity': record.levelname,
-            'message': record.msg,
+            'message': record.getMessage(),
             'request': getattr(record, 'request_dict', None),
             'logger': record.name,
             'module': record.module,
-            'traceback': traceback_str if sys.exc_info() != (None, None, None) else None,
+            'traceback': _format_active_exception(record),
             'build_version': ENV.BUILD_VERSION
         })
         return True
 
 
+def _format_active_exception(record):
+    """
+    Traceback of the exception being handled when the record was logged, formatted only if there is one
+    >>> record = logging.makeLogRecord({})
+    >>> _format_active_exception(record) is None
+    True
+    >>> try:
+    ...     raise ValueError('error')
+    ... except ValueError:
+    ...     _format_active_exception(record).splitlines()[-1]
+    'ValueError: error'
+    """
+    exc_info = getattr(record, 'active_exc_info', None) or sys.exc_info()
+    if exc_info[0] is None:
+        return None
+    return ''.join(traceback.format_exception(*exc_info))
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Hands records to a listener thread, which formats them and writes them with `handlers`,
+    so that request threads only build the message.
+    uWSGI forks workers after the app is loaded, so the thread is started by the process that logs.
+    """
+
+    def __init__(self, *handlers: logging.Handler):
+        super().__init__(queue.SimpleQueue())
+        self._handlers = handlers
+        self._listener = None
+        self._pid = None
+
+    def _start_listener(self):
+        # the queue of a parent process may have been locked by its listener at the moment of the fork
+        self.queue = queue.SimpleQueue()
+        self._listener = QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+        self._listener.start()
+        self._pid = os.getpid()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if sys.exc_info()[0] is not None:
+            record.active_exc_info = sys.exc_info()
+        return record
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def close(self):
+        """ Called by `logging.shutdown` at exit, writes the records left in the queue """
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+        super().close()
+
+
+def parse_sample_rates(values: List[str]) -> Dict[str, float]:
+    """
+    >>> parse_sample_rates(['src.services.facenet=0.01', 'PIL=0'])
+    {'src.services.facenet': 0.01, 'PIL': 0.0}
+    >>> parse_sample_rates([])
+    {}
+    """
+    sample_rates = {}
+    for value in values:
+        logger_name, _, rate = value.rpartition('=')
+        if not logger_name or not 0 <= float(rate) <= 1:
+            raise ValueError(f"Logging sample rate '{value}' is not 'logger=rate' with rate between 0 and 1")
+        sample_rates[logger_name] = float(rate)
+    return sample_rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a `rate` share of debug records of the configured loggers and their children,
+    records of higher levels are always kept.
+    >>> sampling_filter = SamplingFilter({'a': 0.0, 'a.b': 1.0})
+    >>> def record(name, level=logging.DEBUG): return logging.makeLogRecord(dict(name=name, levelno=level))
+    >>> [sampling_filter.filter(record(name)) for name in ('a', 'a.c', 'a.b.c', 'ab')]
+    [False, False, True, True]
+    >>> sampling_filter.filter(record('a', logging.INFO))
+    True
+    """
+
+    def __init__(self, sample_rates: Dict[str, float]):
+        super().__init__()
+        self._sample_rates = sample_rates
+        self._logger_rates = {}
+
+    def _get_rate(self, logger_name: str) -> float:
+        rate = self._logger_rates.get(logger_name)
+        if rate is None:
+            name = logger_name
+            while name not in self._sample_rates and '.' in name:
+                name = name.rpartition('.')[0]
+            rate = self._logger_rates[logger_name] = self._sample_rates.get(name, 1.0)
+        return rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._get_rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
 def _set_logging_levels():
     logging.getLogger('PIL').setLevel(logging.INFO)
     logging.getLogger('werkzeug').setLevel(logging.ERROR)
@@ -27,6 +27,9 @@ from src.services.flask_.disable_caching import disable_caching
 from src.services.flask_.error_handling import add_error_handling
 from src.services.flask_.json_encoding import add_json_encoding
 from src.services.flask_.log_response import log_http_response
+from src.services.flask_.profile_request import add_profiling
+from src.services.flask_.trace_request import add_tracing
+from src.services.memory.governor import govern_memory
 
 logger = logging.getLogger(__name__)
 
@@ -40,9 +43,12 @@ def create_app(add_endpoints_fun: Union[Callable, None] = None, do_add_docs: boo
     app = Flask('embedding-calculator')
     app.url_map.strict_slashes = False
     add_error_handling(app)
+    add_tracing(app)
+    add_profiling(app)
     app.after_request(log_http_response)
     add_json_encoding(app)
     app.after_request(disable_caching)
+    app.after_request(govern_memory)
     if do_add_docs:
         add_docs(app)
     if add_endpoints_fun:
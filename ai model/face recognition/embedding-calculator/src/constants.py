@@ -22,21 +22,85 @@ _DEFAULT_SCANNER = 'Facenet2018'
 class ENV(Constants):
     ML_PORT = int(get_env('ML_PORT', '3000'))
     IMG_LENGTH_LIMIT = int(get_env('IMG_LENGTH_LIMIT', '640'))
+    IMG_LENGTH_MIN = int(get_env('IMG_LENGTH_MIN', '160'))
+    FACE_MIN_SIZE = int(get_env('FACE_MIN_SIZE', '20'))
+    PYRAMID_SCALE_FACTOR = float(get_env('PYRAMID_SCALE_FACTOR', '0.709'))
+    PYRAMID_SCALE_FACTOR_MIN = float(get_env('PYRAMID_SCALE_FACTOR_MIN', '0.3'))
 
     FACE_DETECTION_PLUGIN = get_env('FACE_DETECTION_PLUGIN', 'facenet.FaceDetector')
     CALCULATION_PLUGIN = get_env('CALCULATION_PLUGIN', 'facenet.Calculator')
     EXTRA_PLUGINS = get_env_split('EXTRA_PLUGINS', 'facenet.LandmarksDetector,agegender.AgeDetector,agegender.GenderDetector,facenet.facemask.MaskDetector,facenet.PoseEstimator')
 
     LOGGING_LEVEL_NAME = get_env('LOGGING_LEVEL_NAME', 'debug').upper()
+    # records are formatted and written by a background thread, request threads only enqueue them
+    LOGGING_QUEUE = get_env_bool('LOGGING_QUEUE', True)
+    # 'logger=rate' items, e.g. 'src.services.facescan.plugins.facenet.facenet=0.01' keeps 1% of its debug records
+    LOGGING_SAMPLE_RATES = get_env_split('LOGGING_SAMPLE_RATES', '')
     IS_DEV_ENV = get_env('FLASK_ENV', 'production') == 'development'
     BUILD_VERSION = get_env('APP_VERSION_STRING', 'dev')
 
     GPU_IDX = int(get_env('GPU_IDX', '-1'))
     INTEL_OPTIMIZATION = get_env_bool('INTEL_OPTIMIZATION')
+    MODEL_REPLICAS = int(get_env('MODEL_REPLICAS', '1'))
+    # models of extra plugins are loaded on their first request, idle ones are unloaded (0 - disabled)
+    PLUGINS_LAZY_LOAD = get_env_bool('PLUGINS_LAZY_LOAD', False)
+    MODEL_IDLE_TIMEOUT_S = float(get_env('MODEL_IDLE_TIMEOUT_S', '0'))
+    MODEL_EVICT_RSS_MB = float(get_env('MODEL_EVICT_RSS_MB', '0'))
+    # raw candidates of recently uploaded files (0 - disabled), for clients retrying with another
+    # det_prob_threshold; requests with det_prob_threshold below the floor are not cached
+    DETECTION_CACHE_SIZE = int(get_env('DETECTION_CACHE_SIZE', '0'))
+    DETECTION_CACHE_FLOOR = float(get_env('DETECTION_CACHE_FLOOR', '0.5'))
+    # insightface.CascadeFaceDetector runs the heavy model only when results of the light one are doubtful
+    CASCADE_HEAVY_MODEL = get_env('CASCADE_HEAVY_MODEL', 'retinaface_r50_v1')
+    CASCADE_AMBIGUOUS_MIN = float(get_env('CASCADE_AMBIGUOUS_MIN', '0.5'))
+    CASCADE_AMBIGUOUS_MAX = float(get_env('CASCADE_AMBIGUOUS_MAX', '0.95'))
+    CASCADE_SMALL_FACE_SIZE = int(get_env('CASCADE_SMALL_FACE_SIZE', '40'))
+    # 0 means tiled detection is disabled unless requested
+    TILE_SIZE = int(get_env('TILE_SIZE', '0'))
+    TILE_OVERLAP = int(get_env('TILE_OVERLAP', '128'))
+    # thread budget, 0 means CPU cores shared equally by all model replicas of all workers
+    UWSGI_PROCESSES = int(get_env('UWSGI_PROCESSES', '1'))
+    INTRA_OP_THREADS = int(get_env('INTRA_OP_THREADS', '0'))
+    INTER_OP_THREADS = int(get_env('INTER_OP_THREADS', '0'))
+    OMP_THREADS = int(get_env('OMP_THREADS', '0'))
+    CV2_THREADS = int(get_env('CV2_THREADS', '0'))
+
+    MEMORY_CHECK_EVERY = int(get_env('MEMORY_CHECK_EVERY', '1'))
+    MEMORY_TRIM_RSS_MB = int(get_env('MEMORY_TRIM_RSS_MB', '0'))
+    MEMORY_TRIM_STEP_MB = int(get_env('MEMORY_TRIM_STEP_MB', '256'))
+    MEMORY_RECYCLE_RSS_MB = int(get_env('MEMORY_RECYCLE_RSS_MB', '0'))
+
+    # responses are serialized by orjson when it is installed
+    FAST_JSON = get_env_bool('FAST_JSON', True)
+    # float results are kept and written in float32, models produce them in this precision,
+    # float64 writes all digits of their float64 value; embeddings may also be halved again to float16
+    FLOAT_DTYPE = get_env('FLOAT_DTYPE', 'float32')
+    EMBEDDING_DTYPE = get_env('EMBEDDING_DTYPE', FLOAT_DTYPE)
+
+    TRACE_RESPONSE_HEADER = get_env_bool('TRACE_RESPONSE_HEADER', False)
+    TRACE_SAMPLE_RATE = float(get_env('TRACE_SAMPLE_RATE', '0'))
+    TRACE_SLOW_MS = float(get_env('TRACE_SLOW_MS', '0'))
+    TRACE_PATH = get_env('TRACE_PATH', 'tmp/traces.json')
+    TRACE_MAX_MB = float(get_env('TRACE_MAX_MB', '100'))
+
+    # the PROFILE_TOKEN secret is read by src.services.flask_.profile_request, so that ENV logs do not show it
+    PROFILE_SAMPLE_RATE = float(get_env('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_MODE = get_env('PROFILE_MODE', 'sampling')
+    PROFILE_INTERVAL_MS = float(get_env('PROFILE_INTERVAL_MS', '5'))
+    PROFILE_DIR = get_env('PROFILE_DIR', 'tmp/profiles')
+    PROFILE_MAX_FILES = int(get_env('PROFILE_MAX_FILES', '100'))
 
     RUN_MODE = get_env_bool('RUN_MODE', False)
 
+    CAMERA_SESSION_IDLE_TIMEOUT_S = int(get_env('CAMERA_SESSION_IDLE_TIMEOUT_S', '60'))
+    CAMERA_SESSION_MAX_COUNT = int(get_env('CAMERA_SESSION_MAX_COUNT', '100'))
+    CAMERA_SESSION_FULL_DETECTION_EVERY = int(get_env('CAMERA_SESSION_FULL_DETECTION_EVERY', '10'))
+    CAMERA_SESSION_ROI_GROW_RATIO = float(get_env('CAMERA_SESSION_ROI_GROW_RATIO', '0.5'))
+
 
 LOGGING_LEVEL = logging._nameToLevel[ENV.LOGGING_LEVEL_NAME]
+if ENV.FLOAT_DTYPE not in ('float32', 'float64') or ENV.EMBEDDING_DTYPE not in ('float16', 'float32', 'float64'):
+    raise ValueError(f"FLOAT_DTYPE='{ENV.FLOAT_DTYPE}' is not float32 or float64, "
+                     f"or EMBEDDING_DTYPE='{ENV.EMBEDDING_DTYPE}' is not float16, float32 or float64")
 ENV_MAIN = ENV
 SKIPPED_PLUGINS = ["insightface.PoseEstimator", "facemask.MaskDetector", "facenet.PoseEstimator"]
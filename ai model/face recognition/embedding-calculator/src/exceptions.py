@@ -12,7 +12,7 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
-from werkzeug.exceptions import BadRequest, Locked, InternalServerError, Unauthorized
+from werkzeug.exceptions import BadRequest, Forbidden, Locked, InternalServerError, Unauthorized, NotFound
 
 from src.constants import ENV
 
@@ -37,6 +37,14 @@ class OneDimensionalImageIsGivenError(BadRequest):
     description = "Given image has only one dimension"
 
 
+class InvalidProfilingTokenError(Forbidden):
+    description = "Profiling token is missing or invalid"
+
+
+class CameraSessionNotFoundError(NotFound):
+    description = "Camera session is not found or has expired"
+
+
 class ClassifierIsAlreadyTrainingError(Locked):
     description = "Classifier training is already in progress"
 
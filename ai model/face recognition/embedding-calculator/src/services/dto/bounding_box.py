@@ -72,6 +72,26 @@ class BoundingBoxDTO(JSONEncodable):
     def height(self):
         return abs(self.y_max - self.y_min)
 
+    @property
+    def area(self):
+        return self.width * self.height
+
+    def iou(self, other: 'BoundingBoxDTO') -> float:
+        """
+        >>> BoundingBoxDTO(0,0,10,10,1).iou(BoundingBoxDTO(0,0,10,10,1))
+        1.0
+        >>> BoundingBoxDTO(0,0,10,10,1).iou(BoundingBoxDTO(5,0,15,10,1))
+        0.3333333333333333
+        >>> BoundingBoxDTO(0,0,10,10,1).iou(BoundingBoxDTO(20,20,30,30,1))
+        0.0
+        """
+        inter_width = min(self.x_max, other.x_max) - max(self.x_min, other.x_min)
+        inter_height = min(self.y_max, other.y_max) - max(self.y_min, other.y_min)
+        if inter_width <= 0 or inter_height <= 0:
+            return 0.0
+        intersection = inter_width * inter_height
+        return intersection / (self.area + other.area - intersection)
+
     def similar(self, other: 'BoundingBoxDTO', tolerance: int) -> bool:
         """
         >>> BoundingBoxDTO(50,50,100,100,1).similar(BoundingBoxDTO(50,50,100,100,1),5)
@@ -122,3 +142,45 @@ class BoundingBoxDTO(JSONEncodable):
                               y_max=self.y_max * coefficient,
                               np_landmarks=self._np_landmarks * coefficient,
                               probability=self.probability)
+
+    def shifted(self, dx: int, dy: int) -> 'BoundingBoxDTO':
+        """
+        >>> BoundingBoxDTO(10, 10, 20, 20, 1, np_landmarks=np.array([[15, 15]])).shifted(5, 100).xy
+        ((15, 110), (25, 120))
+        >>> BoundingBoxDTO(10, 10, 20, 20, 1, np_landmarks=np.array([[15, 15]])).shifted(5, 100).landmarks
+        [[20, 115]]
+        """
+        return BoundingBoxDTO(x_min=self.x_min + dx,
+                              y_min=self.y_min + dy,
+                              x_max=self.x_max + dx,
+                              y_max=self.y_max + dy,
+                              np_landmarks=self._np_landmarks + (dx, dy),
+                              probability=self.probability)
+
+    def grown(self, ratio: float, max_width: int, max_height: int) -> 'BoundingBoxDTO':
+        """
+        Box extended to each side by `ratio` of its size, limited by image dimensions.
+        >>> BoundingBoxDTO(10, 10, 30, 50, 1).grown(0.5, 100, 60).xy
+        ((0, 0), (40, 60))
+        """
+        dx, dy = self.width * ratio, self.height * ratio
+        return BoundingBoxDTO(x_min=max(self.x_min - dx, 0),
+                              y_min=max(self.y_min - dy, 0),
+                              x_max=min(self.x_max + dx, max_width),
+                              y_max=min(self.y_max + dy, max_height),
+                              probability=self.probability)
+
+
+def non_max_suppression(boxes: List[BoundingBoxDTO], iou_threshold: float) -> List[BoundingBoxDTO]:
+    """
+    Keeps the most probable box out of every group of overlapping boxes.
+    >>> [box.xy for box in non_max_suppression([BoundingBoxDTO(0, 0, 10, 10, 0.8),\
+                                                BoundingBoxDTO(1, 1, 11, 11, 0.9),\
+                                                BoundingBoxDTO(50, 50, 60, 60, 0.7)], 0.5)]
+    [((1, 1), (11, 11)), ((50, 50), (60, 60))]
+    """
+    kept = []
+    for box in sorted(boxes, key=lambda b: b.probability, reverse=True):
+        if all(box.iou(other) <= iou_threshold for other in kept):
+            kept.append(box)
+    return kept
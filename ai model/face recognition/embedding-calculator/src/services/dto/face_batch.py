@@ -0,0 +1,145 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from typing import Dict, List, Union
+
+import attr
+import numpy as np
+
+from src.constants import ENV
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.dto.json_encodable import JSONEncodable
+
+BOX_FIELDS = ('x_min', 'y_min', 'x_max', 'y_max')
+EMBEDDING_KEY = 'embedding'
+
+
+def _to_column(values: list, float_dtype: str) -> Union[np.ndarray, list]:
+    """
+    Values of the same numeric shape, e.g. embeddings or landmarks, are stacked into an array.
+    Floats are kept in `float_dtype`, the precision of JSON responses.
+    >>> _to_column([[1, 2], [3, 4]], 'float32').shape
+    (2, 2)
+    >>> _to_column([np.ones(2, dtype=np.float64)], 'float32').dtype
+    dtype('float32')
+    >>> _to_column([{'value': 'male'}, {'value': 'female'}], 'float32')
+    [{'value': 'male'}, {'value': 'female'}]
+    """
+    try:
+        column = np.asarray(values)
+    except ValueError:
+        return values
+    if column.dtype == object:
+        return values
+    if np.issubdtype(column.dtype, np.floating):
+        return column.astype(float_dtype, copy=False)
+    return column
+
+
+def _get_float_dtype(key: str) -> str:
+    """ Only embeddings may be float16, other values such as pose angles or coordinates need more precision """
+    return ENV.EMBEDDING_DTYPE if key == EMBEDDING_KEY else ENV.FLOAT_DTYPE
+
+
+@attr.s(auto_attribs=True)
+class FaceBatch(JSONEncodable):
+    """
+    Faces of an image as columns: detectors return boxes, scores and landmarks as arrays,
+    results of plugins are added as columns of their JSON fields. It holds no image buffers.
+    The JSON is the same as of the list of FaceDTO.
+    >>> batch = FaceBatch(boxes=np.array([[1, 2, 3, 4], [0, 0, 9, 9]]), probabilities=np.array([0.5, 0.9]),
+    ...                   landmarks=np.zeros((2, 5, 2)))
+    >>> batch.sorted_by_area()[:1].boxes.tolist()
+    [[0, 0, 9, 9]]
+    >>> batch.box(0).xy
+    ((1, 2), (3, 4))
+    >>> batch.to_json()[1]
+    {'box': {'x_min': 0, 'y_min': 0, 'x_max': 9, 'y_max': 9, 'probability': 0.9}, 'execution_time': {}}
+    """
+    boxes: np.ndarray = attr.ib(converter=lambda boxes: np.asarray(boxes, dtype=np.int32).reshape(-1, 4))
+    probabilities: np.ndarray = attr.ib(converter=lambda probabilities: np.asarray(probabilities, dtype=np.float64))
+    landmarks: np.ndarray = attr.ib(converter=lambda landmarks: np.asarray(landmarks, dtype=np.float64))
+    execution_times: Dict[str, np.ndarray] = attr.Factory(dict)
+    columns: Dict[str, Union[np.ndarray, list]] = attr.Factory(dict)
+
+    @classmethod
+    def from_boxes(cls, boxes: List[BoundingBoxDTO]) -> 'FaceBatch':
+        """ For boxes of detection steps which work with BoundingBoxDTO, e.g. tiles or regions """
+        return cls(boxes=[[getattr(box, field) for field in BOX_FIELDS] for box in boxes],
+                   probabilities=[box.probability for box in boxes],
+                   landmarks=[box._np_landmarks for box in boxes] or np.zeros((0, 0, 2)))
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, index: slice) -> 'FaceBatch':
+        return self.take(np.arange(len(self))[index])
+
+    def take(self, indices: np.ndarray) -> 'FaceBatch':
+        return FaceBatch(boxes=self.boxes[indices], probabilities=self.probabilities[indices],
+                         landmarks=self.landmarks[indices],
+                         execution_times={slug: times[indices] for slug, times in self.execution_times.items()},
+                         columns={key: column[indices] if isinstance(column, np.ndarray)
+                                  else [column[i] for i in indices] for key, column in self.columns.items()})
+
+    def sorted_by_area(self) -> 'FaceBatch':
+        """ The largest faces first, faces of the same area keep their order """
+        widths, heights = self.boxes[:, 2] - self.boxes[:, 0], self.boxes[:, 3] - self.boxes[:, 1]
+        areas = np.abs(widths).astype(np.int64) * np.abs(heights)
+        return self.take(np.argsort(-areas, kind='stable'))
+
+    def filtered(self, det_prob_threshold: float, min_face_size: int = None) -> 'FaceBatch':
+        """ Faces more probable than the threshold and not smaller than `min_face_size` """
+        mask = self.probabilities > det_prob_threshold
+        if min_face_size:
+            widths, heights = self.boxes[:, 2] - self.boxes[:, 0], self.boxes[:, 3] - self.boxes[:, 1]
+            mask &= np.minimum(np.abs(widths), np.abs(heights)) >= min_face_size
+        return self.take(np.flatnonzero(mask))
+
+    def box(self, i: int) -> BoundingBoxDTO:
+        x_min, y_min, x_max, y_max = self.boxes[i].tolist()
+        return BoundingBoxDTO(x_min=x_min, y_min=y_min, x_max=x_max, y_max=y_max,
+                              probability=self.probabilities[i], np_landmarks=self.landmarks[i])
+
+    def to_boxes(self) -> List[BoundingBoxDTO]:
+        return [self.box(i) for i in range(len(self))]
+
+    def set_execution_time(self, slug: str, elapsed_ms: int):
+        """ Time of a step done for all faces at once is divided between them """
+        self.execution_times[slug] = np.full(len(self), elapsed_ms // max(len(self), 1), dtype=np.int64)
+
+    def add_plugin_results(self, plugins_dto: List[List[JSONEncodable]],
+                           execution_times: List[Dict[str, int]]):
+        """ Results of plugins for every face, in the order of faces, are added as columns """
+        columns = {}
+        for i, face_plugins_dto in enumerate(plugins_dto):
+            for plugin_dto in face_plugins_dto:
+                for key, value in plugin_dto.to_json().items():
+                    columns.setdefault(key, [None] * len(self))[i] = value
+        self.columns.update((key, _to_column(values, _get_float_dtype(key))) for key, values in columns.items())
+        for i, face_execution_time in enumerate(execution_times):
+            for slug, elapsed_ms in face_execution_time.items():
+                self.execution_times.setdefault(slug, np.zeros(len(self), dtype=np.int64))[i] = elapsed_ms
+
+    def to_json(self):
+        """ Rows of array columns stay arrays, so a numpy-aware encoder writes them without lists """
+        columns = self.columns
+        execution_times = {slug: times.tolist() for slug, times in self.execution_times.items()}
+        faces = []
+        for i, (box, probability) in enumerate(zip(self.boxes.tolist(), self.probabilities.tolist())):
+            face = dict(box=dict(zip(BOX_FIELDS, box), probability=probability),
+                        execution_time={slug: times[i] for slug, times in execution_times.items()})
+            face.update((key, column[i]) for key, column in columns.items())
+            faces.append(face)
+        return faces
@@ -0,0 +1,105 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from src.constants import ENV
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.dto.face_batch import FaceBatch
+from src.services.dto.plugin_result import AgeDTO, EmbeddingDTO, FaceDTO, GenderDTO, LandmarksDTO, PoseDTO
+from src.services.flask_.json_encoding import add_json_encoding
+
+
+def _face(x_min, probability):
+    img = np.zeros((100, 100, 3), dtype=np.uint8)
+    box = BoundingBoxDTO(x_min, 10, x_min + 20, 30, probability, np_landmarks=np.array([[x_min + 5, 15]]))
+    return FaceDTO(box=box, img=img, face_img=img[10:30, x_min:x_min + 20],
+                   plugins_dto=[EmbeddingDTO(embedding=np.random.rand(4).astype(np.float32)),
+                                LandmarksDTO(landmarks=box.landmarks),
+                                AgeDTO(age=(25, 32), age_probability=np.float32(0.75)),
+                                GenderDTO(gender='female')],
+                   execution_time={'detector': 5, 'calculator': 7})
+
+
+def _to_batch(faces):
+    batch = FaceBatch.from_boxes([face.box for face in faces])
+    batch.add_plugin_results([face._plugins_dto for face in faces], [face.execution_time for face in faces])
+    return batch
+
+
+def test__given_faces__when_converted_to_batch__then_serialized_same_as_faces_by_stdlib(monkeypatch):
+    app = Flask(__name__)
+    add_json_encoding(app)
+    faces = [_face(0, 0.99), _face(50, np.float32(0.87))]
+    monkeypatch.setattr(ENV, 'FLOAT_DTYPE', 'float64')
+    monkeypatch.setattr(ENV, 'EMBEDDING_DTYPE', 'float64')
+    monkeypatch.setattr(ENV, 'FAST_JSON', False)
+    expected = json.loads(json.dumps(faces, cls=app.json_encoder))
+    monkeypatch.setattr(ENV, 'FAST_JSON', True)
+
+    batch = _to_batch(faces)
+
+    assert batch.columns['embedding'].shape == (2, 4)
+    assert batch.columns['landmarks'].shape == (2, 1, 2)
+    assert json.loads(json.dumps(batch, cls=app.json_encoder)) == expected
+
+
+@pytest.mark.parametrize('float_dtype, tolerance', [('float32', 1e-6), ('float16', 1e-4)])
+@pytest.mark.parametrize('fast_json', [True, False])
+def test__given_embedding_dtype__when_embeddings_serialized__then_distances_stay_within_tolerance(
+        monkeypatch, float_dtype, tolerance, fast_json):
+    app = Flask(__name__)
+    add_json_encoding(app)
+    monkeypatch.setattr(ENV, 'EMBEDDING_DTYPE', float_dtype)
+    monkeypatch.setattr(ENV, 'FAST_JSON', fast_json)
+    embeddings = np.random.RandomState(0).randn(20, 512).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    faces = [FaceDTO(box=BoundingBoxDTO(0, 0, 1, 1, 1.0), img=None, face_img=None,
+                     plugins_dto=[EmbeddingDTO(embedding=embedding)]) for embedding in embeddings]
+
+    batch = _to_batch(faces)
+    sent = np.array([face['embedding'] for face in json.loads(json.dumps(batch, cls=app.json_encoder))])
+
+    assert batch.columns['embedding'].dtype == float_dtype
+    expected_distances = np.linalg.norm(embeddings[:, None].astype(np.float64) - embeddings[None], axis=2)
+    distances = np.linalg.norm(sent[:, None] - sent[None], axis=2)
+    assert np.abs(distances - expected_distances).max() < tolerance
+
+
+def test__given_float16_embeddings__when_converted_to_batch__then_other_floats_keep_float_dtype(monkeypatch):
+    monkeypatch.setattr(ENV, 'FLOAT_DTYPE', 'float32')
+    monkeypatch.setattr(ENV, 'EMBEDDING_DTYPE', 'float16')
+    faces = [FaceDTO(box=BoundingBoxDTO(0, 0, 1, 1, 1.0), img=None, face_img=None,
+                     plugins_dto=[EmbeddingDTO(embedding=np.ones(4)), PoseDTO(pitch=3000.5, yaw=1.25, roll=0.5)])]
+
+    batch = _to_batch(faces)
+
+    assert batch.columns['embedding'].dtype == np.float16
+    assert batch.to_json()[0]['pose']['pitch'] == 3000.5
+
+
+def test__given_batch__when_sorted_and_sliced__then_columns_follow_boxes():
+    batch = _to_batch([_face(0, 0.9), _face(50, 0.8)])
+    batch.boxes[1] = (50, 10, 90, 50)
+
+    largest = batch.sorted_by_area()[:1]
+
+    assert largest.box(0) == BoundingBoxDTO(50, 10, 90, 50, 0.8)
+    assert largest.landmarks.tolist() == [[[55, 15]]]
+    assert largest.columns['landmarks'].tolist() == [[[55, 15]]]
+    assert largest.to_json()[0]['execution_time'] == {'detector': 5, 'calculator': 7}
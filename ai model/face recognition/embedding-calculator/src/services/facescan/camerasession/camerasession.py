@@ -0,0 +1,115 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+from src.constants import ENV
+from src.exceptions import CameraSessionNotFoundError
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.imgtools.types import Array3D
+
+logger = logging.getLogger(__name__)
+
+
+class CameraSession:
+    """
+    Keeps boxes of the previous frame of a camera, so that the next frame is
+    scanned only around them. Full-frame detection runs periodically and
+    whenever a tracked face is lost.
+    """
+
+    def __init__(self, session_id: str, full_detection_every: int, roi_grow_ratio: float):
+        self.session_id = session_id
+        self.lock = threading.Lock()
+        self.last_used_s = time.time()
+        self._full_detection_every = full_detection_every
+        self._roi_grow_ratio = roi_grow_ratio
+        self._boxes: List[BoundingBoxDTO] = []
+        self._frames_since_full_detection = 0
+        self._face_lost = True
+
+    def detection_regions(self, img: Array3D) -> Optional[List[BoundingBoxDTO]]:
+        """ Returns regions to scan in the given frame, None means the whole frame """
+        if (self._face_lost or not self._boxes
+                or self._frames_since_full_detection + 1 >= self._full_detection_every):
+            return None
+        height, width = img.shape[:2]
+        return [box.grown(self._roi_grow_ratio, width, height) for box in self._boxes]
+
+    def update(self, boxes: List[BoundingBoxDTO], regions: Optional[List[BoundingBoxDTO]]):
+        self.last_used_s = time.time()
+        if regions is None:
+            self._frames_since_full_detection = 0
+            self._face_lost = False
+        else:
+            self._frames_since_full_detection += 1
+            self._face_lost = len(boxes) < len(self._boxes)
+        self._boxes = boxes
+
+
+class CameraSessionStore:
+    def __init__(self, idle_timeout_s: int, max_count: int,
+                 full_detection_every: int, roi_grow_ratio: float):
+        self._idle_timeout_s = idle_timeout_s
+        self._max_count = max_count
+        self._full_detection_every = full_detection_every
+        self._roi_grow_ratio = roi_grow_ratio
+        self._sessions: 'OrderedDict[str, CameraSession]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        expired_before_s = time.time() - self._idle_timeout_s
+        for session_id, session in list(self._sessions.items()):
+            if session.last_used_s < expired_before_s:
+                logger.debug(f'Camera session {session_id} expired')
+                del self._sessions[session_id]
+
+    def open(self) -> CameraSession:
+        session = CameraSession(uuid.uuid4().hex, self._full_detection_every, self._roi_grow_ratio)
+        with self._lock:
+            self._expire()
+            while len(self._sessions) >= self._max_count:
+                session_id, _ = self._sessions.popitem(last=False)
+                logger.warning(f'Too many camera sessions, closing the least recently used {session_id}')
+            self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> CameraSession:
+        with self._lock:
+            self._expire()
+            if session_id not in self._sessions:
+                raise CameraSessionNotFoundError
+            self._sessions.move_to_end(session_id)
+            session = self._sessions[session_id]
+            session.last_used_s = time.time()
+            return session
+
+    def close(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                raise CameraSessionNotFoundError
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+camera_sessions = CameraSessionStore(idle_timeout_s=ENV.CAMERA_SESSION_IDLE_TIMEOUT_S,
+                                     max_count=ENV.CAMERA_SESSION_MAX_COUNT,
+                                     full_detection_every=ENV.CAMERA_SESSION_FULL_DETECTION_EVERY,
+                                     roi_grow_ratio=ENV.CAMERA_SESSION_ROI_GROW_RATIO)
@@ -0,0 +1,82 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import numpy as np
+
+from src.exceptions import CameraSessionNotFoundError
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.facescan.camerasession.camerasession import CameraSession, CameraSessionStore
+from src.services.utils.pytestutils import raises
+
+IMG = np.zeros((100, 200, 3))
+BOX = BoundingBoxDTO(50, 50, 60, 60, 1)
+
+
+def test__given_new_session__when_getting_regions__then_returns_full_frame():
+    session = CameraSession('id', full_detection_every=10, roi_grow_ratio=0.5)
+
+    regions = session.detection_regions(IMG)
+
+    assert regions is None
+
+
+def test__given_face_found__when_getting_regions__then_returns_grown_box():
+    session = CameraSession('id', full_detection_every=10, roi_grow_ratio=0.5)
+    session.update([BOX], regions=None)
+
+    regions = session.detection_regions(IMG)
+
+    assert regions == [BoundingBoxDTO(45, 45, 65, 65, 1)]
+
+
+def test__given_face_lost_in_regions__when_getting_regions__then_returns_full_frame():
+    session = CameraSession('id', full_detection_every=10, roi_grow_ratio=0.5)
+    session.update([BOX], regions=None)
+    session.update([], regions=session.detection_regions(IMG))
+
+    regions = session.detection_regions(IMG)
+
+    assert regions is None
+
+
+def test__given_full_detection_period_passed__when_getting_regions__then_returns_full_frame():
+    session = CameraSession('id', full_detection_every=2, roi_grow_ratio=0.5)
+    session.update([BOX], regions=None)
+    session.update([BOX], regions=session.detection_regions(IMG))
+
+    regions = session.detection_regions(IMG)
+
+    assert regions is None
+
+
+def test__given_idle_session__when_getting__then_raises_not_found():
+    store = CameraSessionStore(idle_timeout_s=10, max_count=10, full_detection_every=10, roi_grow_ratio=0.5)
+    session = store.open()
+    session.last_used_s -= 11
+
+    def act():
+        store.get(session.session_id)
+
+    assert raises(CameraSessionNotFoundError, act)
+
+
+def test__given_max_count_sessions__when_opening__then_closes_least_recently_used():
+    store = CameraSessionStore(idle_timeout_s=10, max_count=2, full_detection_every=10, roi_grow_ratio=0.5)
+    first, second = store.open(), store.open()
+    store.get(first.session_id)
+
+    store.open()
+
+    assert len(store) == 2
+    assert raises(CameraSessionNotFoundError, lambda: store.get(second.session_id))
@@ -0,0 +1,87 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+import attr
+
+from src.constants import ENV
+from src.services.dto.bounding_box import BoundingBoxDTO
+
+
+def _copy_boxes(boxes: List[BoundingBoxDTO]) -> List[BoundingBoxDTO]:
+    """ Requests get their own boxes, not the ones kept by the cache """
+    return [attr.evolve(box, np_landmarks=box._np_landmarks.copy()) for box in boxes]
+
+
+class DetectionCache:
+    """
+    LRU cache of raw detector candidates, found with the lowest `floor` threshold.
+    A request repeated with another threshold only filters the cached candidates.
+    Images are keyed by their uploaded file, so that decoded images are not hashed.
+    >>> cache = DetectionCache(maxsize=1, floor=0.5)
+    >>> cache.put('img1', [BoundingBoxDTO(0, 0, 1, 1, 0.6)])
+    >>> cache.put('img2', [])
+    >>> cache.get('img1') is None, cache.get('img2')
+    (True, [])
+    >>> cache.get_key(b'file') == cache.get_key(b'file'), DetectionCache(maxsize=0, floor=0.5).get_key(b'file')
+    (True, None)
+    """
+
+    def __init__(self, maxsize: int, floor: float):
+        self.maxsize = maxsize
+        self.floor = floor
+        self._candidates = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get_key(self, file_bytes: bytes) -> Optional[bytes]:
+        """ Key of an uploaded image file, None when the cache is disabled """
+        if not self.enabled:
+            return None
+        return hashlib.blake2b(file_bytes, digest_size=16).digest()
+
+    def get(self, key: Hashable) -> Optional[List[BoundingBoxDTO]]:
+        with self._lock:
+            candidates = self._candidates.get(key)
+            if candidates is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._candidates.move_to_end(key)
+        return _copy_boxes(candidates)
+
+    def put(self, key: Hashable, candidates: List[BoundingBoxDTO]):
+        candidates = _copy_boxes(candidates)
+        with self._lock:
+            self._candidates[key] = candidates
+            self._candidates.move_to_end(key)
+            while len(self._candidates) > self.maxsize:
+                self._candidates.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(size=len(self._candidates), maxsize=self.maxsize, floor=self.floor,
+                        hits=self._hits, misses=self._misses)
+
+
+detection_cache = DetectionCache(ENV.DETECTION_CACHE_SIZE, ENV.DETECTION_CACHE_FLOOR)
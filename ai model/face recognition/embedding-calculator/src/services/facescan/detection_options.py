@@ -0,0 +1,30 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from typing import Optional
+
+import attr
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class DetectionOptions:
+    """ Per-request detection settings, None means the server default """
+    max_image_side: Optional[int] = None
+    min_face_size: Optional[int] = None
+    pyramid_scale_factor: Optional[float] = None
+    # images larger than a tile are also detected in overlapping tiles at native resolution
+    tile_size: Optional[int] = None
+    tile_overlap: int = 0
+    # the whole image is a face already, e.g. a crop made by a client
+    skip_detection: bool = False
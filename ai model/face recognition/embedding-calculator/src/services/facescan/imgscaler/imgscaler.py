@@ -17,6 +17,7 @@ from typing import Tuple
 import cv2
 
 from src.services.imgtools.types import Array3D
+from src.services.tracing.spans import span
 
 
 class ImgScaler:
@@ -35,7 +36,8 @@ class ImgScaler:
         self._downscale_coefficient = self._img_length_limit / (width if width >= height else height)
         new_width = round(width * self._downscale_coefficient)
         new_height = round(height * self._downscale_coefficient)
-        return cv2.resize(img, dsize=(new_width, new_height), interpolation=interpolation)
+        with span('downscale_img'):
+            return cv2.resize(img, dsize=(new_width, new_height), interpolation=interpolation)
 
     def downscale_nose(self, nose: Tuple[int, int]) -> Tuple[int, int]:
         assert self._downscale_img_called
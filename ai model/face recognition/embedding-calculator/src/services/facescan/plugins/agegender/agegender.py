@@ -12,22 +12,42 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
-from typing import Tuple, Union
+from collections import namedtuple
+from typing import List, Tuple, Union
 
 import numpy as np
 import tensorflow.compat.v1 as tf1
-from cached_property import cached_property
+from cached_property import threaded_cached_property
 
+from src.services.imgtools.proc_img import prewhiten
 from src.services.imgtools.types import Array3D
-from src.services.facescan.plugins import base, managers
+from src.services.facescan.plugins import base, managers, thread_budget
 from src.services.facescan.plugins.agegender import helpers
 from src.services.dto import plugin_result
 
+# the session is closed when the plugin unloads its model
+_SessionModel = namedtuple('_SessionModel', 'sess predict')
+
+
+def _best_label(labels: Tuple, output: Array3D) -> Tuple[Union[str, Tuple], float]:
+    best_i = int(np.argmax(output))
+    return labels[best_i], output[best_i]
+
+
+def _restore_inception_v3(sess, images, nlabels: int, model_dir, scope: str):
+    """ Builds the network in a variable scope and restores it from a checkpoint saved without the scope """
+    with tf1.variable_scope(scope):
+        logits = helpers.inception_v3(nlabels, images)
+    variables = {var.op.name[len(scope) + 1:]: var for var in tf1.global_variables(scope=f'{scope}/')}
+    checkpoint = tf1.train.get_checkpoint_state(model_dir)
+    tf1.train.Saver(variables).restore(sess, checkpoint.model_checkpoint_path)
+    return tf1.nn.softmax(logits)
+
 
 class BaseAgeGender(base.BasePlugin):
     LABELS: Tuple[Tuple[int, int], ...]
 
-    @cached_property
+    @threaded_cached_property
     def _model(self):
         labels = self.LABELS
         model_dir = self.ml_model.path
@@ -35,7 +55,8 @@ class BaseAgeGender(base.BasePlugin):
 
         g = tf1.Graph()
         with g.as_default():
-            sess = tf1.Session(config=tf1.ConfigProto(allow_soft_placement=True))
+            sess = tf1.Session(config=tf1.ConfigProto(
+                allow_soft_placement=True, **thread_budget.get_tf_session_threads(self.thread_budget)))
 
             images = tf1.placeholder(tf1.float32, [None, IMAGE_SIZE, IMAGE_SIZE, 3])
             logits = helpers.inception_v3(len(labels), images)
@@ -47,11 +68,10 @@ class BaseAgeGender(base.BasePlugin):
             softmax_output = tf1.nn.softmax(logits)
 
             def get_value(img: Array3D) -> Tuple[Union[str, Tuple], float]:
-                img = np.expand_dims(helpers.prewhiten(img), 0)
+                img = np.expand_dims(prewhiten(img), 0)
                 output = sess.run(softmax_output, feed_dict={images: img})[0]
-                best_i = int(np.argmax(output))
-                return labels[best_i], output[best_i]
-            return get_value
+                return _best_label(labels, output)
+            return _SessionModel(sess=sess, predict=get_value)
 
 
 class AgeDetector(BaseAgeGender):
@@ -62,7 +82,7 @@ class AgeDetector(BaseAgeGender):
     )
 
     def __call__(self, face: plugin_result.FaceDTO):
-        value, probability = self._model(face._face_img)
+        value, probability = self._model.predict(face._face_img)
         return plugin_result.AgeDTO(age=value, age_probability=probability)
 
 
@@ -74,6 +94,80 @@ class GenderDetector(BaseAgeGender):
     )
 
     def __call__(self, face: plugin_result.FaceDTO):
-        value, probability = self._model(face._face_img)
+        value, probability = self._model.predict(face._face_img)
         return plugin_result.GenderDTO(gender=value, gender_probability=probability)
 
+
+class AgeGenderModel(base.BasePlugin):
+    """
+    Age and gender networks in one graph: a face is prewhitened once and both heads
+    are evaluated by one session run. Used by the fused plugins, not a face plugin itself.
+    Plugins are called face by face, so the graph runs once per face, not once per batch of faces.
+    """
+    slug = 'agegender'
+
+    @property
+    def required_ml_models(self) -> List[base.MLModel]:
+        return [FusedAgeDetector().ml_model, FusedGenderDetector().ml_model]
+
+    @threaded_cached_property
+    def _model(self):
+        age_model, gender_model = self.required_ml_models
+        IMAGE_SIZE = managers.plugin_manager.detector.IMAGE_SIZE
+
+        g = tf1.Graph()
+        with g.as_default():
+            sess = tf1.Session(config=tf1.ConfigProto(
+                allow_soft_placement=True, **thread_budget.get_tf_session_threads(self.thread_budget)))
+
+            images = tf1.placeholder(tf1.float32, [None, IMAGE_SIZE, IMAGE_SIZE, 3])
+            age_output = _restore_inception_v3(sess, images, len(AgeDetector.LABELS), age_model.path, 'age')
+            gender_output = _restore_inception_v3(sess, images, len(GenderDetector.LABELS), gender_model.path, 'gender')
+
+            def get_values(img: Array3D):
+                img = np.expand_dims(prewhiten(img), 0)
+                age, gender = sess.run([age_output, gender_output], feed_dict={images: img})
+                return _best_label(AgeDetector.LABELS, age[0]), _best_label(GenderDetector.LABELS, gender[0])
+            return _SessionModel(sess=sess, predict=get_values)
+
+    def __call__(self, face: plugin_result.FaceDTO):
+        return self._model.predict(face._face_img)
+
+
+class BaseFusedAgeGender(base.BasePlugin):
+    """ The first of the fused plugins evaluates both heads and caches the result for the other one """
+    CACHE_FIELD = '_agegender_cached_result'
+
+    @property
+    def required_ml_models(self) -> List[base.MLModel]:
+        return AgeGenderModel().required_ml_models
+
+    @property
+    def shared_plugins(self) -> List[base.BasePlugin]:
+        return [AgeGenderModel()]
+
+    def _evaluate_model(self, face: plugin_result.FaceDTO):
+        cached_result = getattr(face, self.CACHE_FIELD, None)
+        if not cached_result:
+            with AgeGenderModel().replica() as model:
+                cached_result = model(face)
+            setattr(face, self.CACHE_FIELD, cached_result)
+        return cached_result
+
+
+class FusedAgeDetector(BaseFusedAgeGender):
+    slug = 'age'
+    ml_models = AgeDetector.ml_models
+
+    def __call__(self, face: plugin_result.FaceDTO):
+        (value, probability), _ = self._evaluate_model(face)
+        return plugin_result.AgeDTO(age=value, age_probability=probability)
+
+
+class FusedGenderDetector(BaseFusedAgeGender):
+    slug = 'gender'
+    ml_models = GenderDetector.ml_models
+
+    def __call__(self, face: plugin_result.FaceDTO):
+        _, (value, probability) = self._evaluate_model(face)
+        return plugin_result.GenderDTO(gender=value, gender_probability=probability)
@@ -16,7 +16,8 @@ import pytest
 
 from sample_images import IMG_DIR, annotations
 from src.services.facescan.plugins.managers import plugin_manager
-from src.services.facescan.plugins.agegender.agegender import AgeDetector, GenderDetector
+from src.services.facescan.plugins.agegender.agegender import (AgeDetector, GenderDetector, FusedAgeDetector,
+                                                               FusedGenderDetector)
 from src.services.facescan.scanner.test._cache import read_img
 
 
@@ -44,3 +45,19 @@ def test_getting_age_and_gender(img_name: str):
         assert gender is not None
         assert (gender['value'] == 'male') == person.is_male, \
             f'{img_name}: Wrong gender - {gender}'
+
+
+@pytest.mark.skipif(not all([age_detector, gender_detector]),
+                    reason="Disabled age/gender plugins")
+@pytest.mark.performance
+def test__given_face__when_evaluated_by_fused_plugins__then_matches_separate_plugins():
+    img = read_img(IMG_DIR / '001_A.jpg')
+    face = plugin_manager.detector(img)[0]
+
+    fused_age, fused_gender = FusedAgeDetector()(face).age, FusedGenderDetector()(face).gender
+
+    age, gender = age_detector(face).age, gender_detector(face).gender
+    assert (fused_age['low'], fused_age['high']) == (age['low'], age['high'])
+    assert fused_age['probability'] == pytest.approx(age['probability'], abs=1e-4)
+    assert fused_gender['value'] == gender['value']
+    assert fused_gender['probability'] == pytest.approx(gender['probability'], abs=1e-4)
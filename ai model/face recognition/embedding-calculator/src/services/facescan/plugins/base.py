@@ -15,17 +15,23 @@
 import os
 import logging
 import tempfile
+import time
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Tuple, Optional
+from typing import Any, List, Tuple, Optional
 from zipfile import ZipFile
 
 import attr
 import gdown
-from cached_property import cached_property
+from cached_property import threaded_cached_property
 
+from src.constants import ENV
 from src.services.dto.json_encodable import JSONEncodable
 from src.services.dto import plugin_result
+from src.services.facescan.plugins.replicas import ReplicaPool
+from src.services.facescan.plugins.residency import model_residency
 
 
 logger = logging.getLogger(__name__)
@@ -98,6 +104,8 @@ class BasePlugin(ABC):
     # args for init MLModel: model name, Goodle Drive fileID
     ml_models: Tuple[Tuple[str, str], ...] = ()
     ml_model_name: str = None
+    # CPU threads the plugin's model may use, set by the replica pool
+    thread_budget: Optional[int] = None
 
     def __new__(cls, ml_model_name: str = None):
         """
@@ -109,6 +117,54 @@ class BasePlugin(ABC):
             cls.instance.ml_model_name = ml_model_name
         return cls.instance
 
+    def create_replica(self) -> 'BasePlugin':
+        """ Another instance of the plugin, which caches its own models """
+        replica = object.__new__(type(self))
+        replica.ml_model_name = self.ml_model_name
+        return replica
+
+    @threaded_cached_property
+    def replica_pool(self) -> ReplicaPool:
+        return ReplicaPool(self, ENV.MODEL_REPLICAS)
+
+    @contextmanager
+    def replica(self):
+        """ Context manager lending a free replica of the plugin to the current thread """
+        plugin = type(self).instance
+        with plugin.replica_pool.acquire() as replica:
+            was_loaded = replica.models_loaded
+            start_s = time.time()
+            try:
+                yield replica
+            finally:
+                load_s = time.time() - start_s if not was_loaded and replica.models_loaded else None
+                model_residency.used(plugin, load_s)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _model_properties(cls) -> Tuple[str, ...]:
+        """ Names of private cached properties, in which plugins keep their models """
+        return tuple(name for klass in cls.__mro__ for name, value in vars(klass).items()
+                     if name.startswith('_') and isinstance(value, threaded_cached_property))
+
+    @property
+    def models_loaded(self) -> bool:
+        return any(name in self.__dict__ for name in self._model_properties())
+
+    def unload_models(self):
+        """ Drops the cached models, they are loaded again on the next use """
+        for name in self._model_properties():
+            model = self.__dict__.pop(name, None)
+            if model is not None:
+                self._close_model(model)
+
+    @staticmethod
+    def _close_model(model):
+        """ TF1 sessions hold their graph memory until closed, models keep them in the `sess` field """
+        sess = getattr(model, 'sess', None)
+        if sess is not None:
+            sess.close()
+
     @property
     @abstractmethod
     def slug(self):
@@ -118,13 +174,23 @@ class BasePlugin(ABC):
         """ Create MLModel instance by arguments following plugin settings """
         return MLModel(self, *args)
 
-    @cached_property
+    @threaded_cached_property
     def ml_model(self) -> Optional[MLModel]:
         if hasattr(self, 'ml_models'):
             for ml_model_args in self.ml_models:
                 if not self.ml_model_name or self.ml_model_name == ml_model_args[0]:
                     return self.create_ml_model(*ml_model_args)
 
+    @property
+    def required_ml_models(self) -> List[MLModel]:
+        """ Models downloaded by the setup """
+        return [self.ml_model] if self.ml_model else []
+
+    @property
+    def shared_plugins(self) -> List['BasePlugin']:
+        """ Plugins which run the models of this one, with replica pools of their own """
+        return []
+
     @property
     def backend(self) -> str:
         return self.__class__.__module__.rsplit('.', 1)[-1]
@@ -0,0 +1,73 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from src.services.dto.bounding_box import BoundingBoxDTO
+
+NO_FACES = 'no_faces'
+AMBIGUOUS = 'ambiguous'
+SMALL_FACES = 'small_faces'
+
+
+def get_escalation_reason(candidates: List[BoundingBoxDTO], det_prob_threshold: float,
+                          ambiguous_band: Tuple[float, float], small_face_size: int) -> Optional[str]:
+    """
+    Why results of the light detector can't be trusted, None if they can
+    >>> box = lambda probability, size=100: BoundingBoxDTO(0, 0, size, size, probability)
+    >>> get_escalation_reason([box(0.99)], 0.8, (0.5, 0.95), 40) is None
+    True
+    >>> get_escalation_reason([box(0.6)], 0.8, (0.5, 0.95), 40)
+    'no_faces'
+    >>> get_escalation_reason([box(0.99), box(0.6)], 0.8, (0.5, 0.95), 40)
+    'ambiguous'
+    >>> get_escalation_reason([box(0.99, size=30)], 0.8, (0.5, 0.95), 40)
+    'small_faces'
+    """
+    faces = [box for box in candidates if box.probability > det_prob_threshold]
+    if not faces:
+        return NO_FACES
+    band_min, band_max = ambiguous_band
+    if any(band_min < box.probability <= band_max for box in candidates):
+        return AMBIGUOUS
+    if any(min(box.width, box.height) < small_face_size for box in faces):
+        return SMALL_FACES
+    return None
+
+
+class EscalationStats:
+    """ Shared by all replicas of a cascade detector """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._reasons = Counter()
+
+    def add(self, reason: Optional[str]):
+        with self._lock:
+            self._checked += 1
+            if reason:
+                self._reasons[reason] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            escalated = sum(self._reasons.values())
+            return dict(checked=self._checked, escalated=escalated,
+                        escalation_rate=round(escalated / max(self._checked, 1), 4),
+                        reasons=dict(self._reasons))
+
+
+escalation_stats = EscalationStats()
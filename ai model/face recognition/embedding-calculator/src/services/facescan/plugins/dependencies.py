@@ -19,7 +19,8 @@ from src.services.utils.pyutils import get_env
 
 
 def get_tensorflow(version='2.2.0') -> Tuple[str, ...]:
-    return tuple([f'tensorflow=={version}'])
+    tensorflow_lib = 'intel-tensorflow' if ENV.INTEL_OPTIMIZATION else 'tensorflow'
+    return tuple([f'{tensorflow_lib}=={version}'])
 
 
 def get_mxnet() -> Tuple[str, ...]:
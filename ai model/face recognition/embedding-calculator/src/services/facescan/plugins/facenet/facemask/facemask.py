@@ -16,7 +16,7 @@ from typing import Tuple, Union
 
 import numpy as np
 import tensorflow as tf2
-from cached_property import cached_property
+from cached_property import threaded_cached_property
 
 from src.services.imgtools.types import Array3D
 from src.services.facescan.plugins import base
@@ -38,7 +38,7 @@ class MaskDetector(base.BasePlugin):
     def retain_folder_structure(self) -> bool:
         return True
 
-    @cached_property
+    @threaded_cached_property
     def _model(self):
         model = tf2.keras.models.load_model(str(self.ml_model.path))
 
@@ -20,7 +20,7 @@ from typing import List
 import numpy as np
 import tensorflow.compat.v1 as tf1
 from tensorflow.python.platform import gfile
-from cached_property import cached_property
+from cached_property import threaded_cached_property
 
 import sys
 sys.path.append('srcext')
@@ -28,14 +28,15 @@ from mtcnn import MTCNN
 
 from src.constants import ENV
 from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.dto.face_batch import FaceBatch
+from src.services.facescan.detection_options import DetectionOptions
 from src.services.facescan.plugins import mixins
 from src.services.facescan.imgscaler.imgscaler import ImgScaler
-from src.services.imgtools.proc_img import crop_img, squish_img
+from src.services.imgtools.proc_img import crop_img, prewhiten, squish_img
 from src.services.imgtools.types import Array3D
 from src.services.utils.pyutils import get_current_dir
 
-from src.services.facescan.plugins import base
-from src._endpoints import FaceDetection
+from src.services.facescan.plugins import base, thread_budget
 
 CURRENT_DIR = get_current_dir(__file__)
 
@@ -44,18 +45,9 @@ _EmbeddingCalculator = namedtuple('_EmbeddingCalculator', 'graph sess')
 _FaceDetectionNets = namedtuple('_FaceDetectionNets', 'pnet rnet onet')
 
 
-def prewhiten(img):
-    """ Normalize image."""
-    mean = np.mean(img)
-    std = np.std(img)
-    std_adj = np.maximum(std, 1.0 / np.sqrt(img.size))
-    y = np.multiply(np.subtract(img, mean), 1 / std_adj)
-    return y
-
-
 class FaceDetector(mixins.FaceDetectorMixin, base.BasePlugin):
-    FACE_MIN_SIZE = 20
-    SCALE_FACTOR = 0.709
+    FACE_MIN_SIZE = ENV.FACE_MIN_SIZE
+    SCALE_FACTOR = ENV.PYRAMID_SCALE_FACTOR
     IMAGE_SIZE = 160
     IMG_LENGTH_LIMIT = ENV.IMG_LENGTH_LIMIT
     KEYPOINTS_ORDER = ['left_eye', 'right_eye', 'nose', 'mouth_left', 'mouth_right']
@@ -72,7 +64,7 @@ class FaceDetector(mixins.FaceDetectorMixin, base.BasePlugin):
     top_margin = 0.10526315789473684
     bottom_margin = 0.09868421052631579
 
-    @cached_property
+    @threaded_cached_property
     def _face_detection_net(self):
         return MTCNN(
             min_face_size=self.FACE_MIN_SIZE,
@@ -83,14 +75,20 @@ class FaceDetector(mixins.FaceDetectorMixin, base.BasePlugin):
     def crop_face(self, img: Array3D, box: BoundingBoxDTO) -> Array3D:
         return squish_img(crop_img(img, box), (self.IMAGE_SIZE, self.IMAGE_SIZE))
 
-    def find_faces(self, img: Array3D, det_prob_threshold: float = None) -> List[BoundingBoxDTO]:
+    def find_faces(self, img: Array3D, det_prob_threshold: float = None,
+                   options: DetectionOptions = None) -> List[BoundingBoxDTO]:
+        return self.find_faces_batch(img, det_prob_threshold, options).to_boxes()
+
+    def find_faces_batch(self, img: Array3D, det_prob_threshold: float = None,
+                         options: DetectionOptions = None) -> FaceBatch:
         if det_prob_threshold is None:
             det_prob_threshold = self.det_prob_threshold
         assert 0 <= det_prob_threshold <= 1
-        scaler = ImgScaler(self.IMG_LENGTH_LIMIT)
+        options = options or DetectionOptions()
+        scaler = ImgScaler(options.max_image_side or self.IMG_LENGTH_LIMIT)
         img = scaler.downscale_img(img)
 
-        if FaceDetection.SKIPPING_FACE_DETECTION:
+        if options.skip_detection:
             bounding_boxes = []
             bounding_boxes.append({
                 'box': [0, 0, img.shape[0], img.shape[1]],
@@ -107,32 +105,29 @@ class FaceDetector(mixins.FaceDetectorMixin, base.BasePlugin):
             detect_face_result = bounding_boxes
         else:
             fdn = self._face_detection_net
-            detect_face_result = fdn.detect_faces(img)
+            min_face_size = None
+            if options.min_face_size:
+                # a bigger minimal face prunes the lower levels of the pyramid
+                min_face_size = max(self.FACE_MIN_SIZE, int(options.min_face_size * scaler.downscale_coefficient))
+            detect_face_result = fdn.detect_faces(img, min_face_size=min_face_size,
+                                                  scale_factor=options.pyramid_scale_factor)
+
+        if not detect_face_result:
+            return FaceBatch.from_boxes([])
 
         img_size = np.asarray(img.shape)[0:2]
-        bounding_boxes = []
-
-        for face in detect_face_result:
-            x, y, w, h = face['box']
-            box = BoundingBoxDTO(
-                x_min=int(np.maximum(x - (self.left_margin * w), 0)),
-                y_min=int(np.maximum(y - (self.top_margin * h), 0)),
-                x_max=int(np.minimum(x + w + (self.right_margin * w), img_size[1])),
-                y_max=int(np.minimum(y + h + (self.bottom_margin * h), img_size[0])),
-                np_landmarks=np.array([list(face['keypoints'][point_name]) for point_name in self.KEYPOINTS_ORDER]),
-                probability=face['confidence']
-            )
-            logger.debug(f"Found: {box}")
-            bounding_boxes.append(box)
-
-        filtered_bounding_boxes = []
-        for box in bounding_boxes:
-            box = box.scaled(scaler.upscale_coefficient)
-            if box.probability <= det_prob_threshold:
-                logger.debug(f'Box filtered out because below threshold ({det_prob_threshold}): {box}')
-                continue
-            filtered_bounding_boxes.append(box)
-        return filtered_bounding_boxes
+        x, y, w, h = np.array([face['box'] for face in detect_face_result], dtype=float).T
+        boxes = np.stack([np.maximum(x - (self.left_margin * w), 0),
+                          np.maximum(y - (self.top_margin * h), 0),
+                          np.minimum(x + w + (self.right_margin * w), img_size[1]),
+                          np.minimum(y + h + (self.bottom_margin * h), img_size[0])], axis=1).astype(int)
+        landmarks = np.array([[face['keypoints'][point_name] for point_name in self.KEYPOINTS_ORDER]
+                              for face in detect_face_result], dtype=float)
+        batch = FaceBatch(boxes=(boxes * scaler.upscale_coefficient).astype(int),
+                          probabilities=[face['confidence'] for face in detect_face_result],
+                          landmarks=landmarks * scaler.upscale_coefficient)
+        logger.debug(f"Found: {batch.boxes.tolist()}")
+        return batch.filtered(det_prob_threshold, options.min_face_size)
 
 
 class Calculator(mixins.CalculatorMixin, base.BasePlugin):
@@ -153,7 +148,7 @@ class Calculator(mixins.CalculatorMixin, base.BasePlugin):
     def calc_embedding(self, face_img: Array3D) -> Array3D:
         return self._calculate_embeddings([face_img])[0]
 
-    @cached_property
+    @threaded_cached_property
     def _embedding_calculator(self):
         with tf1.Graph().as_default() as graph:
             graph_def = tf1.GraphDef()
@@ -161,11 +156,12 @@ class Calculator(mixins.CalculatorMixin, base.BasePlugin):
                 model = f.read()
             graph_def.ParseFromString(model)
             tf1.import_graph_def(graph_def, name='')
-            return _EmbeddingCalculator(graph=graph, sess=tf1.Session(graph=graph))
+            config = tf1.ConfigProto(**thread_budget.get_tf_session_threads(self.thread_budget))
+            return _EmbeddingCalculator(graph=graph, sess=tf1.Session(graph=graph, config=config))
 
     def _calculate_embeddings(self, cropped_images):
-        """Run forward pass to calculate embeddings"""
-        prewhitened_images = [prewhiten(img) for img in cropped_images]
+        """Run forward pass to calculate embeddings, in float32 as the model does"""
+        prewhitened_images = np.stack([prewhiten(img) for img in cropped_images])
         calc_model = self._embedding_calculator
         graph_images_placeholder = calc_model.graph.get_tensor_by_name("input:0")
         graph_embeddings = calc_model.graph.get_tensor_by_name("embeddings:0")
@@ -173,11 +169,12 @@ class Calculator(mixins.CalculatorMixin, base.BasePlugin):
         embedding_size = graph_embeddings.get_shape()[1]
         image_count = len(prewhitened_images)
         batches_per_epoch = int(math.ceil(1.0 * image_count / self.BATCH_SIZE))
-        embeddings = np.zeros((image_count, embedding_size))
+        embeddings = np.zeros((image_count, embedding_size), dtype=np.float32)
         for i in range(batches_per_epoch):
             start_index = i * self.BATCH_SIZE
             end_index = min((i + 1) * self.BATCH_SIZE, image_count)
-            feed_dict = {graph_images_placeholder: prewhitened_images, graph_phase_train_placeholder: False}
+            feed_dict = {graph_images_placeholder: prewhitened_images[start_index:end_index],
+                         graph_phase_train_placeholder: False}
             embeddings[start_index:end_index, :] = calc_model.sess.run(
                 graph_embeddings, feed_dict=feed_dict)
         return embeddings
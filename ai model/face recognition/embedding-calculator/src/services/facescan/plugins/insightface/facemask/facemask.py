@@ -15,7 +15,7 @@
 import os
 from pathlib import Path
 from typing import Tuple, Union
-from cached_property import cached_property
+from cached_property import threaded_cached_property
 
 import numpy as np
 
@@ -53,7 +53,7 @@ class MaskDetector(InsightFaceMixin, base.BasePlugin):
     def retain_folder_structure(self) -> bool:
         return True
 
-    @cached_property
+    @threaded_cached_property
     def _model(self):
         gpu_count = mx.context.num_gpus()
         ctx = mx.gpu() if gpu_count > 0 else mx.cpu()
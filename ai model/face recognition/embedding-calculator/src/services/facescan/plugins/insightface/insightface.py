@@ -13,26 +13,25 @@
 #  permissions and limitations under the License.
 
 import logging
-import ctypes
 from typing import List, Tuple
 import attr
 import numpy as np
-from cached_property import cached_property
+from cached_property import threaded_cached_property
 
 from src.constants import ENV
 from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.dto.face_batch import FaceBatch
 from src.services.dto.json_encodable import JSONEncodable
+from src.services.facescan.detection_options import DetectionOptions
 from src.services.facescan.imgscaler.imgscaler import ImgScaler
-from src.services.facescan.plugins import base, mixins, exceptions
+from src.services.facescan.plugins import base, cascade, mixins, exceptions
 from src.services.facescan.plugins.insightface import helpers as insight_helpers
 from src.services.dto import plugin_result
 from src.services.imgtools.types import Array3D
 import collections
-from src._endpoints import FaceDetection
 
 
 logger = logging.getLogger(__name__)
-libc = ctypes.CDLL("libc.so.6")
 
 if ENV.RUN_MODE:
     import mxnet as mx
@@ -67,27 +66,47 @@ class FaceDetector(InsightFaceMixin, mixins.FaceDetectorMixin, base.BasePlugin):
         ('retinaface_mnet025_v2', '1EYTMxgcNdlvoL1fSC8N1zkaWrX75ZoNL'),
         ('retinaface_r50_v1', '1LZ5h9f_YC5EdbIZAqVba9TKHipi90JBj'),
     )
-    call_counter = 0
-    MAX_CALL_COUNTER = 1000
     IMG_LENGTH_LIMIT = ENV.IMG_LENGTH_LIMIT
+    FACE_MIN_SIZE = ENV.FACE_MIN_SIZE
     IMAGE_SIZE = 112
     det_prob_threshold = 0.8
 
-    @cached_property
+    @threaded_cached_property
     def _detection_model(self):
-        model_file = self.get_model_file(self.ml_model)
+        return self._load_detection_model(self.ml_model)
+
+    def _load_detection_model(self, ml_model: base.MLModel):
+        model_file = self.get_model_file(ml_model)
         model = DetectionOnlyFaceAnalysis(model_file)
         model.prepare(ctx_id=self._CTX_ID, nms=self._NMS)
         return model
 
-    def find_faces(self, img: Array3D, det_prob_threshold: float = None) -> List[BoundingBoxDTO]:
+    def _get_img_length_limit(self, img: Array3D, options: DetectionOptions) -> int:
+        img_length_limit = options.max_image_side or self.IMG_LENGTH_LIMIT
+        if options.min_face_size:
+            # RetinaFace has no pyramid, so shrink the image until the smallest expected face is of minimal size
+            shrunk_length = max(img.shape[:2]) * self.FACE_MIN_SIZE // options.min_face_size
+            img_length_limit = min(img_length_limit, max(shrunk_length, ENV.IMG_LENGTH_MIN))
+        return img_length_limit
+
+    def find_faces(self, img: Array3D, det_prob_threshold: float = None,
+                   options: DetectionOptions = None) -> List[BoundingBoxDTO]:
+        return self.find_faces_batch(img, det_prob_threshold, options).to_boxes()
+
+    def find_faces_batch(self, img: Array3D, det_prob_threshold: float = None,
+                         options: DetectionOptions = None) -> FaceBatch:
         if det_prob_threshold is None:
             det_prob_threshold = self.det_prob_threshold
         assert 0 <= det_prob_threshold <= 1
-        scaler = ImgScaler(self.IMG_LENGTH_LIMIT)
+        options = options or DetectionOptions()
+        return self._find_faces_with(lambda: self._detection_model, img, det_prob_threshold, options)
+
+    def _find_faces_with(self, get_model, img: Array3D, det_prob_threshold: float,
+                         options: DetectionOptions) -> FaceBatch:
+        scaler = ImgScaler(self._get_img_length_limit(img, options))
         img = scaler.downscale_img(img)
 
-        if FaceDetection.SKIPPING_FACE_DETECTION:
+        if options.skip_detection:
             Face = collections.namedtuple('Face', [
                 'bbox', 'landmark', 'det_score', 'embedding', 'gender', 'age', 'embedding_norm', 'normed_embedding'])
             ret = []
@@ -100,37 +119,81 @@ class FaceDetector(InsightFaceMixin, mixins.FaceDetectorMixin, base.BasePlugin):
             results = ret
             det_prob_threshold = self.det_prob_threshold
         else:
-            model = self._detection_model
-            results = model.get(img, det_thresh=det_prob_threshold)
-
-        boxes = []
-
-        self.call_counter +=1
-        if self.call_counter % self.MAX_CALL_COUNTER == 0:
-            libc.malloc_trim(0)
-            self.call_counter = 0
-            
-        for result in results:
-            downscaled_box_array = result.bbox.astype(np.int).flatten()
-            downscaled_box = BoundingBoxDTO(x_min=downscaled_box_array[0],
-                                            y_min=downscaled_box_array[1],
-                                            x_max=downscaled_box_array[2],
-                                            y_max=downscaled_box_array[3],
-                                            probability=result.det_score,
-                                            np_landmarks=result.landmark)
-            box = downscaled_box.scaled(scaler.upscale_coefficient)
-            if box.probability <= det_prob_threshold:
-                logger.debug(f'Box Filtered out because below threshold ({det_prob_threshold}: {box})')
-                continue
-            logger.debug(f"Found: {box}")
-            boxes.append(box)
-        return boxes
+            results = get_model().get(img, det_thresh=det_prob_threshold)
+
+        if not results:
+            return FaceBatch.from_boxes([])
+
+        downscaled_boxes = np.array([result.bbox.flatten() for result in results]).astype(int)
+        batch = FaceBatch(boxes=(downscaled_boxes * scaler.upscale_coefficient).astype(int),
+                          probabilities=[result.det_score for result in results],
+                          landmarks=np.array([result.landmark for result in results]) * scaler.upscale_coefficient)
+        logger.debug(f"Found: {batch.boxes.tolist()}")
+        return batch.filtered(det_prob_threshold, options.min_face_size)
 
     def crop_face(self, img: Array3D, box: BoundingBoxDTO) -> Array3D:
         return face_align.norm_crop(img, landmark=box._np_landmarks,
                                     image_size=self.IMAGE_SIZE)
 
 
+class CascadeFaceDetector(FaceDetector):
+    """
+    Runs the light model (the plugin's ml_model) and escalates to the heavy `CASCADE_HEAVY_MODEL`
+    when no faces are found, some scores are ambiguous or some faces are too small.
+    """
+    AMBIGUOUS_BAND = (ENV.CASCADE_AMBIGUOUS_MIN, ENV.CASCADE_AMBIGUOUS_MAX)
+    SMALL_FACE_SIZE = ENV.CASCADE_SMALL_FACE_SIZE
+
+    @threaded_cached_property
+    def heavy_ml_model(self) -> base.MLModel:
+        for ml_model_args in self.ml_models:
+            if ml_model_args[0] == ENV.CASCADE_HEAVY_MODEL:
+                return self.create_ml_model(*ml_model_args)
+        raise exceptions.ModelImportException(f'Model {ENV.CASCADE_HEAVY_MODEL} does not exists')
+
+    @property
+    def required_ml_models(self) -> List[base.MLModel]:
+        return [self.ml_model, self.heavy_ml_model]
+
+    @threaded_cached_property
+    def _heavy_detection_model(self):
+        return self._load_detection_model(self.heavy_ml_model)
+
+    def find_faces(self, img: Array3D, det_prob_threshold: float = None,
+                   options: DetectionOptions = None) -> List[BoundingBoxDTO]:
+        if det_prob_threshold is None:
+            det_prob_threshold = self.det_prob_threshold
+        assert 0 <= det_prob_threshold <= 1
+        options = options or DetectionOptions()
+        if options.skip_detection:
+            return super().find_faces_batch(img, det_prob_threshold, options).to_boxes()
+
+        candidates = self.find_candidates(img, det_prob_threshold, options)
+        return self.select_faces(img, candidates, det_prob_threshold, options)
+
+    def find_faces_batch(self, img: Array3D, det_prob_threshold: float = None,
+                         options: DetectionOptions = None) -> FaceBatch:
+        # escalation is decided on boxes, as for candidates from the detection cache
+        return FaceBatch.from_boxes(self.find_faces(img, det_prob_threshold, options))
+
+    def find_candidates(self, img: Array3D, floor: float, options: DetectionOptions) -> List[BoundingBoxDTO]:
+        # candidates below the threshold are needed to see ambiguous scores
+        return self._find_faces_with(lambda: self._detection_model, img,
+                                     min(floor, self.AMBIGUOUS_BAND[0]), options).to_boxes()
+
+    def select_faces(self, img: Array3D, candidates: List[BoundingBoxDTO], det_prob_threshold: float,
+                     options: DetectionOptions) -> List[BoundingBoxDTO]:
+        """ Escalation is decided by the requested threshold, also for candidates from the detection cache """
+        reason = cascade.get_escalation_reason(candidates, det_prob_threshold,
+                                               self.AMBIGUOUS_BAND, self.SMALL_FACE_SIZE)
+        cascade.escalation_stats.add(reason)
+        if reason is None:
+            return [box for box in candidates if box.probability > det_prob_threshold]
+        logger.debug(f'Escalated to {self.heavy_ml_model}: {reason}')
+        return self._find_faces_with(lambda: self._heavy_detection_model, img, det_prob_threshold,
+                                     options).to_boxes()
+
+
 class Calculator(InsightFaceMixin, mixins.CalculatorMixin, base.BasePlugin):
     ml_models = (
         ('arcface_mobilefacenet', '17TpxpyHuUc1ZTm3RIbfvhnBcZqhyKszV', (1.26538905, 5.552089201), 200),
@@ -146,7 +209,7 @@ class Calculator(InsightFaceMixin, mixins.CalculatorMixin, base.BasePlugin):
     def calc_embedding(self, face_img: Array3D) -> Array3D:
         return self._calculation_model.get_embedding(face_img).flatten()
 
-    @cached_property
+    @threaded_cached_property
     def _calculation_model(self):
         model_file = self.get_model_file(self.ml_model)
         model = face_recognition.FaceRecognition(
@@ -174,7 +237,7 @@ class BaseGenderAge(InsightFaceMixin, base.BasePlugin):
             setattr(face, self.CACHE_FIELD, cached_result)
         return cached_result
 
-    @cached_property
+    @threaded_cached_property
     def _genderage_model(self):
         model_file = self.get_model_file(self.ml_model)
         model = face_genderage.FaceGenderage(
@@ -227,7 +290,7 @@ class Landmarks2d106Detector(InsightFaceMixin, mixins.LandmarksDetectorMixin,
         )
         return Landmarks2d106DTO(landmarks=landmarks.astype(int).tolist())
 
-    @cached_property
+    @threaded_cached_property
     def _landmark_model(self):
         model_prefix = f'{self.ml_model.path}/{self.ml_model.name}'
         sym, arg_params, aux_params = mx.model.load_checkpoint(model_prefix, 0)
@@ -16,10 +16,10 @@ from collections import defaultdict
 from importlib import import_module
 from typing import List, Type, Dict, Tuple
 from types import ModuleType
-from cached_property import cached_property
+from cached_property import threaded_cached_property
 
 from src import constants
-from src.services.facescan.plugins import base, mixins
+from src.services.facescan.plugins import base, mixins, thread_budget
 
 
 ML_MODEL_SEPARATOR = '@'
@@ -54,8 +54,9 @@ class PluginManager:
             *constants.ENV.EXTRA_PLUGINS
         ]))
 
-    @cached_property
+    @threaded_cached_property
     def plugins(self):
+        thread_budget.set_thread_env()
         plugins = []
         for module, plugins_names in self.plugins_modules.items():
             for pl_name in plugins_names:
@@ -66,19 +67,30 @@ class PluginManager:
                 pl_class = import_classes(pl_path)
                 plugin = pl_class(ml_model_name=mlmodel_name)
                 plugins.append(plugin)
+        thread_budget.limit_threads()
         return plugins
 
-    @cached_property
+    @threaded_cached_property
+    def pooled_plugins(self) -> List[base.BasePlugin]:
+        """ Plugins and the shared plugins running their models, each with a replica pool """
+        pooled_plugins = []
+        for plugin in self.plugins:
+            for pooled_plugin in [plugin] + plugin.shared_plugins:
+                if pooled_plugin not in pooled_plugins:
+                    pooled_plugins.append(pooled_plugin)
+        return pooled_plugins
+
+    @threaded_cached_property
     def detector(self) -> mixins.FaceDetectorMixin:
         return [pl for pl in self.plugins
                 if isinstance(pl, mixins.FaceDetectorMixin)][0]
 
-    @cached_property
+    @threaded_cached_property
     def calculator(self) -> mixins.CalculatorMixin:
         return [pl for pl in self.plugins
                 if isinstance(pl, mixins.CalculatorMixin)][0]
 
-    @cached_property
+    @threaded_cached_property
     def face_plugins(self) -> List[base.BasePlugin]:
         return [pl for pl in self.plugins
                 if not isinstance(pl, mixins.FaceDetectorMixin)]
@@ -12,61 +12,174 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
+import attr
 import cv2
 import numpy as np
-from time import time, sleep
+from time import perf_counter
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
-from typing import List, Tuple
+from contextvars import copy_context
+from typing import List, Tuple, Optional
 
-from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.dto.bounding_box import BoundingBoxDTO, non_max_suppression
+from src.services.dto.face_batch import FaceBatch
 from src.services.dto import plugin_result
+from src.services.facescan.detection_cache import detection_cache
+from src.services.facescan.detection_options import DetectionOptions
+from src.services.facescan.tiling import get_tiles, is_cut_by_seam, tile_executor
+from src.services.imgtools.proc_img import crop_img
 from src.services.imgtools.types import Array3D
 from src.services.facescan.plugins import base, exceptions
+from src.services.tracing.spans import span
 
 
 @contextmanager
 def elapsed_time_contextmanager() -> int:
     """ Returns elapsed time in ms. """
-    start = time()
+    start = perf_counter()
     elapsed = 0
     yield lambda: elapsed
     # update variable after exit from context
-    elapsed = int((time() - start) * 1000)
+    elapsed = int((perf_counter() - start) * 1000)
 
 
 class FaceDetectorMixin(ABC):
     slug = 'detector'
     IMAGE_SIZE: int
+    det_prob_threshold: float
+    REGIONS_IOU_THRESHOLD = 0.5
     face_plugins: List[base.BasePlugin] = []
 
     def __call__(self, img: Array3D, det_prob_threshold: float = None,
-                 face_plugins: Tuple[base.BasePlugin] = ()) -> List[plugin_result.FaceDTO]:
-        """ Returns cropped and normalized faces."""
-        faces = self._fetch_faces(img, det_prob_threshold)
+                 face_plugins: Tuple[base.BasePlugin] = (),
+                 regions: Optional[List[BoundingBoxDTO]] = None,
+                 options: DetectionOptions = None,
+                 limit: int = None,
+                 img_key: bytes = None) -> List[plugin_result.FaceDTO]:
+        """
+        Returns cropped and normalized faces, plugins run only on the `limit` largest ones.
+        Candidates of images with `img_key` (see `DetectionCache.get_key`) are cached.
+        """
+        batch = self._fetch_faces(img, det_prob_threshold, regions, options, limit, img_key)
+        with span('crop_faces', faces=len(batch)):
+            faces = [self._get_face(img, batch, i) for i in range(len(batch))]
         for face in faces:
             self._apply_face_plugins(face, face_plugins)
         return faces
 
-    def _fetch_faces(self, img: Array3D, det_prob_threshold: float = None):
-        with elapsed_time_contextmanager() as get_elapsed_time:
-            boxes = self.find_faces(img, det_prob_threshold)
-            # sort by face area
-            boxes = sorted(boxes, key=lambda x: x.width * x.height, reverse=True)
+    def run_batch(self, img: Array3D, det_prob_threshold: float = None,
+                  face_plugins: Tuple[base.BasePlugin] = (),
+                  regions: Optional[List[BoundingBoxDTO]] = None,
+                  options: DetectionOptions = None,
+                  limit: int = None,
+                  img_key: bytes = None) -> FaceBatch:
+        """
+        The same as calling the detector, but results are returned as a FaceBatch.
+        A face is cropped only for its plugins and its crop is released right after them,
+        so the batch keeps neither the image nor the crops.
+        """
+        batch = self._fetch_faces(img, det_prob_threshold, regions, options, limit, img_key)
+        if not face_plugins:
+            return batch
+        plugins_dto, execution_times = [], []
+        for i in range(len(batch)):
+            face = self._get_face(img, batch, i)
+            self._apply_face_plugins(face, face_plugins)
+            plugins_dto.append(face._plugins_dto)
+            execution_times.append(face.execution_time)
+        batch.add_plugin_results(plugins_dto, execution_times)
+        return batch
+
+    def _get_face(self, img: Array3D, batch: FaceBatch, i: int) -> plugin_result.FaceDTO:
+        box = batch.box(i)
+        return plugin_result.FaceDTO(
+            img=img, face_img=self.crop_face(img, box), box=box,
+            execution_time={slug: int(times[i]) for slug, times in batch.execution_times.items()}
+        )
+
+    def _fetch_faces(self, img: Array3D, det_prob_threshold: float = None,
+                     regions: Optional[List[BoundingBoxDTO]] = None,
+                     options: DetectionOptions = None,
+                     limit: int = None,
+                     img_key: bytes = None) -> FaceBatch:
+        with span('detection'), elapsed_time_contextmanager() as get_elapsed_time:
+            if regions is None and options and options.tile_size and max(img.shape[:2]) > options.tile_size:
+                batch = FaceBatch.from_boxes(self._find_faces_tiled(img, det_prob_threshold, options))
+            else:
+                with self.replica() as detector:
+                    if regions is None:
+                        batch = self._find_faces_cached(detector, img, img_key, det_prob_threshold, options)
+                    else:
+                        batch = FaceBatch.from_boxes(
+                            detector.find_faces_in_regions(img, regions, det_prob_threshold, options))
+            batch = batch.sorted_by_area()
+            if limit:
+                batch = batch[:limit]
+        batch.set_execution_time(self.slug, get_elapsed_time())
+        return batch
+
+    def _find_faces_cached(self, detector, img: Array3D, img_key: Optional[bytes],
+                           det_prob_threshold: float = None,
+                           options: DetectionOptions = None) -> FaceBatch:
+        """ Candidates are found with the floor threshold and selected by the requested one """
+        if det_prob_threshold is None:
+            det_prob_threshold = self.det_prob_threshold
+        options = options or DetectionOptions()
+        if img_key is None or options.skip_detection or det_prob_threshold < detection_cache.floor:
+            return detector.find_faces_batch(img, det_prob_threshold, options)
+
+        key = (img_key, str(self), options, detection_cache.floor)
+        candidates = detection_cache.get(key)
+        if candidates is None:
+            candidates = detector.find_candidates(img, detection_cache.floor, options)
+            detection_cache.put(key, candidates)
+        return FaceBatch.from_boxes(detector.select_faces(img, candidates, det_prob_threshold, options))
 
-        return [
-            plugin_result.FaceDTO(
-                img=img, face_img=self.crop_face(img, box), box=box,
-                execution_time={self.slug: get_elapsed_time() // len(boxes)}
-            ) for box in boxes
-        ]
+    def find_candidates(self, img: Array3D, floor: float, options: DetectionOptions) -> List[BoundingBoxDTO]:
+        """
+        Boxes which `select_faces` selects from for any threshold above `floor`.
+        Detectors drop boxes with probability not above the threshold one by one,
+        so filtering afterwards gives the same boxes.
+        """
+        return self.find_faces(img, floor, options)
+
+    def select_faces(self, img: Array3D, candidates: List[BoundingBoxDTO], det_prob_threshold: float,
+                     options: DetectionOptions) -> List[BoundingBoxDTO]:
+        return [box for box in candidates if box.probability > det_prob_threshold]
+
+    def _find_faces_tiled(self, img: Array3D, det_prob_threshold: float,
+                          options: DetectionOptions) -> List[BoundingBoxDTO]:
+        """
+        Small faces are found in overlapping tiles at native resolution, large ones in the downscaled image.
+        Tiles are detected in parallel by free replicas of the detector.
+        """
+        height, width = img.shape[:2]
+        tile_options = attr.evolve(options, max_image_side=None)
+
+        def find_in_tile(tile: BoundingBoxDTO) -> List[BoundingBoxDTO]:
+            with span('detect_tile', x=tile.x_min, y=tile.y_min), self.replica() as detector:
+                boxes = detector.find_faces(crop_img(img, tile), det_prob_threshold, tile_options)
+            return [box.shifted(tile.x_min, tile.y_min) for box in boxes
+                    if not is_cut_by_seam(box, tile, width, height)]
+
+        def find_in_img() -> List[BoundingBoxDTO]:
+            with span('detect_downscaled'), self.replica() as detector:
+                return detector.find_faces(img, det_prob_threshold, options)
+
+        tiles = get_tiles(width, height, options.tile_size, options.tile_overlap)
+        # every task gets a copy of the request context, so its spans are added to the request trace
+        futures = [tile_executor.submit(copy_context().run, find_in_tile, tile) for tile in tiles]
+        futures.append(tile_executor.submit(copy_context().run, find_in_img))
+        boxes = [box for future in futures for box in future.result()]
+        return non_max_suppression(boxes, self.REGIONS_IOU_THRESHOLD)
 
     def _apply_face_plugins(self, face: plugin_result.FaceDTO,
                             face_plugins: Tuple[base.BasePlugin]):
         for plugin in face_plugins:
             try:
-                with elapsed_time_contextmanager() as get_elapsed_time:
-                    result_dto = plugin(face)
+                with span(f'plugin_{plugin.slug}'), plugin.replica() as replica, \
+                        elapsed_time_contextmanager() as get_elapsed_time:
+                    result_dto = replica(face)
                 face._plugins_dto.append(result_dto)
             except Exception as e:
                 raise exceptions.PluginError(f'{plugin} error - {e}')
@@ -74,10 +187,33 @@ class FaceDetectorMixin(ABC):
                 face.execution_time[plugin.slug] = get_elapsed_time()
 
     @abstractmethod
-    def find_faces(self, img: Array3D, det_prob_threshold: float = None) -> List[BoundingBoxDTO]:
+    def find_faces(self, img: Array3D, det_prob_threshold: float = None,
+                   options: DetectionOptions = None) -> List[BoundingBoxDTO]:
         """ Find face bounding boxes, without calculating embeddings"""
         raise NotImplementedError
 
+    def find_faces_batch(self, img: Array3D, det_prob_threshold: float = None,
+                         options: DetectionOptions = None) -> FaceBatch:
+        """ Boxes, scores and landmarks of `find_faces` as arrays, detectors override it to build them directly """
+        return FaceBatch.from_boxes(self.find_faces(img, det_prob_threshold, options))
+
+    def find_faces_in_regions(self, img: Array3D, regions: List[BoundingBoxDTO],
+                              det_prob_threshold: float = None,
+                              options: DetectionOptions = None) -> List[BoundingBoxDTO]:
+        """ Find face bounding boxes only inside the given regions of the image """
+        boxes = []
+        for region in regions:
+            if not region.width or not region.height:
+                continue
+            region_img = crop_img(img, region)
+            if not region_img.size:
+                # the region is outside of the image
+                continue
+            region_boxes = self.find_faces(region_img, det_prob_threshold, options)
+            boxes.extend(box.shifted(region.x_min, region.y_min) for box in region_boxes)
+        # the same face might be found in several overlapping regions
+        return non_max_suppression(boxes, self.REGIONS_IOU_THRESHOLD)
+
     @abstractmethod
     def crop_face(self, img: Array3D, box: BoundingBoxDTO) -> Array3D:
         """ Crop face by bounding box and resize/squish it """
@@ -0,0 +1,105 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import List
+
+from src.services.facescan.plugins.thread_budget import get_thread_budget
+from src.services.tracing.spans import span
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaPool:
+    """
+    Lends replicas of a plugin to threads one at a time. Every replica is a separate
+    instance of the plugin, so it loads its own model (TF session, MXNet module)
+    on the first use and is never used by two threads at once.
+    """
+
+    def __init__(self, plugin, size: int):
+        assert size >= 1
+        self.size = size
+        thread_budget = get_thread_budget(size)
+        self._replicas: List = [plugin] + [plugin.create_replica() for _ in range(size - 1)]
+        self._free = queue.Queue()
+        for replica in self._replicas:
+            replica.thread_budget = thread_budget
+            self._free.put(replica)
+
+        self._lock = threading.Lock()
+        self._started_s = time.time()
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._acquired = 0
+        self._waited = 0
+        self._wait_s = 0.0
+        self._busy_s = 0.0
+
+    @contextmanager
+    def acquire(self):
+        start = time.time()
+        try:
+            replica = self._free.get_nowait()
+        except queue.Empty:
+            with span('wait_replica', pool_size=self.size):
+                replica = self._free.get()
+            with self._lock:
+                self._waited += 1
+        acquired_s = time.time()
+        with self._lock:
+            self._acquired += 1
+            self._wait_s += acquired_s - start
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        try:
+            yield replica
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._busy_s += time.time() - acquired_s
+            self._free.put(replica)
+
+    def unload(self) -> bool:
+        """ Unloads models of all replicas, unless some of them are in use """
+        replicas = []
+        try:
+            for _ in range(self.size):
+                replicas.append(self._free.get_nowait())
+        except queue.Empty:
+            return False
+        else:
+            for replica in replicas:
+                replica.unload_models()
+            return True
+        finally:
+            for replica in replicas:
+                self._free.put(replica)
+
+    def stats(self) -> dict:
+        with self._lock:
+            uptime_s = max(time.time() - self._started_s, 1e-6)
+            return dict(
+                size=self.size,
+                in_use=self._in_use,
+                peak_in_use=self._peak_in_use,
+                acquired=self._acquired,
+                waited=self._waited,
+                wait_ms=int(self._wait_s * 1000),
+                utilization=round(self._busy_s / (uptime_s * self.size), 4),
+            )
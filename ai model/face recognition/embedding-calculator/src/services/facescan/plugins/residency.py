@@ -0,0 +1,121 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Collection, List, Optional
+
+from src.constants import ENV
+
+logger = logging.getLogger(__name__)
+
+
+class EvictionReason:
+    IDLE = 'idle'
+    MEMORY = 'memory'
+
+
+class ModelResidency:
+    """
+    Keeps track of plugins with loaded models in least recently used order. Models of plugins
+    unused for `idle_timeout_s`, and the least recently used ones while RSS is above `evict_rss_mb`,
+    are unloaded and loaded again on the next use.
+    """
+
+    def __init__(self, idle_timeout_s: float, evict_rss_mb: float, max_events: int = 50,
+                 clock: Callable[[], float] = time.time):
+        self._idle_timeout_s = idle_timeout_s
+        self._evict_rss_mb = evict_rss_mb
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_used_s = OrderedDict()
+        self._events = deque(maxlen=max_events)
+        self._loads = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._idle_timeout_s or self._evict_rss_mb)
+
+    def used(self, plugin, load_s: Optional[float] = None):
+        """ `load_s` is the duration of the use which loaded models of the plugin, including the inference """
+        with self._lock:
+            now_s = self._clock()
+            if load_s is not None:
+                self._loads += 1
+                self._events.append(dict(time=round(now_s, 3), event='load', plugin=plugin.slug,
+                                         ms=int(load_s * 1000)))
+                logger.debug(f'Loaded models of {plugin} in {load_s:.2f}s')
+            elif plugin not in self._last_used_s:
+                return
+            self._last_used_s[plugin] = now_s
+            self._last_used_s.move_to_end(plugin)
+
+    def _get_eviction_reason(self, last_used_s: float, now_s: float, rss_mb: Optional[float]) -> Optional[str]:
+        if self._idle_timeout_s and now_s - last_used_s >= self._idle_timeout_s:
+            return EvictionReason.IDLE
+        if self._evict_rss_mb and rss_mb is not None and rss_mb >= self._evict_rss_mb:
+            return EvictionReason.MEMORY
+        return None
+
+    def evict(self, rss_mb: Optional[float], pinned: Collection = ()) -> List[str]:
+        """
+        Unloads models of idle plugins, and of the least recently used plugin when RSS is too high.
+        Plugins in use and `pinned` ones (e.g. the detector and the calculator) are kept.
+        """
+        if not self.enabled:
+            return []
+        with self._lock:
+            now_s = self._clock()
+            candidates = [(plugin, last_used_s) for plugin, last_used_s in self._last_used_s.items()
+                          if plugin not in pinned]
+        evicted = []
+        for plugin, last_used_s in candidates:
+            reason = self._get_eviction_reason(last_used_s, now_s, rss_mb)
+            if reason is None or not plugin.replica_pool.unload():
+                continue
+            with self._lock:
+                if self._last_used_s.get(plugin) != last_used_s:
+                    # used again in the meantime, its models are being loaded again
+                    continue
+                del self._last_used_s[plugin]
+                self._evictions += 1
+                self._events.append(dict(time=round(now_s, 3), event='evict', plugin=plugin.slug, reason=reason,
+                                         idle_s=round(now_s - last_used_s, 1)))
+            logger.info(f'Unloaded models of {plugin}, reason: {reason}')
+            evicted.append(plugin.slug)
+            if reason == EvictionReason.MEMORY:
+                # RSS is measured again after the next request
+                rss_mb = None
+        if evicted:
+            # TensorFlow graphs and sessions are freed with reference cycles
+            gc.collect()
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            now_s = self._clock()
+            return dict(
+                loaded={plugin.slug: round(now_s - last_used_s, 1)
+                        for plugin, last_used_s in self._last_used_s.items()},
+                loads=self._loads,
+                evictions=self._evictions,
+                events=list(self._events),
+            )
+
+
+model_residency = ModelResidency(idle_timeout_s=ENV.MODEL_IDLE_TIMEOUT_S, evict_rss_mb=ENV.MODEL_EVICT_RSS_MB)
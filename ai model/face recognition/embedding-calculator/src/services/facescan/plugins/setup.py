@@ -17,6 +17,7 @@ if __name__ == '__main__':
     install_requirements(plugin_manager.requirements)
 
     for plugin in plugin_manager.plugins:
-        if plugin.ml_model:
+        if plugin.required_ml_models:
             print(f'Checking models for {plugin}...')
-            plugin.ml_model.download_if_not_exists()
+        for ml_model in plugin.required_ml_models:
+            ml_model.download_if_not_exists()
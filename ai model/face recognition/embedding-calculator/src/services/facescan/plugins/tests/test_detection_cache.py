@@ -0,0 +1,79 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import numpy as np
+import pytest
+
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.facescan.detection_cache import detection_cache
+from src.services.facescan.plugins import base, mixins
+
+CANDIDATES = [BoundingBoxDTO(0, 0, 50, 50, 0.95), BoundingBoxDTO(50, 50, 90, 90, 0.7),
+              BoundingBoxDTO(0, 50, 40, 90, 0.55)]
+
+
+class CountingDetector(mixins.FaceDetectorMixin, base.BasePlugin):
+    IMAGE_SIZE = 100
+    det_prob_threshold = 0.8
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def find_faces(self, img, det_prob_threshold=None, options=None):
+        self.calls.append(det_prob_threshold)
+        return [box for box in CANDIDATES if box.probability > det_prob_threshold]
+
+    def crop_face(self, img, box):
+        return img
+
+
+@pytest.fixture(autouse=True)
+def enabled_cache(monkeypatch):
+    monkeypatch.setattr(detection_cache, 'maxsize', 16)
+
+
+def test__given_retry_with_lower_threshold__when_detecting__then_refilters_cached_candidates():
+    detector = CountingDetector()
+    img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+    img_key = detection_cache.get_key(b'retried file')
+
+    first = detector(img, img_key=img_key)
+    retry = detector(img, det_prob_threshold=0.6, img_key=img_key)
+
+    assert [face.box.probability for face in first] == [0.95]
+    assert [face.box.probability for face in retry] == [0.95, 0.7]
+    assert detector.calls == [detection_cache.floor]
+    assert first[0].box is not retry[0].box
+
+
+def test__given_no_img_key__when_detecting__then_runs_detector_with_requested_threshold():
+    detector = CountingDetector()
+    img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+
+    detector(img)
+    detector(img)
+
+    assert detector.calls == [detector.det_prob_threshold] * 2
+
+
+def test__given_threshold_below_floor__when_detecting__then_runs_detector_with_it():
+    detector = CountingDetector()
+    img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+    threshold = detection_cache.floor / 2
+
+    faces = detector(img, det_prob_threshold=threshold, img_key=detection_cache.get_key(b'file'))
+
+    assert len(faces) == 3
+    assert detector.calls == [threshold]
@@ -0,0 +1,69 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from cached_property import threaded_cached_property
+
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.facescan.detection_options import DetectionOptions
+from src.services.facescan.plugins import base, mixins
+
+IMG = np.zeros((100, 100, 3))
+THREADS = 8
+
+
+class SlowLoadingDetector(mixins.FaceDetectorMixin, base.BasePlugin):
+    IMAGE_SIZE = 100
+    det_prob_threshold = 0.8
+    model_loads = 0
+
+    @threaded_cached_property
+    def _model(self):
+        SlowLoadingDetector.model_loads += 1
+        time.sleep(0.05)
+        return object()
+
+    def find_faces(self, img, det_prob_threshold=None, options=None):
+        assert self._model
+        if options.skip_detection:
+            return [BoundingBoxDTO(0, 0, img.shape[1], img.shape[0], 1)]
+        return []
+
+    def crop_face(self, img, box):
+        return img
+
+
+def test__given_concurrent_requests__when_detecting__then_loads_model_once():
+    detector = SlowLoadingDetector()
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        list(executor.map(lambda _: detector(IMG, options=DetectionOptions()), range(THREADS)))
+
+    assert SlowLoadingDetector.model_loads == 1
+
+
+def test__given_concurrent_requests_with_different_options__when_detecting__then_each_uses_own_options():
+    detector = SlowLoadingDetector()
+    skip_detection_flags = [i % 2 == 0 for i in range(THREADS * 4)]
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        faces_counts = list(executor.map(
+            lambda skip: len(detector(IMG, options=DetectionOptions(skip_detection=skip))),
+            skip_detection_flags
+        ))
+
+    assert faces_counts == [int(skip) for skip in skip_detection_flags]
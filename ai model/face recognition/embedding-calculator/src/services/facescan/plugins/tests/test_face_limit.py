@@ -0,0 +1,69 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import numpy as np
+
+from src.services.dto import plugin_result
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.facescan.plugins import base, mixins
+
+BOXES = [BoundingBoxDTO(0, 0, 20, 20, 0.9), BoundingBoxDTO(20, 20, 80, 80, 0.9),
+         BoundingBoxDTO(0, 50, 40, 90, 0.9)]
+
+
+class Detector(mixins.FaceDetectorMixin, base.BasePlugin):
+    IMAGE_SIZE = 100
+    det_prob_threshold = 0.8
+
+    def find_faces(self, img, det_prob_threshold=None, options=None):
+        return BOXES
+
+    def crop_face(self, img, box):
+        return img
+
+
+class CountingPlugin(base.BasePlugin):
+    slug = 'counting'
+    boxes = []
+
+    def __call__(self, face):
+        self.boxes.append(face.box)
+        return object()
+
+
+def test__given_limit__when_detecting__then_plugins_run_only_on_largest_faces():
+    plugin = CountingPlugin()
+    img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+
+    faces = Detector()(img, face_plugins=(plugin,), limit=2)
+
+    assert [face.box for face in faces] == [BOXES[1], BOXES[2]]
+    assert CountingPlugin.boxes == [BOXES[1], BOXES[2]]
+
+
+class BoxPlugin(base.BasePlugin):
+    slug = 'box_size'
+
+    def __call__(self, face):
+        return plugin_result.PoseDTO(pitch=face.box.width, yaw=face._face_img.shape[0], roll=0)
+
+
+def test__given_limit__when_detecting_batch__then_results_of_largest_faces_are_columns():
+    img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+
+    batch = Detector().run_batch(img, face_plugins=(BoxPlugin(),), limit=2)
+
+    assert batch.to_boxes() == [BOXES[1], BOXES[2]]
+    assert [pose['pitch'] for pose in batch.columns['pose']] == [60, 40]
+    assert [face['execution_time'].keys() for face in batch.to_json()] == [{'detector', 'box_size'}] * 2
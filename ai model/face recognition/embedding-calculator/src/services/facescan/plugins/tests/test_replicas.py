@@ -0,0 +1,78 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cached_property import threaded_cached_property
+
+from src.services.facescan.plugins import base
+from src.services.facescan.plugins.replicas import ReplicaPool
+
+
+class ModelPlugin(base.BasePlugin):
+    slug = 'model'
+
+    @threaded_cached_property
+    def _model(self):
+        return object()
+
+    def __call__(self, face):
+        return self._model
+
+
+def test__given_pool__when_acquiring_concurrently__then_replicas_are_not_shared():
+    pool = ReplicaPool(ModelPlugin(), size=2)
+    in_use, overlaps = set(), []
+    lock = threading.Lock()
+
+    def use_replica(_):
+        with pool.acquire() as replica:
+            with lock:
+                overlaps.append(id(replica) in in_use)
+                in_use.add(id(replica))
+            time.sleep(0.01)
+            with lock:
+                in_use.remove(id(replica))
+            return replica(None)
+
+    with ThreadPoolExecutor(4) as executor:
+        models = list(executor.map(use_replica, range(8)))
+
+    assert not any(overlaps)
+    assert len({id(model) for model in models}) == 2
+
+
+def test__given_all_replicas_busy__when_acquiring__then_waits_and_reports_it():
+    pool = ReplicaPool(ModelPlugin(), size=1)
+    released = threading.Event()
+
+    def hold_replica():
+        with pool.acquire():
+            released.wait()
+
+    holder = threading.Thread(target=hold_replica)
+    holder.start()
+    time.sleep(0.01)
+    threading.Timer(0.05, released.set).start()
+    with pool.acquire():
+        pass
+    holder.join()
+
+    stats = pool.stats()
+    assert stats['acquired'] == 2
+    assert stats['waited'] == 1
+    assert stats['peak_in_use'] == 1
+    assert stats['in_use'] == 0
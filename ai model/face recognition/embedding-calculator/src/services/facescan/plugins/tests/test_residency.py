@@ -0,0 +1,158 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from collections import namedtuple
+
+import pytest
+from cached_property import threaded_cached_property
+
+from src.services.facescan.plugins import base
+from src.services.facescan.plugins.residency import ModelResidency
+
+
+class _ModelPlugin(base.BasePlugin):
+    @threaded_cached_property
+    def _model(self):
+        return object()
+
+    def __call__(self, face):
+        return self._model
+
+
+class AgePlugin(_ModelPlugin):
+    slug = 'age'
+
+
+class MaskPlugin(_ModelPlugin):
+    slug = 'mask'
+
+
+class PosePlugin(base.BasePlugin):
+    slug = 'pose'
+
+    def __call__(self, face):
+        return None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now_s = 1000.0
+
+    def __call__(self):
+        return self.now_s
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def residency_factory(monkeypatch, clock):
+    def create(**kwargs):
+        residency = ModelResidency(clock=clock, **kwargs)
+        monkeypatch.setattr(base, 'model_residency', residency)
+        for plugin_class in (AgePlugin, MaskPlugin, PosePlugin):
+            plugin_class().unload_models()
+        return residency
+    return create
+
+
+def _use(plugin):
+    with plugin.replica() as replica:
+        return replica(None)
+
+
+def test__given_plugins_used__when_getting_stats__then_reports_loads_of_plugins_with_models(residency_factory, clock):
+    residency = residency_factory(idle_timeout_s=60, evict_rss_mb=0)
+
+    _use(AgePlugin())
+    _use(PosePlugin())
+    clock.now_s += 5
+    _use(AgePlugin())
+
+    stats = residency.stats()
+    assert stats['loaded'] == {'age': 0}
+    assert stats['loads'] == 1
+    assert [(event['event'], event['plugin']) for event in stats['events']] == [('load', 'age')]
+
+
+def test__given_idle_plugin__when_evicting__then_unloads_it_and_reloads_on_next_use(residency_factory, clock):
+    residency = residency_factory(idle_timeout_s=60, evict_rss_mb=0)
+    model = _use(AgePlugin())
+    _use(MaskPlugin())
+    clock.now_s += 30
+    _use(MaskPlugin())
+    clock.now_s += 40
+
+    evicted = residency.evict(rss_mb=None, pinned=())
+
+    assert evicted == ['age']
+    assert not AgePlugin().models_loaded
+    assert MaskPlugin().models_loaded
+    assert _use(AgePlugin()) is not model
+    assert residency.stats()['loads'] == 3
+    assert residency.stats()['events'][-2] == dict(time=1070.0, event='evict', plugin='age', reason='idle', idle_s=70.0)
+
+
+def test__given_rss_above_threshold__when_evicting__then_unloads_least_recently_used_unpinned_plugin(
+        residency_factory, clock):
+    residency = residency_factory(idle_timeout_s=0, evict_rss_mb=1000)
+    _use(MaskPlugin())
+    clock.now_s += 1
+    _use(AgePlugin())
+
+    assert residency.evict(rss_mb=999, pinned=()) == []
+    assert residency.evict(rss_mb=1500, pinned=(MaskPlugin(),)) == ['age']
+    assert MaskPlugin().models_loaded
+    assert residency.stats()['evictions'] == 1
+
+
+def test__given_plugin_in_use__when_evicting__then_keeps_its_models(residency_factory, clock):
+    residency = residency_factory(idle_timeout_s=60, evict_rss_mb=0)
+    _use(AgePlugin())
+    clock.now_s += 100
+
+    with AgePlugin().replica():
+        evicted = residency.evict(rss_mb=None, pinned=())
+
+    assert evicted == []
+    assert AgePlugin().models_loaded
+
+
+class FakeSession:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class SessionPlugin(base.BasePlugin):
+    slug = 'session'
+
+    @threaded_cached_property
+    def _model(self):
+        return namedtuple('Model', 'sess predict')(sess=FakeSession(), predict=None)
+
+    def __call__(self, face):
+        return self._model
+
+
+def test__given_model_with_session__when_unloading__then_closes_session(residency_factory, clock):
+    residency = residency_factory(idle_timeout_s=60, evict_rss_mb=0)
+    model = _use(SessionPlugin())
+    clock.now_s += 100
+
+    assert residency.evict(rss_mb=None, pinned=()) == ['session']
+    assert model.sess.closed
@@ -0,0 +1,83 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src.constants import ENV
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.facescan.detection_options import DetectionOptions
+from src.services.facescan.plugins import base, mixins
+from src.services.facescan.tiling import create_tile_executor
+
+
+class WhiteSquaresDetector(mixins.FaceDetectorMixin, base.BasePlugin):
+    """ Finds white squares, but loses them in images larger than the limit as if they were downscaled """
+    IMAGE_SIZE = 100
+    IMG_LENGTH_LIMIT = 400
+    det_prob_threshold = 0.8
+
+    def find_faces(self, img, det_prob_threshold=None, options=None):
+        if max(img.shape[:2]) > self.IMG_LENGTH_LIMIT:
+            return []
+        mask = (img[:, :, 0] == 255).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        return [BoundingBoxDTO(x, y, x + w, y + h, 0.9) for x, y, w, h, _ in stats[1:count]]
+
+    def crop_face(self, img, box):
+        return img
+
+
+def test__given_large_image__when_detecting_in_tiles__then_finds_small_faces_once():
+    img = np.zeros((700, 1000, 3), dtype=np.uint8)
+    # the first face is cut by the seam of the first tile
+    img[100:140, 380:420] = 255
+    img[500:540, 800:840] = 255
+
+    faces = WhiteSquaresDetector()(img, options=DetectionOptions(tile_size=400, tile_overlap=100))
+
+    assert sorted(face.box.xy for face in faces) == [((380, 100), (420, 140)), ((800, 500), (840, 540))]
+
+
+class SlowDetector(mixins.FaceDetectorMixin, base.BasePlugin):
+    """ Counts its replicas detecting at the same time """
+    IMAGE_SIZE = 100
+    det_prob_threshold = 0.8
+    lock = threading.Lock()
+    running, max_running = 0, 0
+
+    def find_faces(self, img, det_prob_threshold=None, options=None):
+        with self.lock:
+            SlowDetector.running += 1
+            SlowDetector.max_running = max(SlowDetector.max_running, SlowDetector.running)
+        time.sleep(0.05)
+        with self.lock:
+            SlowDetector.running -= 1
+        return []
+
+    def crop_face(self, img, box):
+        return img
+
+
+def test__given_two_replicas__when_detecting_in_tiles__then_tiles_are_detected_concurrently(monkeypatch):
+    monkeypatch.setattr(ENV, 'MODEL_REPLICAS', 2)
+    monkeypatch.setattr(mixins, 'tile_executor', create_tile_executor())
+    img = np.zeros((700, 1000, 3), dtype=np.uint8)
+
+    SlowDetector()(img, options=DetectionOptions(tile_size=400, tile_overlap=100))
+
+    assert SlowDetector.max_running == 2
@@ -0,0 +1,86 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+"""
+Every inference library (TF, MXNet, OpenMP/MKL, OpenCV) sizes its thread pool by the count
+of cores, so several uWSGI workers with several model replicas oversubscribe a node.
+By default the cores are shared equally between all replicas of all workers.
+"""
+
+import logging
+import os
+import sys
+
+import cv2
+from threadpoolctl import threadpool_limits
+
+from src.constants import ENV
+
+logger = logging.getLogger(__name__)
+
+
+def get_thread_budget(replicas_count: int = None, threads: int = None, processes: int = None) -> int:
+    """
+    CPU threads a model replica may use
+    >>> get_thread_budget(replicas_count=2, threads=3)
+    3
+    >>> get_thread_budget(replicas_count=os.cpu_count(), threads=0, processes=2)
+    1
+    """
+    threads = ENV.INTRA_OP_THREADS if threads is None else threads
+    if threads:
+        return threads
+    replicas_count = ENV.MODEL_REPLICAS if replicas_count is None else replicas_count
+    processes = ENV.UWSGI_PROCESSES if processes is None else processes
+    return max(1, (os.cpu_count() or 1) // (replicas_count * processes))
+
+
+def set_thread_env():
+    """ Has to run before inference libraries are imported, explicitly set variables are kept """
+    omp_threads = str(ENV.OMP_THREADS or get_thread_budget())
+    os.environ.setdefault('OMP_NUM_THREADS', omp_threads)
+    os.environ.setdefault('MKL_NUM_THREADS', omp_threads)
+    os.environ.setdefault('OPENBLAS_NUM_THREADS', omp_threads)
+    if ENV.INTER_OP_THREADS:
+        os.environ.setdefault('MXNET_CPU_WORKER_NTHREADS', str(ENV.INTER_OP_THREADS))
+    intel_optimization = '1' if ENV.INTEL_OPTIMIZATION else '0'
+    os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', intel_optimization)
+    os.environ.setdefault('MXNET_MKLDNN_ENABLED', intel_optimization)
+
+
+def limit_threads():
+    """ Limits thread pools of already loaded libraries """
+    threadpool_limits(ENV.OMP_THREADS or get_thread_budget())
+    cv2.setNumThreads(ENV.CV2_THREADS or get_thread_budget())
+    if 'tensorflow' in sys.modules:
+        _limit_tensorflow_threads(sys.modules['tensorflow'])
+
+
+def _limit_tensorflow_threads(tf):
+    """ Global settings are used by Keras models, e.g. MTCNN """
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(get_thread_budget())
+        tf.config.threading.set_inter_op_parallelism_threads(ENV.INTER_OP_THREADS)
+    except RuntimeError:
+        logger.warning('TensorFlow runtime is already initialized, its thread pools are not limited')
+
+
+def get_tf_session_threads(thread_budget: int = None) -> dict:
+    """
+    Arguments for tf.ConfigProto of a session
+    >>> get_tf_session_threads(4)['intra_op_parallelism_threads']
+    4
+    """
+    return dict(intra_op_parallelism_threads=thread_budget or get_thread_budget(),
+                inter_op_parallelism_threads=ENV.INTER_OP_THREADS)
@@ -13,12 +13,14 @@
 #  permissions and limitations under the License.
 
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 
 from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.dto.face_batch import FaceBatch
 from src.services.dto.plugin_result import FaceDTO, EmbeddingDTO
+from src.services.facescan.detection_options import DetectionOptions
 from src.services.imgtools.types import Array3D
 from src.services.facescan.plugins.managers import plugin_manager
 
@@ -35,10 +37,19 @@ class FaceScanner(ABC):
         return cls.instance
 
     @abstractmethod
-    def scan(self, img: Array3D, det_prob_threshold: float = None) -> List[FaceDTO]:
+    def scan(self, img: Array3D, det_prob_threshold: float = None,
+             options: DetectionOptions = None, limit: int = None,
+             regions: Optional[List[BoundingBoxDTO]] = None, img_key: bytes = None) -> List[FaceDTO]:
         """ Find face bounding boxes and calculate embeddings"""
         raise NotImplementedError
 
+    @abstractmethod
+    def scan_batch(self, img: Array3D, det_prob_threshold: float = None,
+                   options: DetectionOptions = None, limit: int = None,
+                   regions: Optional[List[BoundingBoxDTO]] = None, img_key: bytes = None) -> FaceBatch:
+        """ The same as scan, but faces are returned as a FaceBatch"""
+        raise NotImplementedError
+
     @abstractmethod
     def find_faces(self, img: Array3D, det_prob_threshold: float = None) -> List[BoundingBoxDTO]:
         """ Find face bounding boxes, without calculating embeddings"""
@@ -58,9 +69,19 @@ class ScannerWithPluggins(FaceScanner):
     """
     ID = "ScannerWithPlugins"
 
-    def scan(self, img: Array3D, det_prob_threshold: float = None):
+    def scan(self, img: Array3D, det_prob_threshold: float = None,
+             options: DetectionOptions = None, limit: int = None,
+             regions: Optional[List[BoundingBoxDTO]] = None, img_key: bytes = None):
         return plugin_manager.detector(img, det_prob_threshold,
-                                       [plugin_manager.calculator])
+                                       [plugin_manager.calculator], regions=regions,
+                                       options=options, limit=limit, img_key=img_key)
+
+    def scan_batch(self, img: Array3D, det_prob_threshold: float = None,
+                   options: DetectionOptions = None, limit: int = None,
+                   regions: Optional[List[BoundingBoxDTO]] = None, img_key: bytes = None) -> FaceBatch:
+        return plugin_manager.detector.run_batch(img, det_prob_threshold,
+                                                 [plugin_manager.calculator], regions=regions,
+                                                 options=options, limit=limit, img_key=img_key)
 
     def find_faces(self, img: Array3D, det_prob_threshold: float = None) -> List[BoundingBoxDTO]:
         return plugin_manager.detector.find_faces(img, det_prob_threshold)
@@ -73,10 +94,23 @@ class ScannerWithPluggins(FaceScanner):
 class MockScanner(FaceScanner):
     ID = 'MockScanner'
 
-    def scan(self, img: Array3D, det_prob_threshold: float = None) -> List[FaceDTO]:
+    def scan(self, img: Array3D, det_prob_threshold: float = None,
+             options: DetectionOptions = None, limit: int = None,
+             regions: Optional[List[BoundingBoxDTO]] = None, img_key: bytes = None) -> List[FaceDTO]:
         return [FaceDTO(box=BoundingBoxDTO(0, 0, 0, 0, 0),
                         plugins_dto=[EmbeddingDTO(embedding=np.random.rand(1))],
                         img=img, face_img=img)]
 
+    def scan_batch(self, img: Array3D, det_prob_threshold: float = None,
+                   options: DetectionOptions = None, limit: int = None,
+                   regions: Optional[List[BoundingBoxDTO]] = None, img_key: bytes = None) -> FaceBatch:
+        batch = FaceBatch.from_boxes([BoundingBoxDTO(0, 0, 0, 0, 0)])
+        batch.add_plugin_results([[EmbeddingDTO(embedding=np.random.rand(1))]], [{}])
+        return batch
+
     def find_faces(self, img: Array3D, det_prob_threshold: float = None) -> List[BoundingBoxDTO]:
         return [BoundingBoxDTO(0, 0, 0, 0, 0)]
+
+    @property
+    def difference_threshold(self):
+        return 0.5
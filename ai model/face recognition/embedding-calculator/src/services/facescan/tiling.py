@@ -0,0 +1,76 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from src.constants import ENV
+from src.services.dto.bounding_box import BoundingBoxDTO
+
+# a face touching an inner edge of a tile is likely cut, it is found whole in the neighbouring tile
+SEAM_MARGIN = 2
+
+
+def create_tile_executor(replicas_count: int = None) -> ThreadPoolExecutor:
+    """
+    Tiles are detected by replicas of the detector, so more threads would only wait for them.
+    With the default single replica tiles are detected one after another, each by a replica using all of its cores
+    (see `thread_budget`), and in parallel only with `MODEL_REPLICAS` > 1.
+    """
+    replicas_count = ENV.MODEL_REPLICAS if replicas_count is None else replicas_count
+    return ThreadPoolExecutor(replicas_count, thread_name_prefix='tile')
+
+
+tile_executor = create_tile_executor()
+
+
+def _get_offsets(length: int, tile_size: int, overlap: int) -> List[int]:
+    """
+    >>> _get_offsets(1000, 400, 100)
+    [0, 300, 600]
+    >>> _get_offsets(300, 400, 100)
+    [0]
+    """
+    if length <= tile_size:
+        return [0]
+    stride = tile_size - overlap
+    offsets = list(range(0, length - tile_size, stride))
+    # the last tile is aligned to the edge of the image
+    return offsets + [length - tile_size]
+
+
+def get_tiles(width: int, height: int, tile_size: int, overlap: int) -> List[BoundingBoxDTO]:
+    """
+    Overlapping tiles covering the image, a face smaller than the overlap is whole in at least one tile
+    >>> [tile.xy for tile in get_tiles(700, 400, tile_size=400, overlap=100)]
+    [((0, 0), (400, 400)), ((300, 0), (700, 400))]
+    """
+    return [BoundingBoxDTO(x, y, min(x + tile_size, width), min(y + tile_size, height), probability=1)
+            for y in _get_offsets(height, tile_size, overlap)
+            for x in _get_offsets(width, tile_size, overlap)]
+
+
+def is_cut_by_seam(box: BoundingBoxDTO, tile: BoundingBoxDTO, width: int, height: int) -> bool:
+    """
+    Whether a box found in the tile touches its edge inside of the image
+    >>> tile = BoundingBoxDTO(300, 0, 700, 400, 1)
+    >>> is_cut_by_seam(BoundingBoxDTO(0, 10, 30, 40, 0.9), tile, 700, 400)
+    True
+    >>> is_cut_by_seam(BoundingBoxDTO(370, 0, 400, 40, 0.9), tile, 700, 400)
+    False
+    """
+    return (tile.x_min > 0 and box.x_min <= SEAM_MARGIN
+            or tile.y_min > 0 and box.y_min <= SEAM_MARGIN
+            or tile.x_max < width and box.x_max >= tile.width - SEAM_MARGIN
+            or tile.y_max < height and box.y_max >= tile.height - SEAM_MARGIN)
@@ -18,4 +18,12 @@ API_KEY_HEADER = 'X-Api-Key'
 class ARG:
     LIMIT = 'limit'
     DET_PROB_THRESHOLD = 'det_prob_threshold'
-    FACE_PLUGINS = 'face_plugins'
\ No newline at end of file
+    FACE_PLUGINS = 'face_plugins'
+    DETECT_FACES = 'detect_faces'
+    MAX_IMAGE_SIDE = 'max_image_side'
+    MIN_FACE_SIZE = 'min_face_size'
+    PYRAMID_SCALE_FACTOR = 'pyramid_scale_factor'
+    # tiles are detected in parallel only with MODEL_REPLICAS > 1
+    TILE_SIZE = 'tile_size'
+    TILE_OVERLAP = 'tile_overlap'
+    ROI = 'roi'
\ No newline at end of file
@@ -16,16 +16,68 @@ from json import JSONEncoder
 
 import numpy as np
 
+from src.constants import ENV
 from src.services.dto.json_encodable import JSONEncodable
+from src.services.tracing.spans import span
+
+try:
+    import orjson
+except ImportError:  # optional, responses are serialized by the stdlib encoder without it
+    orjson = None
+
+
+def float16_to_float64(arr: np.ndarray) -> np.ndarray:
+    """
+    float16 values rounded to the 5 significant digits that identify them,
+    so that they are written shorter than all digits of their float64 value
+    >>> float16_to_float64(np.array([0.1, -300, 0, 65504], dtype=np.float16)).tolist()
+    [0.099976, -300.0, 0.0, 65504.0]
+    """
+    values = arr.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exponent = np.floor(np.log10(np.abs(values)))
+    scale = 10.0 ** (4 - np.where(np.isfinite(exponent), exponent, 0))
+    return np.round(values * scale) / scale
+
+
+def _to_json_type(obj):
+    if isinstance(obj, JSONEncodable):
+        return obj.to_json()
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == np.float16:
+            return float16_to_float64(obj).tolist()
+        # orjson serializes only C-contiguous arrays itself
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def orjson_dumps(obj, sort_keys: bool = False, indent: bool = False) -> str:
+    """
+    Numpy arrays and scalars are written by orjson directly, without intermediate lists
+    >>> orjson_dumps({'b': np.arange(3, dtype=np.int32), 'a': np.float32(0.5)}, sort_keys=True)
+    '{"a":0.5,"b":[0,1,2]}'
+    """
+    option = orjson.OPT_SERIALIZE_NUMPY
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_to_json_type, option=option).decode()
 
 
 def add_json_encoding(app):
     class AppJSONEncoder(JSONEncoder):
+        def encode(self, obj):
+            with span('serialize'):
+                if orjson is not None and ENV.FAST_JSON:
+                    return orjson_dumps(obj, self.sort_keys, bool(self.indent))
+                return super().encode(obj)
+
         def default(self, obj):
             if isinstance(obj, JSONEncodable):
                 return obj.to_json()
             if isinstance(obj, np.ndarray):
-                return obj.tolist()
+                return _to_json_type(obj)
             return super().default(obj)
 
     app.json_encoder = AppJSONEncoder
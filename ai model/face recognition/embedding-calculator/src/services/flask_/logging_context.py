@@ -18,18 +18,23 @@ from src.services.flask_.constants import API_KEY_HEADER
 
 
 class FlaskRequestContextAdder(logging.Filter):
+    """ The request dict is built once per request and shared by all its records """
+
     @staticmethod
     def _update_record(record):
-        from flask import request
-        if not request:
+        from flask import g, has_request_context, request
+        if not has_request_context():
             return
-        record.request_dict = dict(
-            method=request.method,
-            path=request.full_path[:-1] if request.full_path.endswith("?") else request.full_path,
-            filename=request.files['file'].filename if 'file' in request.files else '',
-            api_key=request.headers[API_KEY_HEADER] if API_KEY_HEADER in request.headers else '',
-            remote_addr=request.remote_addr
-        )
+        request_dict = g.get('log_request_dict')
+        if request_dict is None:
+            request_dict = g.log_request_dict = dict(
+                method=request.method,
+                path=request.full_path[:-1] if request.full_path.endswith("?") else request.full_path,
+                filename=request.files['file'].filename if 'file' in request.files else '',
+                api_key=request.headers[API_KEY_HEADER] if API_KEY_HEADER in request.headers else '',
+                remote_addr=request.remote_addr
+            )
+        record.request_dict = request_dict
 
     def filter(self, record):
         # noinspection PyTypeChecker
@@ -15,6 +15,7 @@
 import functools
 
 from src.exceptions import NoFileAttachedError, NoFileSelectedError
+from src.services.tracing.spans import span
 
 
 def needs_attached_file(f):
@@ -22,7 +23,10 @@ def needs_attached_file(f):
     def wrapper(*args, **kwargs):
         from flask import request
 
-        if 'file' not in request.files:
+        with span('parse_request'):
+            # the multipart body is parsed on the first access
+            has_file = 'file' in request.files
+        if not has_file:
             raise NoFileAttachedError
 
         file = request.files['file']
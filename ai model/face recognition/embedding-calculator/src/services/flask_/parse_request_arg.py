@@ -12,9 +12,12 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
+from typing import Callable, List, Optional, Union
+
 from flask import Request
 
 from src.exceptions import InvalidRequestArgumentValueError
+from src.services.dto.bounding_box import BoundingBoxDTO
 
 UNDEFINED = '__UNDEFINED__'
 
@@ -42,3 +45,46 @@ def parse_request_string_arg(name: str, default, allowed_values, request: Reques
         raise InvalidRequestArgumentValueError(f"'{name}' parameter accepts only '{', '.join(allowed_values)}' values")
 
     return param_value
+
+
+def parse_request_number_arg(name: str, type_: Callable[[str], Union[int, float]],
+                             min_value: Union[int, float], max_value: Union[int, float],
+                             request: Request) -> Optional[Union[int, float]]:
+    param_value = request.values.get(name.lower(), UNDEFINED)
+    if param_value in (UNDEFINED, ''):
+        return None
+    try:
+        param_value = type_(param_value)
+    except ValueError:
+        raise InvalidRequestArgumentValueError(f"'{name}' parameter accepts only {type_.__name__} values") from None
+    if not (min_value <= param_value <= max_value):
+        raise InvalidRequestArgumentValueError(f"'{name}' parameter accepts only values "
+                                               f"in the range [{min_value};{max_value}]")
+    return param_value
+
+
+def parse_boxes(name: str, values: List[str]) -> Optional[List[BoundingBoxDTO]]:
+    """
+    Boxes given as `x_min,y_min,x_max,y_max`, several boxes are separated by `;` or given as repeated arguments
+    >>> [box.xy for box in parse_boxes('roi', ['0,0,100,50;200,0,300,50', '10,10,20,20'])]
+    [((0, 0), (100, 50)), ((200, 0), (300, 50)), ((10, 10), (20, 20))]
+    >>> parse_boxes('roi', []) is None
+    True
+    >>> parse_boxes('roi', ['100,0,0,50'])  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    src.exceptions.InvalidRequestArgumentValueError: 400 Bad Request: 'roi' parameter accepts only boxes ...
+    """
+    boxes = []
+    for value in values:
+        for box_value in filter(None, value.split(';')):
+            try:
+                x_min, y_min, x_max, y_max = (int(coordinate) for coordinate in box_value.split(','))
+                if not (0 <= x_min < x_max and 0 <= y_min < y_max):
+                    raise ValueError
+            except ValueError:
+                raise InvalidRequestArgumentValueError(
+                    f"'{name}' parameter accepts only boxes in the format x_min,y_min,x_max,y_max "
+                    f"where 0 <= x_min < x_max and 0 <= y_min < y_max") from None
+            boxes.append(BoundingBoxDTO(x_min, y_min, x_max, y_max, probability=1))
+    return boxes or None
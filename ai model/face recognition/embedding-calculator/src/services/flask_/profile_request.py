@@ -0,0 +1,94 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import hmac
+from functools import partial
+
+import attr
+from flask import g, jsonify, request
+from werkzeug.exceptions import BadRequest
+
+from src.constants import ENV
+from src.exceptions import InvalidProfilingTokenError
+from src.services.profiling.profiler import ProfilingSettings, RequestProfiler
+from src.services.utils.pyutils import get_env
+
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+# enables /admin/profiling and profiling of requests sending the token in the header
+PROFILE_TOKEN = get_env('PROFILE_TOKEN', '')
+
+
+def _has_valid_token() -> bool:
+    token = request.headers.get(PROFILE_TOKEN_HEADER, '')
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def _is_profiling_request() -> bool:
+    return bool(request.endpoint) and request.endpoint.startswith('profiling_')
+
+
+def _start_request_profile(profiler: RequestProfiler):
+    """ The profiler decides whether to sample the request, requests with the token are always profiled """
+    if not _is_profiling_request():
+        g.profile = profiler.start(forced=_has_valid_token())
+
+
+def _save_request_profile(profiler: RequestProfiler, _exception=None):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.save(profile, request.endpoint or 'request')
+
+
+def _check_token():
+    if not _has_valid_token():
+        raise InvalidProfilingTokenError
+
+
+def _get_profiling(profiler: RequestProfiler):
+    _check_token()
+    return jsonify(profiler.stats())
+
+
+def _set_profiling(profiler: RequestProfiler):
+    _check_token()
+    changes = request.get_json(silent=True) or {}
+    unknown = set(changes) - {field.name for field in attr.fields(ProfilingSettings)}
+    if unknown:
+        raise BadRequest(f"Unknown profiling settings: {', '.join(sorted(unknown))}")
+    try:
+        profiler.settings.set(**changes)
+    except (ValueError, TypeError) as e:
+        raise BadRequest(str(e)) from None
+    return jsonify(profiler.stats())
+
+
+def _add_profiling_endpoints(app, profiler: RequestProfiler):
+    app.add_url_rule('/admin/profiling', 'profiling_get', partial(_get_profiling, profiler))
+    app.add_url_rule('/admin/profiling', 'profiling_post', partial(_set_profiling, profiler), methods=['POST'])
+
+
+def add_profiling(app):
+    """
+    Profiles a `PROFILE_SAMPLE_RATE` fraction of requests and requests with the `PROFILE_TOKEN`
+    in the header. The rate and the profiler are changed at runtime by `/admin/profiling`.
+    """
+    if not (PROFILE_TOKEN or ENV.PROFILE_SAMPLE_RATE):
+        return
+    defaults = ProfilingSettings(sample_rate=ENV.PROFILE_SAMPLE_RATE, mode=ENV.PROFILE_MODE,
+                                 interval_ms=ENV.PROFILE_INTERVAL_MS)
+    profiler = RequestProfiler(ENV.PROFILE_DIR, defaults, ENV.PROFILE_MAX_FILES)
+    app.before_request(partial(_start_request_profile, profiler))
+    app.teardown_request(partial(_save_request_profile, profiler))
+    if PROFILE_TOKEN:
+        _add_profiling_endpoints(app, profiler)
@@ -0,0 +1,54 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from flask import request
+
+from src.exceptions import InvalidRequestArgumentValueError
+from src.services.flask_.parse_request_arg import parse_request_number_arg
+from src.services.utils.pytestutils import raises
+
+ARG_NAME = 'MIN_FACE_SIZE'
+
+
+def test__given_no_arg__when_parsing_number__then_returns_none(app):
+    with app.test_request_context('/'):
+        value = parse_request_number_arg(ARG_NAME, int, 20, 100, request)
+
+    assert value is None
+
+
+def test__given_arg_in_range__when_parsing_number__then_returns_typed_value(app):
+    with app.test_request_context('/?min_face_size=40'):
+        value = parse_request_number_arg(ARG_NAME, int, 20, 100, request)
+
+    assert value == 40
+
+
+def test__given_arg_out_of_range__when_parsing_number__then_raises_error(app):
+    with app.test_request_context('/?min_face_size=10'):
+        assert raises(InvalidRequestArgumentValueError,
+                      lambda: parse_request_number_arg(ARG_NAME, int, 20, 100, request))
+
+
+def test__given_arg_of_wrong_type__when_parsing_number__then_raises_error(app):
+    with app.test_request_context('/?min_face_size=big'):
+        assert raises(InvalidRequestArgumentValueError,
+                      lambda: parse_request_number_arg(ARG_NAME, int, 20, 100, request))
+
+
+def test__given_arg_in_form__when_parsing_number__then_returns_typed_value(app):
+    with app.test_request_context('/', method='POST', data={'min_face_size': '40'}):
+        value = parse_request_number_arg(ARG_NAME, int, 20, 100, request)
+
+    assert value == 40
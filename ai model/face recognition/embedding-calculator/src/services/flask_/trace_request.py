@@ -0,0 +1,44 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from flask import Response, request
+
+from src.constants import ENV
+from src.services.tracing.export import TraceExporter, to_server_timing
+from src.services.tracing.spans import begin_trace, end_trace
+
+SERVER_TIMING_HEADER = 'Server-Timing'
+
+
+def add_tracing(app):
+    """ Must be added before other `after_request` hooks, Flask calls them in reverse order """
+    if not (ENV.TRACE_RESPONSE_HEADER or ENV.TRACE_SAMPLE_RATE or ENV.TRACE_SLOW_MS):
+        return
+    exporter = TraceExporter(ENV.TRACE_PATH, ENV.TRACE_SAMPLE_RATE, ENV.TRACE_SLOW_MS, ENV.TRACE_MAX_MB)
+
+    @app.before_request
+    def begin_request_trace():
+        begin_trace(request.endpoint or 'request', method=request.method, path=request.path)
+
+    @app.after_request
+    def end_request_trace(response: Response):
+        root = end_trace()
+        if root is None:
+            return response
+        root.args['status'] = response.status_code
+        if ENV.TRACE_RESPONSE_HEADER:
+            response.headers[SERVER_TIMING_HEADER] = to_server_timing(root)
+        if exporter.is_sampled(root):
+            exporter.export(root)
+        return response
@@ -14,6 +14,7 @@
 
 from typing import Tuple
 
+import numpy as np
 from skimage import transform
 
 from src.services.dto.bounding_box import BoundingBoxDTO
@@ -26,3 +27,17 @@ def crop_img(img: Array3D, box: BoundingBoxDTO) -> Array3D:
 
 def squish_img(img: Array3D, dimensions: Tuple[int, int]) -> Array3D:
     return transform.resize(img, dimensions)
+
+
+def prewhiten(img: Array3D, dtype=np.float32) -> Array3D:
+    """
+    Normalizes an image to zero mean and unit variance, computed in the precision of the model input
+    >>> img = prewhiten(np.arange(12, dtype=np.uint8).reshape(2, 2, 3))
+    >>> img.dtype, np.allclose([img.mean(), img.std()], [0, 1], atol=1e-6)
+    (dtype('float32'), True)
+    """
+    img = np.array(img, dtype=dtype)
+    std_adj = max(float(img.std()), 1.0 / np.sqrt(img.size))
+    img -= img.mean()
+    img *= dtype(1 / std_adj)
+    return img
@@ -17,6 +17,7 @@ import numpy as np
 
 from src.exceptions import ImageReadLibraryError, OneDimensionalImageIsGivenError
 from src.services.imgtools.types import Array3D
+from src.services.tracing.spans import span
 
 
 def _grayscale_to_rgb(img):
@@ -29,7 +30,8 @@ def _grayscale_to_rgb(img):
 
 def read_img(file) -> Array3D:
     try:
-        arr = imageio.imread(file)
+        with span('decode_img'):
+            arr = imageio.imread(file)
     except (ValueError, SyntaxError) as e:
         raise ImageReadLibraryError from e
 
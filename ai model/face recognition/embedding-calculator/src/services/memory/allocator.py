@@ -0,0 +1,106 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import ctypes
+import logging
+import os
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+_MALLCTL_ARENAS_ALL = 4096
+
+
+class _MallInfo2(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_size_t) for name in
+                ('arena', 'ordblks', 'smblks', 'hblks', 'hblkhd', 'usmblks',
+                 'fsmblks', 'uordblks', 'fordblks', 'keepcost')]
+
+
+def get_rss_bytes() -> Optional[int]:
+    """ Current resident set size of the process, None if it is unknown on the platform """
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class Allocator:
+    """
+    malloc implementation of the process: glibc by default, jemalloc or tcmalloc when
+    preloaded with LD_PRELOAD. They are told apart by symbols of the loaded libraries.
+    """
+
+    def __init__(self):
+        self._lib = ctypes.CDLL(None)
+        if hasattr(self._lib, 'mallctl'):
+            self.name = 'jemalloc'
+        elif hasattr(self._lib, 'MallocExtension_ReleaseFreeMemory'):
+            self.name = 'tcmalloc'
+        elif hasattr(self._lib, 'malloc_trim'):
+            self.name = 'glibc'
+        else:
+            self.name = 'unknown'
+
+    def trim(self):
+        """ Returns freed memory of the heap back to the OS """
+        if self.name == 'glibc':
+            self._lib.malloc_trim(0)
+        elif self.name == 'jemalloc':
+            self._mallctl_write(f'arena.{_MALLCTL_ARENAS_ALL}.purge')
+        elif self.name == 'tcmalloc':
+            self._lib.MallocExtension_ReleaseFreeMemory()
+
+    def stats(self) -> Dict[str, float]:
+        """ Allocated and retained by the allocator memory, in MB """
+        try:
+            if self.name == 'glibc' and hasattr(self._lib, 'mallinfo2'):
+                self._lib.mallinfo2.restype = _MallInfo2
+                info = self._lib.mallinfo2()
+                return dict(allocated_mb=(info.uordblks + info.hblkhd) / MB,
+                            free_mb=info.fordblks / MB,
+                            releasable_mb=info.keepcost / MB)
+            if self.name == 'jemalloc':
+                self._mallctl_write('epoch', ctypes.c_uint64(1))
+                return dict(allocated_mb=self._mallctl_read('stats.allocated') / MB,
+                            active_mb=self._mallctl_read('stats.active') / MB,
+                            resident_mb=self._mallctl_read('stats.resident') / MB,
+                            retained_mb=self._mallctl_read('stats.retained') / MB)
+            if self.name == 'tcmalloc':
+                return dict(allocated_mb=self._tcmalloc_property('generic.current_allocated_bytes') / MB,
+                            heap_mb=self._tcmalloc_property('generic.heap_size') / MB,
+                            free_mb=self._tcmalloc_property('tcmalloc.pageheap_free_bytes') / MB)
+        except (AttributeError, OSError) as e:
+            logger.debug(f'Cannot read {self.name} allocator stats: {e}')
+        return {}
+
+    def _mallctl_read(self, name: str) -> int:
+        value, size = ctypes.c_size_t(0), ctypes.c_size_t(ctypes.sizeof(ctypes.c_size_t))
+        if self._lib.mallctl(name.encode(), ctypes.byref(value), ctypes.byref(size), None, 0):
+            raise OSError(f"mallctl('{name}') failed")
+        return value.value
+
+    def _mallctl_write(self, name: str, value: ctypes.c_uint64 = None):
+        new, new_size = (ctypes.byref(value), ctypes.sizeof(value)) if value is not None else (None, 0)
+        if self._lib.mallctl(name.encode(), None, None, new, new_size):
+            raise OSError(f"mallctl('{name}') failed")
+
+    def _tcmalloc_property(self, name: str) -> int:
+        value = ctypes.c_size_t(0)
+        if not self._lib.MallocExtension_GetNumericProperty(name.encode(), ctypes.byref(value)):
+            raise OSError(f"tcmalloc property '{name}' is unknown")
+        return value.value
@@ -0,0 +1,131 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import logging
+import os
+import signal
+import threading
+from typing import Callable, Optional
+
+from src.constants import ENV
+from src.services.memory.allocator import MB, Allocator, get_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryAction:
+    TRIM = 'trim'
+    RECYCLE = 'recycle'
+
+
+class MemoryGovernor:
+    """
+    Samples RSS of the worker after requests. Freed heap memory is returned to the OS
+    whenever RSS grows by `trim_step_mb` above `trim_rss_mb`, the worker is recycled
+    when RSS stays above `recycle_rss_mb` even after trimming.
+    """
+
+    def __init__(self, trim_rss_mb: int, trim_step_mb: int, recycle_rss_mb: int, check_every: int,
+                 allocator: Allocator = None, get_rss: Callable[[], Optional[int]] = get_rss_bytes):
+        self._trim_rss_mb = trim_rss_mb
+        self._trim_step_mb = trim_step_mb
+        self._recycle_rss_mb = recycle_rss_mb
+        self._check_every = max(check_every, 1)
+        self._allocator = allocator or Allocator()
+        self._get_rss = get_rss
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._rss_after_trim_mb = 0.0
+        self._rss_mb = None
+        self._peak_rss_mb = None
+        self._trims = 0
+        self._recycling = False
+
+    def check(self) -> Optional[str]:
+        with self._lock:
+            self._requests += 1
+            if self._recycling or self._requests % self._check_every:
+                return None
+            rss_bytes = self._get_rss()
+            if rss_bytes is None:
+                return None
+            rss_mb = self._update_rss(rss_bytes)
+
+            action = None
+            if rss_mb >= max(self._trim_rss_mb, self._rss_after_trim_mb + self._trim_step_mb):
+                rss_mb, action = self._trim(rss_bytes), MemoryAction.TRIM
+            if self._recycle_rss_mb and rss_mb >= self._recycle_rss_mb:
+                self._recycling = True
+                logger.warning(f'RSS {rss_mb:.0f}MB exceeds {self._recycle_rss_mb}MB, recycling the worker')
+                action = MemoryAction.RECYCLE
+            return action
+
+    def trim(self):
+        """ Returns freed heap memory to the OS now, e.g. after models were unloaded """
+        with self._lock:
+            rss_bytes = self._get_rss()
+            if rss_bytes is not None:
+                self._update_rss(rss_bytes)
+                self._trim(rss_bytes)
+
+    def _trim(self, rss_bytes: int) -> float:
+        rss_mb = rss_bytes / MB
+        self._allocator.trim()
+        self._trims += 1
+        trimmed_rss_mb = self._update_rss(self._get_rss() or rss_bytes)
+        self._rss_after_trim_mb = trimmed_rss_mb
+        logger.debug(f'Trimmed heap, RSS {rss_mb:.0f}MB -> {trimmed_rss_mb:.0f}MB')
+        return trimmed_rss_mb
+
+    @property
+    def rss_mb(self) -> Optional[float]:
+        """ RSS sampled after the last checked request """
+        return self._rss_mb
+
+    def _update_rss(self, rss_bytes: int) -> float:
+        self._rss_mb = rss_bytes / MB
+        self._peak_rss_mb = max(self._peak_rss_mb or 0, self._rss_mb)
+        return self._rss_mb
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                rss_mb=round(self._rss_mb, 1) if self._rss_mb is not None else None,
+                peak_rss_mb=round(self._peak_rss_mb, 1) if self._peak_rss_mb is not None else None,
+                trims=self._trims,
+                allocator=self._allocator.name,
+                allocator_stats={k: round(v, 1) for k, v in self._allocator.stats().items()},
+            )
+
+
+def recycle_worker():
+    """ uWSGI worker finishes its requests on SIGHUP and the master spawns a new one """
+    try:
+        import uwsgi  # noqa: F401, available only inside uWSGI workers
+    except ImportError:
+        logger.warning('Not running under uWSGI, the worker cannot be recycled')
+        return
+    os.kill(os.getpid(), signal.SIGHUP)
+
+
+memory_governor = MemoryGovernor(trim_rss_mb=ENV.MEMORY_TRIM_RSS_MB,
+                                 trim_step_mb=ENV.MEMORY_TRIM_STEP_MB,
+                                 recycle_rss_mb=ENV.MEMORY_RECYCLE_RSS_MB,
+                                 check_every=ENV.MEMORY_CHECK_EVERY)
+
+
+def govern_memory(response):
+    if memory_governor.check() == MemoryAction.RECYCLE:
+        response.call_on_close(recycle_worker)
+    return response
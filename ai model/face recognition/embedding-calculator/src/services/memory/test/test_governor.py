@@ -0,0 +1,70 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from src.services.memory.allocator import MB, get_rss_bytes
+from src.services.memory.governor import MemoryAction, MemoryGovernor
+
+
+class FakeAllocator:
+    name = 'fake'
+
+    def __init__(self):
+        self.trims = 0
+
+    def trim(self):
+        self.trims += 1
+
+    def stats(self):
+        return {}
+
+
+def _governor(rss_samples_mb, **kwargs):
+    samples = iter(rss_samples_mb)
+    allocator = FakeAllocator()
+    settings = dict(trim_rss_mb=0, trim_step_mb=100, recycle_rss_mb=0, check_every=1)
+    settings.update(kwargs)
+    governor = MemoryGovernor(allocator=allocator, get_rss=lambda: next(samples) * MB, **settings)
+    return governor, allocator
+
+
+def test__given_rss_grown_by_trim_step__when_checking__then_trims_once():
+    governor, allocator = _governor([150, 120, 150, 200])
+
+    actions = [governor.check(), governor.check(), governor.check()]
+
+    assert actions == [MemoryAction.TRIM, None, None]
+    assert allocator.trims == 1
+
+
+def test__given_rss_above_recycle_threshold_after_trim__when_checking__then_recycles_once():
+    governor, allocator = _governor([600, 550, 600], recycle_rss_mb=500)
+
+    actions = [governor.check(), governor.check()]
+
+    assert actions == [MemoryAction.RECYCLE, None]
+
+
+def test__given_check_every_n_requests__when_checking__then_samples_rss_every_nth_request():
+    governor, allocator = _governor([10, 10], check_every=3)
+
+    for _ in range(6):
+        governor.check()
+
+    assert governor.stats()['rss_mb'] == 10
+
+
+def test__given_running_process__when_getting_rss__then_returns_positive_size():
+    rss_bytes = get_rss_bytes()
+
+    assert rss_bytes is None or rss_bytes > 0
@@ -0,0 +1,157 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import attr
+
+from src.services.profiling.sampler import StackSampler, to_folded
+
+logger = logging.getLogger(__name__)
+
+SAMPLING = 'sampling'
+CPROFILE = 'cprofile'
+MODES = (SAMPLING, CPROFILE)
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class ProfilingSettings:
+    sample_rate: float = attr.ib(converter=float)
+    mode: str = attr.ib(default=SAMPLING)
+    interval_ms: float = attr.ib(default=5, converter=float)
+
+    @sample_rate.validator
+    def _check_sample_rate(self, attribute, value):
+        if not (0 <= value <= 1):
+            raise ValueError("'sample_rate' must be between 0 and 1")
+
+    @mode.validator
+    def _check_mode(self, attribute, value):
+        if value not in MODES:
+            raise ValueError(f"'mode' must be one of: {', '.join(MODES)}")
+
+    @interval_ms.validator
+    def _check_interval_ms(self, attribute, value):
+        if not value > 0:
+            raise ValueError("'interval_ms' must be positive")
+
+
+class SettingsStore:
+    """
+    Settings changed at runtime are saved to a file in the profiles directory,
+    so that every worker process picks them up without a restart
+    """
+
+    def __init__(self, path: Path, defaults: ProfilingSettings):
+        self._path = path
+        self._defaults = defaults
+        self._settings = defaults
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ProfilingSettings:
+        try:
+            mtime = self._path.stat().st_mtime
+        except OSError:
+            return self._settings
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    self._settings = ProfilingSettings(**json.loads(self._path.read_text()))
+                except (OSError, ValueError, TypeError) as e:
+                    logger.warning(f"Ignoring profiling settings of '{self._path}': {e}")
+                self._mtime = mtime
+            return self._settings
+
+    def set(self, **changes) -> ProfilingSettings:
+        settings = attr.evolve(self.get(), **changes)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_name(f'{self._path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(attr.asdict(settings)))
+        tmp_path.replace(self._path)
+        return settings
+
+
+class RequestProfile:
+    """ Profile of the request handled by the current thread """
+
+    def __init__(self, settings: ProfilingSettings):
+        self.mode = settings.mode
+        if self.mode == CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), settings.interval_ms / 1000)
+            self._sampler.start()
+
+    def stop_and_save(self, path_prefix: Path) -> Path:
+        if self.mode == CPROFILE:
+            self._profile.disable()
+            path = path_prefix.with_name(path_prefix.name + '.prof')
+            self._profile.dump_stats(str(path))
+        else:
+            path = path_prefix.with_name(path_prefix.name + '.folded')
+            path.write_text(to_folded(self._sampler.stop()))
+        return path
+
+
+class RequestProfiler:
+    """
+    Profiles a sampled fraction of requests, or requests asking for it, and keeps
+    the last `max_files` profiles in `profiles_dir`: folded stacks (flamegraph.pl, speedscope)
+    of the sampling profiler or pstats dumps (snakeviz, flameprof) of cProfile.
+    """
+
+    def __init__(self, profiles_dir: str, defaults: ProfilingSettings, max_files: int):
+        self._dir = Path(profiles_dir)
+        self._max_files = max_files
+        self.settings = SettingsStore(self._dir / 'settings.json', defaults)
+        self._lock = threading.Lock()
+
+    def start(self, forced: bool = False) -> Optional[RequestProfile]:
+        settings = self.settings.get()
+        if not forced and random.random() >= settings.sample_rate:
+            return None
+        return RequestProfile(settings)
+
+    def save(self, profile: RequestProfile, name: str) -> Optional[Path]:
+        timestamp_ms = int(time.time() * 1000)
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            path = profile.stop_and_save(self._dir / f'{timestamp_ms}_{os.getpid()}_{name}')
+            with self._lock:
+                self._rotate()
+            return path
+        except OSError as e:
+            logger.warning(f"Failed to save a profile to '{self._dir}': {e}")
+
+    def profile_paths(self):
+        return sorted((path for path in self._dir.glob('*') if path.suffix in ('.folded', '.prof')),
+                      key=lambda path: path.name)
+
+    def _rotate(self):
+        paths = self.profile_paths()
+        for path in paths[:max(len(paths) - self._max_files, 0)]:
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        return dict(attr.asdict(self.settings.get()), dir=str(self._dir), files=len(self.profile_paths()))
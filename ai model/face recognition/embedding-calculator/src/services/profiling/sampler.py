@@ -0,0 +1,72 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+
+def fold_stack(frame: FrameType) -> str:
+    """
+    Frames from the outermost to the innermost, in the folded format of flamegraph.pl and speedscope
+    >>> def inner(): return fold_stack(sys._getframe())
+    >>> def outer(): return inner()
+    >>> [frame.split(' ')[0] for frame in outer().split(';')[-2:]]
+    ['outer', 'inner']
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({Path(code.co_filename).name})')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class StackSampler:
+    """
+    Samples stacks of one thread from a background thread. Unlike cProfile it adds no
+    hooks to the profiled thread, which is only slowed down while the sampler holds the GIL.
+    """
+
+    def __init__(self, thread_id: int, interval_s: float):
+        self._thread_id = thread_id
+        self._interval_s = interval_s
+        self._stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stopped.wait(self._interval_s):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._stacks[fold_stack(frame)] += 1
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self._thread.join()
+        return self._stacks
+
+
+def to_folded(stacks: Counter) -> str:
+    """
+    >>> print(to_folded(Counter({'main;detect': 3, 'main;crop': 1})), end='')
+    main;detect 3
+    main;crop 1
+    """
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
@@ -0,0 +1,59 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import time
+
+from src.services.profiling.profiler import CPROFILE, ProfilingSettings, RequestProfiler
+
+
+def _busy_wait(duration_s):
+    end = time.perf_counter() + duration_s
+    while time.perf_counter() < end:
+        pass
+
+
+def test__given_sampling_profile__when_saved__then_contains_folded_stacks_of_request(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), ProfilingSettings(sample_rate=1, interval_ms=1), max_files=10)
+
+    profile = profiler.start()
+    _busy_wait(0.1)
+    path = profiler.save(profile, 'find_faces_post')
+
+    assert path.suffix == '.folded'
+    stacks = path.read_text().splitlines()
+    assert any('_busy_wait' in stack.rsplit(' ', 1)[0] for stack in stacks)
+    assert all(stack.rsplit(' ', 1)[1].isdigit() for stack in stacks)
+
+
+def test__given_more_profiles_than_max__when_saving__then_oldest_are_removed(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), ProfilingSettings(sample_rate=1, mode=CPROFILE), max_files=2)
+
+    names = [f'request{i}' for i in range(3)]
+    for name in names:
+        profiler.save(profiler.start(), name)
+        time.sleep(0.002)
+
+    assert [path.stem.rsplit('_', 1)[1] for path in profiler.profile_paths()] == names[1:]
+
+
+def test__given_settings_changed_by_another_worker__when_starting__then_uses_them(tmp_path):
+    worker1 = RequestProfiler(str(tmp_path), ProfilingSettings(sample_rate=0), max_files=2)
+    worker2 = RequestProfiler(str(tmp_path), ProfilingSettings(sample_rate=0), max_files=2)
+    assert worker2.start() is None
+
+    worker1.settings.set(sample_rate=1, mode=CPROFILE)
+
+    profile = worker2.start()
+    assert profile.mode == CPROFILE
+    worker2.save(profile, 'request')
@@ -0,0 +1,96 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import json
+import logging
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+from src.services.tracing.spans import Span
+
+logger = logging.getLogger(__name__)
+
+
+def to_server_timing(root: Span) -> str:
+    """
+    Value of the `Server-Timing` response header. Spans with the same path,
+    e.g. a plugin applied to every face, are summed up.
+    >>> root = Span('request', start_ns=0, end_ns=5_000_000)
+    >>> root.children = [Span('plugin', 0, 1_000_000), Span('plugin', 1_000_000, 3_000_000)]
+    >>> to_server_timing(root)
+    'request;dur=5.000, request.plugin;dur=3.000;desc="2 calls"'
+    """
+    durations: Dict[str, List[float]] = {}
+    for path, span in root.walk():
+        durations.setdefault(path, []).append(span.duration_ms)
+    metrics = []
+    for path, path_durations in durations.items():
+        metric = f'{path};dur={sum(path_durations):.3f}'
+        if len(path_durations) > 1:
+            metric += f';desc="{len(path_durations)} calls"'
+        metrics.append(metric)
+    return ', '.join(metrics)
+
+
+def to_trace_events(root: Span) -> List[dict]:
+    """
+    Complete events of the Chrome trace event format, loadable by chrome://tracing and Perfetto
+    >>> event = to_trace_events(Span('request', start_ns=1_000, end_ns=3_000))[0]
+    >>> event['ph'], event['ts'], event['dur']
+    ('X', 1.0, 2.0)
+    """
+    pid = os.getpid()
+    return [dict(name=span.name, cat=path.split('.', 1)[0], ph='X', pid=pid, tid=span.thread_id,
+                 ts=span.start_ns / 1000, dur=((span.end_ns or span.start_ns) - span.start_ns) / 1000,
+                 args=span.args)
+            for path, span in root.walk()]
+
+
+class TraceExporter:
+    """
+    Appends sampled traces to a file in the JSON array format of trace events.
+    The closing bracket of the array is optional for trace viewers, so the file
+    stays valid while workers append to it. The file is rotated to `<path>.1`
+    when it grows above `max_mb`.
+    """
+
+    def __init__(self, path: str, sample_rate: float, slow_ms: float, max_mb: float):
+        self._path = Path(path)
+        self._sample_rate = sample_rate
+        self._slow_ms = slow_ms
+        self._max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    def is_sampled(self, root: Span) -> bool:
+        if self._slow_ms and root.duration_ms >= self._slow_ms:
+            return True
+        return random.random() < self._sample_rate
+
+    def export(self, root: Span):
+        lines = ''.join(json.dumps(event, default=str) + ',\n' for event in to_trace_events(root))
+        with self._lock:
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                if self._path.exists() and self._path.stat().st_size > self._max_bytes:
+                    self._path.replace(self._path.with_name(self._path.name + '.1'))
+                # O_APPEND keeps lines of concurrent workers whole
+                with self._path.open('a') as file:
+                    if file.tell() == 0:
+                        lines = '[\n' + lines
+                    file.write(lines)
+            except OSError as e:
+                logger.warning(f"Failed to export a trace to '{self._path}': {e}")
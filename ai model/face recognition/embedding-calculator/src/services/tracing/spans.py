@@ -0,0 +1,108 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import attr
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+@attr.s(auto_attribs=True, eq=False)
+class Span:
+    """ Timings are taken from the monotonic high-resolution clock, in nanoseconds """
+    name: str
+    start_ns: int
+    end_ns: Optional[int] = None
+    args: Dict[str, object] = attr.Factory(dict)
+    children: List['Span'] = attr.Factory(list)
+    thread_id: int = attr.Factory(threading.get_ident)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.perf_counter_ns()) - self.start_ns) / 1e6
+
+    def walk(self, path: str = '') -> Iterator[Tuple[str, 'Span']]:
+        """ Yields spans of the tree with dot-separated paths of their names """
+        path = f'{path}.{self.name}' if path else self.name
+        yield path, self
+        for child in self.children:
+            yield from child.walk(path)
+
+    def to_json(self) -> dict:
+        data = dict(name=self.name, duration_ms=round(self.duration_ms, 3))
+        if self.args:
+            data['args'] = self.args
+        if self.children:
+            data['children'] = [child.to_json() for child in self.children]
+        return data
+
+
+@contextmanager
+def span(name: str, **args):
+    """
+    Records a child of the current span. Outside of a trace it does nothing, so
+    the pipeline code can be instrumented unconditionally.
+    >>> with start_trace('request') as root:
+    ...     with span('detection'):
+    ...         with span('find_faces', img_side=640): pass
+    >>> [path for path, _ in root.walk()]
+    ['request', 'request.detection', 'request.detection.find_faces']
+    >>> with span('detection') as detached: pass
+    >>> detached is None
+    True
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name=name, start_ns=time.perf_counter_ns(), args=args)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end_ns = time.perf_counter_ns()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **args):
+    """ Makes a new root span current until the end of the block """
+    root = Span(name=name, start_ns=time.perf_counter_ns(), args=args)
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        root.end_ns = root.end_ns or time.perf_counter_ns()
+        _current_span.reset(token)
+
+
+def begin_trace(name: str, **args) -> Span:
+    """ Same as `start_trace`, for callers which cannot wrap the traced code in a block """
+    root = Span(name=name, start_ns=time.perf_counter_ns(), args=args)
+    _current_span.set(root)
+    return root
+
+
+def end_trace() -> Optional[Span]:
+    root = _current_span.get()
+    if root is not None:
+        root.end_ns = time.perf_counter_ns()
+    _current_span.set(None)
+    return root
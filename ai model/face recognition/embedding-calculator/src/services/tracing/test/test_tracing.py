@@ -0,0 +1,70 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import json
+import threading
+
+from src.services.tracing.export import TraceExporter
+from src.services.tracing.spans import span, start_trace
+
+
+def _traced_request(name, barrier, roots):
+    with start_trace(name) as root:
+        with span('detection'):
+            barrier.wait()
+            with span('find_faces'):
+                pass
+    roots[name] = root
+
+
+def test__given_concurrent_traces__when_recording_spans__then_each_thread_builds_own_tree():
+    barrier, roots = threading.Barrier(2), {}
+    threads = [threading.Thread(target=_traced_request, args=(name, barrier, roots)) for name in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [path for path, _ in roots['a'].walk()] == ['a', 'a.detection', 'a.detection.find_faces']
+    assert [path for path, _ in roots['b'].walk()] == ['b', 'b.detection', 'b.detection.find_faces']
+    assert roots['a'].duration_ms >= roots['a'].children[0].duration_ms
+
+
+def test__given_exported_traces__when_loading_file__then_it_is_trace_event_array(tmp_path):
+    path = tmp_path / 'traces.json'
+    exporter = TraceExporter(str(path), sample_rate=1, slow_ms=0, max_mb=1)
+    for _ in range(2):
+        with start_trace('find_faces_post') as root:
+            with span('decode_img'):
+                pass
+        exporter.export(root)
+
+    # trace viewers accept the array without the closing bracket
+    events = json.loads(path.read_text().rstrip(',\n') + ']')
+
+    assert [event['name'] for event in events] == ['find_faces_post', 'decode_img'] * 2
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+
+
+def test__given_slow_request__when_sampling__then_it_is_exported_regardless_of_rate(tmp_path):
+    exporter = TraceExporter(str(tmp_path / 'traces.json'), sample_rate=0, slow_ms=0.001, max_mb=1)
+    with start_trace('fast') as fast:
+        pass
+    fast.end_ns = fast.start_ns
+    with start_trace('slow') as slow:
+        pass
+    slow.end_ns = slow.start_ns + 1_000_000
+
+    assert not exporter.is_sampled(fast)
+    assert exporter.is_sampled(slow)
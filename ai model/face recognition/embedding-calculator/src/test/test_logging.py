@@ -0,0 +1,68 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import json
+import logging
+import threading
+
+from src._logging import BackgroundQueueHandler, JSONFormatter
+
+
+class _RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+        self.addFilter(JSONFormatter())
+
+    def emit(self, record):
+        self.threads.add(threading.current_thread())
+        self.records.append(json.loads(record.output))
+
+
+def _log_with(handler, log):
+    logger = logging.getLogger('test_logging')
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        log(logger)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def test__given_queue_handler__when_logged__then_written_by_listener_thread():
+    recording_handler = _RecordingHandler()
+
+    _log_with(BackgroundQueueHandler(recording_handler), lambda logger: logger.warning('%s faces', 3))
+
+    assert [record['message'] for record in recording_handler.records] == ['3 faces']
+    assert threading.current_thread() not in recording_handler.threads
+
+
+def test__given_queue_handler__when_logged_while_handling_exception__then_traceback_is_written():
+    recording_handler = _RecordingHandler()
+
+    def log(logger):
+        logger.warning('no exception')
+        try:
+            raise ValueError('bad image')
+        except ValueError:
+            logger.warning('failed')
+
+    _log_with(BackgroundQueueHandler(recording_handler), log)
+
+    no_exception, failed = recording_handler.records
+    assert no_exception['traceback'] is None
+    assert failed['traceback'].splitlines()[-1] == 'ValueError: bad image'
@@ -96,13 +96,13 @@ class MTCNN(object):
         except ValueError:
             self._min_face_size = 20
 
-    def __compute_scale_pyramid(self, m, min_layer):
+    def __compute_scale_pyramid(self, m, min_layer, scale_factor):
         scales = []
         factor_count = 0
 
         while min_layer >= 12:
-            scales += [m * np.power(self._scale_factor, factor_count)]
-            min_layer = min_layer * self._scale_factor
+            scales += [m * np.power(scale_factor, factor_count)]
+            min_layer = min_layer * scale_factor
             factor_count += 1
         return scales
 
@@ -275,10 +275,12 @@ class MTCNN(object):
         boundingbox[:, 0:4] = np.transpose(np.vstack([b1, b2, b3, b4]))
         return boundingbox
 
-    def detect_faces(self, img) -> list:
+    def detect_faces(self, img, min_face_size: int = None, scale_factor: float = None) -> list:
         """
         Detects bounding boxes from the specified image.
         :param img: image to process
+        :param min_face_size: overrides minimum size of the face to detect for this call
+        :param scale_factor: overrides scale factor of the pyramid for this call
         :return: list containing all the bounding boxes detected with their keypoints.
         """
         if img is None or not hasattr(img, "shape"):
@@ -287,10 +289,10 @@ class MTCNN(object):
         height, width, _ = img.shape
         stage_status = StageStatus(width=width, height=height)
 
-        m = 12 / self._min_face_size
+        m = 12 / (min_face_size or self._min_face_size)
         min_layer = np.amin([height, width]) * m
 
-        scales = self.__compute_scale_pyramid(m, min_layer)
+        scales = self.__compute_scale_pyramid(m, min_layer, scale_factor or self._scale_factor)
 
         stages = [self.__stage1, self.__stage2, self.__stage3]
         result = [scales, stage_status]
@@ -12,52 +12,78 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
+import json
 import logging
-from collections import namedtuple
+import multiprocessing
+import os
+import time
 from pathlib import Path
-
-import numpy as np
+from typing import Dict
 
 from src.constants import ENV_MAIN, LOGGING_LEVEL
 from src.init_runtime import init_runtime
-from src.services.facescan.scanner.test.calculate_errors import calculate_missed_boxes, calculate_missed_noses
-from src.services.imgtools.read_img import read_img
-from src.services.utils.pyutils import get_current_dir
-from tools._save_img import save_img
 from tools.benchmark_detection.constants import ENV
+from tools.benchmark_detection.fddb import ERR_IMG_DIR, TMP_DIR, get_annotations, init_worker, process_image
 from tools.benchmark_detection.simple_stats import SimpleStats
-from tools.constants import get_scanner
 
-AnnotatedImg = namedtuple('AnnotatedImg', 'img img_name noses')
-TMP_DIR = get_current_dir(__file__) / 'tmp'
-ERR_IMG_DIR = TMP_DIR / 'error-images'
+CHECKPOINT_DIR = TMP_DIR / 'checkpoints'
 logger = logging.getLogger(__name__)
 
 
-def _get_image(img_name):
-    image_path = TMP_DIR / 'originalPics' / Path(f'{img_name}.jpg')
-    return read_img(image_path) if not ENV.DRY_RUN else np.zeros((1, 1, 3))
+def _load_checkpoint(checkpoint_path: Path) -> Dict[str, dict]:
+    if not ENV.RESUME:
+        checkpoint_path.unlink(missing_ok=True)
+        return {}
+    if not checkpoint_path.exists():
+        return {}
+    records = {}
+    with checkpoint_path.open('r') as checkpoint:
+        for line in checkpoint:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break  # the last line of an interrupted run may be incomplete
+            records[record['img_name']] = record
+    return records
+
+
+def _add_record(stats: SimpleStats, record: dict):
+    stats.add(**{k: v for k, v in record.items() if k != 'img_name'})
 
 
-def _get_noses(annotation_file):
-    ellipse_count = int(next(annotation_file))
-    noses = []
-    for _ in range(ellipse_count):
-        annotation_line_parts = next(annotation_file).split()
-        ellipse_center_xy = round(float(annotation_line_parts[3])), round(float(annotation_line_parts[4]))
-        noses.append(ellipse_center_xy)
-    return noses
+def _benchmark(scanner_name: str) -> SimpleStats:
+    checkpoint_path = CHECKPOINT_DIR / f'{scanner_name}.jsonl'
+    processed_records = _load_checkpoint(checkpoint_path)
+    stats = SimpleStats(scanner_name)
+    for record in processed_records.values():
+        _add_record(stats, record)
+    if processed_records:
+        logger.warning(f'Resuming {scanner_name} after {len(processed_records)} images processed by an earlier run, '
+                       f'their results are reused as they are')
 
+    annotations = (k for k in get_annotations() if k.img_name not in processed_records)
+    processed, first_result_s, last_result_s = 0, None, None
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(ENV.PROCESSES, initializer=init_worker, initargs=(scanner_name,)) as pool, \
+            checkpoint_path.open('a') as checkpoint:
+        for record in pool.imap_unordered(process_image, annotations, chunksize=ENV.CHUNK_SIZE):
+            checkpoint.write(json.dumps(record) + '\n')
+            checkpoint.flush()
+            _add_record(stats, record)
+            processed += 1
+            last_result_s = time.perf_counter()
+            first_result_s = first_result_s or last_result_s
+            logging.debug(stats.__str__(f'{scanner_name} {record["img_name"]}'))
 
-def _get_annotated_images():
-    annotation_file_paths = sorted(TMP_DIR.glob('FDDB-folds/FDDB-fold-*-ellipseList.txt'))
-    for annotation_file_path in annotation_file_paths:
-        with annotation_file_path.open('r') as annotation_file:
-            for img_name in annotation_file:
-                img_name = img_name.strip()
-                img = _get_image(img_name)
-                noses = _get_noses(annotation_file)
-                yield AnnotatedImg(img, img_name, noses)
+    print(f'\n{scanner_name} detected {stats.total_boxes} faces in {len(stats.latencies_ms)} images '
+          f'with {stats.total_noses} annotated faces.')
+    print(stats)
+    print(stats.latency_str())
+    if processed > 1:
+        # models are loaded before the first result, so loading is not counted
+        print(f'Throughput: {(processed - 1) / (last_result_s - first_result_s):.2f} images/s '
+              f'with {ENV.PROCESSES} processes')
+    return stats
 
 
 if __name__ == '__main__':
@@ -66,24 +92,9 @@ if __name__ == '__main__':
     logging.getLogger('src.services.facescan.scanner').setLevel(logging.INFO)
     if ENV.SAVE_IMG_ON_ERROR:
         ERR_IMG_DIR.mkdir(parents=True, exist_ok=True)
-
-    annotated_images = list(_get_annotated_images())
-    img_count, face_count = len(annotated_images), sum(len(k.noses) for k in annotated_images)
-    print(f"LFW Face Detection dataset: {face_count} faces in a set of {img_count} images")
+    CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+    # spawned workers share CPU cores instead of each using all of them
+    os.environ.setdefault('UWSGI_PROCESSES', str(ENV.PROCESSES))
 
     for scanner_name in ENV.SCANNERS:
-        scanner = get_scanner(scanner_name)
-        simple_stats = SimpleStats(scanner_name)
-
-        for annotated_image in annotated_images:
-            img, noses, img_name = annotated_image.img, annotated_image.noses, annotated_image.img_name
-            boxes = scanner.find_faces(img)
-            missed_boxes, missed_noses = calculate_missed_boxes(boxes, noses), calculate_missed_noses(boxes, noses)
-            simple_stats.add(total_boxes=len(boxes), total_noses=len(noses),
-                             total_missed_boxes=missed_boxes, total_missed_noses=missed_noses)
-            if (missed_boxes or missed_noses) and ENV.SAVE_IMG_ON_ERROR:
-                filepath = ERR_IMG_DIR / f'{img_name}_{scanner_name}.png'.replace('/', '_')
-                save_img(img, boxes, noses, filepath)
-            logging.debug(simple_stats.__str__(f'{scanner_name} {img_name}'))
-        print(f'\n{scanner_name} detected {simple_stats.total_boxes} faces.')
-        print(simple_stats)
+        _benchmark(scanner_name)
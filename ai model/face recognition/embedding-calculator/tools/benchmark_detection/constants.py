@@ -12,9 +12,16 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
-from src.services.utils.pyutils import get_env_bool
+import os
+
+from src.services.utils.pyutils import get_env, get_env_bool
 from tools.constants import ENV_BENCHMARK
 
 
 class ENV(ENV_BENCHMARK):
     SAVE_IMG_ON_ERROR = get_env_bool('SAVE_IMG_ON_ERROR', default=True) and not ENV_BENCHMARK.DRY_RUN
+    PROCESSES = int(get_env('PROCESSES', str(os.cpu_count())))
+    CHUNK_SIZE = int(get_env('CHUNK_SIZE', '4'))
+    # results of processed images are kept in checkpoints, an interrupted run continues from them if enabled;
+    # checkpoints do not know the code and config of the scanner, so resume only runs of unchanged ones
+    RESUME = get_env_bool('RESUME', default=False)
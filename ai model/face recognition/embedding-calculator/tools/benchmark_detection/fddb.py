@@ -0,0 +1,84 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import logging
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from src.constants import LOGGING_LEVEL
+from src.init_runtime import init_runtime
+from src.services.facescan.scanner.test.calculate_errors import calculate_missed_boxes, calculate_missed_noses
+from src.services.imgtools.read_img import read_img
+from src.services.utils.pyutils import get_current_dir
+from tools._save_img import save_img
+from tools.benchmark_detection.constants import ENV
+from tools.constants import get_scanner
+
+Annotation = namedtuple('Annotation', 'img_name noses')
+TMP_DIR = get_current_dir(__file__) / 'tmp'
+ERR_IMG_DIR = TMP_DIR / 'error-images'
+_scanner = None
+
+
+def _get_image(img_name):
+    image_path = TMP_DIR / 'originalPics' / Path(f'{img_name}.jpg')
+    return read_img(image_path) if not ENV.DRY_RUN else np.zeros((1, 1, 3))
+
+
+def _get_noses(annotation_file):
+    ellipse_count = int(next(annotation_file))
+    noses = []
+    for _ in range(ellipse_count):
+        annotation_line_parts = next(annotation_file).split()
+        ellipse_center_xy = round(float(annotation_line_parts[3])), round(float(annotation_line_parts[4]))
+        noses.append(ellipse_center_xy)
+    return noses
+
+
+def get_annotations() -> Iterator[Annotation]:
+    """ Images are not read here, every worker process reads its own ones """
+    annotation_file_paths = sorted(TMP_DIR.glob('FDDB-folds/FDDB-fold-*-ellipseList.txt'))
+    for annotation_file_path in annotation_file_paths:
+        with annotation_file_path.open('r') as annotation_file:
+            for img_name in annotation_file:
+                img_name = img_name.strip()
+                noses = _get_noses(annotation_file)
+                yield Annotation(img_name, noses)
+
+
+def init_worker(scanner_name: str):
+    """ Runs in spawned processes, so it lives outside of `__main__` """
+    global _scanner
+    init_runtime(logging_level=LOGGING_LEVEL)
+    logging.getLogger('src.services.facescan.scanner').setLevel(logging.INFO)
+    _scanner = get_scanner(scanner_name)
+    _scanner.find_faces(np.zeros((160, 160, 3), dtype=np.uint8))  # loads models
+
+
+def process_image(annotation: Annotation) -> dict:
+    img_name, noses = annotation
+    img = _get_image(img_name)
+    start = time.perf_counter()
+    boxes = _scanner.find_faces(img)
+    latency_ms = (time.perf_counter() - start) * 1000
+    missed_boxes, missed_noses = calculate_missed_boxes(boxes, noses), calculate_missed_noses(boxes, noses)
+    if (missed_boxes or missed_noses) and ENV.SAVE_IMG_ON_ERROR:
+        filepath = ERR_IMG_DIR / f'{img_name}_{_scanner.ID}.png'.replace('/', '_')
+        save_img(img, boxes, noses, filepath)
+    return dict(img_name=img_name, total_boxes=len(boxes), total_missed_boxes=missed_boxes,
+                total_noses=len(noses), total_missed_noses=missed_noses, latency_ms=round(latency_ms, 3))
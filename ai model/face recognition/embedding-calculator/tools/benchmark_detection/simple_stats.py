@@ -12,8 +12,12 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
+from typing import List
+
 import attr
 
+from tools.benchmark_pipeline.stage_stats import summarize_timings
+
 
 @attr.s(auto_attribs=True)
 class SimpleStats:
@@ -22,12 +26,28 @@ class SimpleStats:
     total_missed_boxes: int = 0
     total_noses: int = 0
     total_missed_noses: int = 0
+    latencies_ms: List[float] = attr.Factory(list)
 
-    def add(self, total_boxes, total_missed_boxes, total_noses, total_missed_noses):
+    def add(self, total_boxes, total_missed_boxes, total_noses, total_missed_noses, latency_ms=None):
         self.total_boxes += total_boxes
         self.total_missed_boxes += total_missed_boxes
         self.total_noses += total_noses
         self.total_missed_noses += total_missed_noses
+        if latency_ms is not None:
+            self.latencies_ms.append(latency_ms)
+
+    def latency_str(self) -> str:
+        """
+        >>> stats = SimpleStats('scanner')
+        >>> for latency_ms in (10, 20, 30): stats.add(1, 0, 1, 0, latency_ms)
+        >>> stats.latency_str()
+        'Detection latency of 3 images: p50 20.0ms, p95 29.0ms, p99 29.8ms'
+        """
+        if not self.latencies_ms:
+            return 'Detection latency: no images'
+        summary = summarize_timings(self.latencies_ms)
+        return (f"Detection latency of {summary['count']} images: "
+                f"p50 {summary['p50_ms']:.1f}ms, p95 {summary['p95_ms']:.1f}ms, p99 {summary['p99_ms']:.1f}ms")
 
     def __str__(self, infix=False):
         infix = f'[{infix}] ' if infix else ""
@@ -0,0 +1,142 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import io
+import json
+import logging
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+from sample_images import IMG_DIR
+from src.app import create_app
+from src.constants import ENV_MAIN, LOGGING_LEVEL
+from src.init_runtime import init_runtime
+from src.services.dto.plugin_result import FaceDTO
+from src.services.facescan.plugins.base import BasePlugin
+from src.services.facescan.plugins.managers import plugin_manager
+from src.services.imgtools.read_img import read_img
+from src.services.utils.pyutils import Constants
+from tools.benchmark_pipeline.constants import ENV
+from tools.benchmark_pipeline.stage_stats import StageStats, compare_with_baseline
+
+logger = logging.getLogger(__name__)
+MTCNN_STAGES = ('_MTCNN__stage1', '_MTCNN__stage2', '_MTCNN__stage3')
+
+
+def _get_plugin_sets() -> Dict[str, List[BasePlugin]]:
+    plugin_sets = {}
+    for plugin_set in ENV.PLUGIN_SETS:
+        plugin_set = plugin_set.strip()
+        if plugin_set == 'none':
+            plugin_sets[plugin_set] = []
+        elif plugin_set == 'all':
+            plugin_sets[plugin_set] = plugin_manager.face_plugins
+        else:
+            plugin_sets[plugin_set] = plugin_manager.filter_face_plugins(Constants.split(plugin_set))
+    return plugin_sets
+
+
+@contextmanager
+def _timed_detection_stages(detector, stats: StageStats):
+    """ MTCNN calls its private stage methods by attribute, so they are wrapped on the instance """
+    net = getattr(detector, '_face_detection_net', None)
+    stages = [name for name in MTCNN_STAGES if hasattr(net, name)]
+    for i, name in enumerate(stages, 1):
+        setattr(net, name, stats.wrap(f'detection.mtcnn_stage{i}', getattr(net, name)))
+    try:
+        yield
+    finally:
+        for name in stages:
+            delattr(net, name)
+
+
+def _run_pipeline(img_bytes: bytes, face_plugins: List[BasePlugin], json_encoder, stats: StageStats):
+    detector = plugin_manager.detector
+    with stats.stage('read_img'):
+        img = read_img(io.BytesIO(img_bytes))
+    # detectors downscale the image themselves, so the detection stage includes downscaling as in the service
+    with stats.stage('detection'):
+        batch = detector.find_faces_batch(img)
+    with stats.stage('crop_face'):
+        faces = [FaceDTO(img=img, face_img=detector.crop_face(img, box), box=box) for box in batch.to_boxes()]
+    for plugin in face_plugins:
+        with stats.stage(f'plugin.{plugin.slug}'):
+            for face in faces:
+                face._plugins_dto.append(plugin(face))
+    with stats.stage('face_batch'):
+        batch.add_plugin_results([face._plugins_dto for face in faces], [face.execution_time for face in faces])
+    with stats.stage('json_encoding'):
+        plugins_versions = {p.slug: str(p) for p in [detector] + face_plugins}
+        json.dumps(dict(plugins_versions=plugins_versions, result=batch), cls=json_encoder)
+
+
+def _benchmark(imgs: Dict[str, bytes], face_plugins: List[BasePlugin], json_encoder) -> dict:
+    for _ in range(ENV.WARMUP_REPEATS):
+        for img_bytes in imgs.values():
+            _run_pipeline(img_bytes, face_plugins, json_encoder, StageStats())
+
+    stats = StageStats()
+    with _timed_detection_stages(plugin_manager.detector, stats):
+        for _ in range(ENV.REPEATS):
+            for img_bytes in imgs.values():
+                _run_pipeline(img_bytes, face_plugins, json_encoder, stats)
+
+        if ENV.TRACE_ALLOCATIONS:
+            # timings are not measured under tracing, it slows down allocations
+            stats.trace_allocations = True
+            tracemalloc.start()
+            for img_bytes in imgs.values():
+                _run_pipeline(img_bytes, face_plugins, json_encoder, stats)
+            tracemalloc.stop()
+    return stats.to_json()
+
+
+def _print_results(results: dict):
+    for plugin_set, set_results in results.items():
+        print(f"\n[{plugin_set}] {'stage':<28} {'p50, ms':>10} {'p95, ms':>10} {'p99, ms':>10} {'peak, KB':>10}")
+        for stage, summary in set_results['stages'].items():
+            peak_kb = set_results['allocations'].get(stage, {}).get('peak_kb', '')
+            print(f"{'':<{len(plugin_set) + 2}} {stage:<28} {summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} "
+                  f"{summary['p99_ms']:>10.2f} {peak_kb:>10}")
+
+
+if __name__ == '__main__':
+    init_runtime(logging_level=LOGGING_LEVEL)
+    logger.info(ENV.to_json() if ENV_MAIN.IS_DEV_ENV else ENV.to_str())
+
+    imgs = {img_name: (IMG_DIR / img_name).read_bytes() for img_name in ENV.IMG_NAMES}
+    json_encoder = create_app().json_encoder
+    results = {plugin_set: _benchmark(imgs, face_plugins, json_encoder)
+               for plugin_set, face_plugins in _get_plugin_sets().items()}
+    _print_results(results)
+
+    output_path = Path(ENV.OUTPUT_PATH)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(dict(
+        plugins={p.slug: str(p) for p in plugin_manager.plugins},
+        img_names=ENV.IMG_NAMES, repeats=ENV.REPEATS, results=results
+    ), indent=2))
+    logger.info(f"Saved results to '{output_path}'")
+
+    if ENV.BASELINE_PATH:
+        baseline = json.loads(Path(ENV.BASELINE_PATH).read_text())
+        regressions = compare_with_baseline(results, baseline['results'], ENV.REGRESSION_THRESHOLD)
+        for regression in regressions:
+            logger.error(f'Regression: {regression}')
+        if regressions:
+            sys.exit(1)
+        logger.info(f"No regressions against '{ENV.BASELINE_PATH}'")
@@ -0,0 +1,35 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from sample_images.annotations import SAMPLE_IMAGES
+from src.constants import ENV_MAIN
+from src.services.utils.pyutils import Constants, get_env, get_env_split, get_env_bool
+
+
+class ENV(Constants):
+    if get_env('IMG_NAMES', '') == '':
+        IMG_NAMES = [i.img_name for i in SAMPLE_IMAGES]
+    else:
+        IMG_NAMES = get_env_split('IMG_NAMES')
+    REPEATS = int(get_env('REPEATS', '5'))
+    WARMUP_REPEATS = int(get_env('WARMUP_REPEATS', '1'))
+    # sets of face plugin slugs separated by ';', 'none' - detection only, 'all' - every configured plugin
+    PLUGIN_SETS = get_env('PLUGIN_SETS', 'none;all').split(';')
+    TRACE_ALLOCATIONS = get_env_bool('TRACE_ALLOCATIONS', True)
+
+    OUTPUT_PATH = get_env('OUTPUT_PATH', 'tmp/benchmark_pipeline.json')
+    BASELINE_PATH = get_env('BASELINE_PATH', ' ').strip()
+    REGRESSION_THRESHOLD = float(get_env('REGRESSION_THRESHOLD', '0.1'))
+
+    LOGGING_LEVEL_NAME = ENV_MAIN.LOGGING_LEVEL_NAME
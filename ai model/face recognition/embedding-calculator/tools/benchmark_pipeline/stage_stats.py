@@ -0,0 +1,111 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import functools
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize_timings(timings_ms: List[float]) -> Dict[str, float]:
+    """
+    >>> summarize_timings([1, 2, 3, 4, 100])['p50_ms']
+    3.0
+    >>> summarize_timings([1, 2, 3, 4, 100])['count']
+    5
+    """
+    summary = dict(count=len(timings_ms), mean_ms=round(float(np.mean(timings_ms)), 3))
+    for percentile, value in zip(PERCENTILES, np.percentile(timings_ms, PERCENTILES)):
+        summary[f'p{percentile}_ms'] = round(float(value), 3)
+    return summary
+
+
+class StageStats:
+    """ Collects durations and allocations of named pipeline stages """
+
+    def __init__(self):
+        self._timings_ms: Dict[str, List[float]] = defaultdict(list)
+        self._allocations_kb: Dict[str, List[float]] = defaultdict(list)
+        self._peaks_kb: Dict[str, List[float]] = defaultdict(list)
+        self.trace_allocations = False
+        self._depth = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.trace_allocations:
+            start = time.perf_counter()
+            yield
+            self._timings_ms[name].append((time.perf_counter() - start) * 1000)
+            return
+
+        self._depth += 1
+        try:
+            if self._depth > 1:
+                # clearing traces inside would spoil the measurement of the enclosing stage
+                yield
+                return
+            # Python 3.8 has no tracemalloc.reset_peak(), clearing traces resets the peak too
+            tracemalloc.clear_traces()
+            yield
+            current, peak = tracemalloc.get_traced_memory()
+            self._allocations_kb[name].append(current / 1024)
+            self._peaks_kb[name].append(peak / 1024)
+        finally:
+            self._depth -= 1
+
+    def wrap(self, name: str, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def to_json(self) -> dict:
+        """
+        >>> stats = StageStats()
+        >>> with stats.stage('read_img'): pass
+        >>> sorted(stats.to_json()['stages']['read_img'])
+        ['count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms']
+        """
+        return dict(
+            stages={name: summarize_timings(timings) for name, timings in self._timings_ms.items()},
+            allocations={name: dict(retained_kb=round(float(np.mean(self._allocations_kb[name])), 1),
+                                    peak_kb=round(float(np.max(self._peaks_kb[name])), 1))
+                         for name in self._allocations_kb},
+        )
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Returns descriptions of stages which p50 or p95 got slower by more than `threshold`
+    >>> compare_with_baseline({'all': {'stages': {'crop_face': {'p50_ms': 2.0, 'p95_ms': 2.0}}}},
+    ...                       {'all': {'stages': {'crop_face': {'p50_ms': 1.0, 'p95_ms': 2.0}}}}, 0.1)
+    ['[all] crop_face p50: 1.000ms -> 2.000ms (+100%)']
+    """
+    regressions = []
+    for plugin_set, set_results in results.items():
+        baseline_stages = baseline.get(plugin_set, {}).get('stages', {})
+        for stage, summary in set_results['stages'].items():
+            for key in ('p50_ms', 'p95_ms'):
+                old, new = baseline_stages.get(stage, {}).get(key), summary[key]
+                if old and (new - old) / old > threshold:
+                    regressions.append(f"[{plugin_set}] {stage} {key[:-3]}: "
+                                       f"{old:.3f}ms -> {new:.3f}ms (+{(new - old) / old:.0%})")
+    return regressions
@@ -0,0 +1,166 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import base64
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+import requests
+
+from sample_images import IMG_DIR
+from src.constants import ENV_MAIN, LOGGING_LEVEL
+from src.init_runtime import init_runtime
+from tools.load_test.constants import ENV
+from tools.load_test.load_stats import LevelResult, find_saturation_point
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _uwsgi_server(port: int):
+    cmd = ['uwsgi', '--module', 'src.app:wsgi_app()', '--http-socket', f'127.0.0.1:{port}',
+           '--master', '--need-app', '--enable-threads', '--disable-logging',
+           '--processes', str(ENV.PROCESSES), '--threads', str(ENV.THREADS)]
+    # the thread budget of the service depends on the count of workers
+    env = dict(os.environ, UWSGI_PROCESSES=str(ENV.PROCESSES))
+    process = subprocess.Popen(cmd, env=env)
+    try:
+        yield
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextmanager
+def _flask_server(port: int):
+    from werkzeug.serving import make_server
+    from src._endpoints import endpoints
+    from src.app import create_app
+
+    server = make_server('127.0.0.1', port, create_app(endpoints), threaded=ENV.THREADS > 1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        server.shutdown()
+
+
+@contextmanager
+def _local_service():
+    servers = dict(uwsgi=_uwsgi_server, flask=_flask_server)
+    with servers[ENV.SERVER](ENV.PORT):
+        url = f'http://127.0.0.1:{ENV.PORT}'
+        _wait_until_ready(url)
+        yield url
+
+
+def _wait_until_ready(url: str):
+    deadline = time.time() + ENV.STARTUP_TIMEOUT_S
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{url}/healthcheck', timeout=5).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"Service '{url}' is not ready in {ENV.STARTUP_TIMEOUT_S}s")
+
+
+def _send(session: requests.Session, url: str, endpoint: str, img_name: str, img_bytes: bytes) -> requests.Response:
+    if endpoint == 'find_faces_base64':
+        return session.post(f'{url}/{endpoint}', json={'file': base64.b64encode(img_bytes).decode()})
+    return session.post(f'{url}/{endpoint}', files={'file': (img_name, img_bytes)})
+
+
+def _run_level(url: str, imgs: Dict[str, bytes], concurrency: int) -> LevelResult:
+    result = LevelResult(concurrency=concurrency, duration_s=ENV.DURATION_S)
+    requests_mix = itertools.cycle(itertools.product(ENV.ENDPOINTS, imgs.items()))
+    lock = threading.Lock()
+    deadline = time.time() + ENV.DURATION_S
+
+    def run_client():
+        with requests.Session() as session:
+            while time.time() < deadline:
+                with lock:
+                    endpoint, (img_name, img_bytes) = next(requests_mix)
+                start = time.perf_counter()
+                try:
+                    response = _send(session, url, endpoint, img_name, img_bytes)
+                    error = None if response.status_code == 200 else f'{endpoint}: HTTP {response.status_code}'
+                except requests.RequestException as e:
+                    error = f'{endpoint}: {type(e).__name__}'
+                latency_ms = (time.perf_counter() - start) * 1000
+                with lock:
+                    result.add(latency_ms, error)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(run_client) for _ in range(concurrency)]:
+            future.result()
+    return result
+
+
+def _run_sweep(url: str) -> dict:
+    imgs = {img_name: (IMG_DIR / img_name).read_bytes() for img_name in ENV.IMG_NAMES}
+    for endpoint in ENV.ENDPOINTS:  # the first requests load models
+        with requests.Session() as session:
+            _send(session, url, endpoint, *next(iter(imgs.items())))
+
+    print(f"{'concurrency':>12} {'req/s':>8} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'errors':>7}")
+    levels = []
+    for concurrency in ENV.CONCURRENCY:
+        level = _run_level(url, imgs, concurrency).to_json()
+        levels.append(level)
+        latency = level['latency']
+        print(f"{concurrency:>12} {level['throughput_rps']:>8.2f} {latency.get('p50_ms', 0):>9.1f} "
+              f"{latency.get('p95_ms', 0):>9.1f} {latency.get('p99_ms', 0):>9.1f} {sum(level['errors'].values()):>7}")
+
+    saturation_point = find_saturation_point({k['concurrency']: k['throughput_rps'] for k in levels},
+                                             ENV.SATURATION_GAIN)
+    if saturation_point is None:
+        print(f'\nNot saturated up to concurrency {ENV.CONCURRENCY[-1]}')
+    else:
+        print(f'\nSaturated at concurrency {saturation_point}')
+    server = None if ENV.ML_URL else dict(type=ENV.SERVER, processes=ENV.PROCESSES, threads=ENV.THREADS)
+    return dict(url=url, server=server,
+                endpoints=ENV.ENDPOINTS, img_names=ENV.IMG_NAMES, duration_s=ENV.DURATION_S,
+                saturation_concurrency=saturation_point, levels=levels)
+
+
+if __name__ == '__main__':
+    init_runtime(logging_level=LOGGING_LEVEL)
+    logger.info(ENV.to_json() if ENV_MAIN.IS_DEV_ENV else ENV.to_str())
+
+    if ENV.ML_URL:
+        _wait_until_ready(ENV.ML_URL)
+        results = _run_sweep(ENV.ML_URL)
+    else:
+        with _local_service() as local_url:
+            results = _run_sweep(local_url)
+
+    output_path = Path(ENV.OUTPUT_PATH)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(results, indent=2))
+    logger.info(f"Saved results to '{output_path}'")
+    sys.exit(0 if all(not level['errors'] for level in results['levels']) else 1)
@@ -0,0 +1,40 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from sample_images.annotations import SAMPLE_IMAGES
+from src.constants import ENV_MAIN
+from src.services.utils.pyutils import Constants, get_env, get_env_split
+
+
+class ENV(Constants):
+    # target service; empty - the app is started locally with SERVER
+    ML_URL = get_env('ML_URL', ' ').strip()
+    SERVER = get_env('SERVER', 'uwsgi')  # uwsgi or flask
+    PORT = int(get_env('PORT', '3010'))
+    PROCESSES = int(get_env('PROCESSES', '1'))
+    THREADS = int(get_env('THREADS', '1'))
+    STARTUP_TIMEOUT_S = float(get_env('STARTUP_TIMEOUT_S', '300'))
+
+    ENDPOINTS = get_env_split('ENDPOINTS', 'find_faces scan_faces find_faces_base64')
+    if get_env('IMG_NAMES', '') == '':
+        IMG_NAMES = [i.img_name for i in SAMPLE_IMAGES if i.include_to_tests and i.noses]
+    else:
+        IMG_NAMES = get_env_split('IMG_NAMES')
+    CONCURRENCY = [int(k) for k in get_env_split('CONCURRENCY', '1 2 4 8 16 32')]
+    DURATION_S = float(get_env('DURATION_S', '30'))
+    # throughput gain of a concurrency level below which the service is considered saturated
+    SATURATION_GAIN = float(get_env('SATURATION_GAIN', '0.05'))
+
+    OUTPUT_PATH = get_env('OUTPUT_PATH', 'tmp/load_test.json')
+    LOGGING_LEVEL_NAME = ENV_MAIN.LOGGING_LEVEL_NAME
@@ -0,0 +1,59 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from typing import Dict, List, Optional
+
+import attr
+
+from tools.benchmark_pipeline.stage_stats import summarize_timings
+
+
+@attr.s(auto_attribs=True)
+class LevelResult:
+    """ Responses of one concurrency level """
+    concurrency: int
+    duration_s: float
+    latencies_ms: List[float] = attr.Factory(list)
+    errors: Dict[str, int] = attr.Factory(dict)
+
+    def add(self, latency_ms: float, error: str = None):
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.latencies_ms.append(latency_ms)
+
+    @property
+    def throughput(self) -> float:
+        """ Successful requests per second """
+        return len(self.latencies_ms) / self.duration_s
+
+    def to_json(self) -> dict:
+        latency = summarize_timings(self.latencies_ms) if self.latencies_ms else dict(count=0)
+        return dict(concurrency=self.concurrency, throughput_rps=round(self.throughput, 2),
+                    errors=self.errors, latency=latency)
+
+
+def find_saturation_point(throughputs: Dict[int, float], min_gain: float) -> Optional[int]:
+    """
+    The highest concurrency level after which more concurrency does not add throughput
+    >>> find_saturation_point({1: 10, 2: 19, 4: 30, 8: 30.5, 16: 29}, min_gain=0.05)
+    4
+    >>> find_saturation_point({1: 10, 2: 19}, min_gain=0.05) is None
+    True
+    """
+    levels = sorted(throughputs)
+    for previous, level in zip(levels, levels[1:]):
+        if throughputs[level] < throughputs[previous] * (1 + min_gain):
+            return previous
+    return None
@@ -0,0 +1,34 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import os
+
+from sample_images.annotations import SAMPLE_IMAGES
+from src.constants import ENV_MAIN
+from src.services.utils.pyutils import Constants, get_env, get_env_split
+
+
+class ENV(Constants):
+    LOGGING_LEVEL_NAME = ENV_MAIN.LOGGING_LEVEL_NAME
+    IMG_NAMES = get_env_split('IMG_NAMES', ' '.join([i.img_name for i in SAMPLE_IMAGES]))
+    # search strategies run one after another: halving, grid, random
+    STRATEGIES = get_env_split('STRATEGIES', 'halving grid random')
+    PROCESSES = int(get_env('PROCESSES', str(os.cpu_count())))
+    BATCH_SIZE = int(get_env('BATCH_SIZE', '64'))
+    STAGE_CACHE_SIZE = int(get_env('STAGE_CACHE_SIZE', '20000'))
+    TOP_K = int(get_env('TOP_K', '100'))
+    CHECKPOINT_EVERY_S = int(get_env('CHECKPOINT_EVERY_S', '120'))
+    # successive halving: candidates are evaluated on a growing share of images, the best 1/ETA are kept
+    HALVING_CANDIDATES = int(get_env('HALVING_CANDIDATES', '729'))
+    HALVING_ETA = int(get_env('HALVING_ETA', '3'))
@@ -0,0 +1,72 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import logging
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+from sample_images import IMG_DIR
+from sample_images.annotations import SAMPLE_IMAGES
+from src.constants import LOGGING_LEVEL
+from src.init_runtime import init_runtime
+from src.services.facescan.scanner.test.calculate_errors import calculate_errors
+from src.services.imgtools.read_img import read_img
+from tools.optimize_detection_params.constants import ENV
+from tools.optimize_detection_params.stage_cache import StageCache
+
+cached_read_img = lru_cache(maxsize=None)(read_img)
+_task = None
+
+
+class Facenet2018DetectionThresholdOptimization:
+    """ Arguments: det_prob_threshold and thresholds of the three MTCNN stages """
+
+    def __init__(self, img_names: List[str], stage_cache_size: int):
+        from src.services.facescan.plugins.facenet.facenet import FaceDetector
+
+        self.arg_count = 4
+        self.detector = FaceDetector()
+        self.dataset = {row.img_name: row for row in SAMPLE_IMAGES if row.img_name in img_names}
+        self.stage_cache = StageCache(stage_cache_size)
+        self.stage_cache.attach(self.detector._face_detection_net)
+        self.default_x = [self.detector.det_prob_threshold, *self.detector._face_detection_net._steps_threshold]
+        logging.getLogger('src.services.facescan.scanner.test.calculate_errors').setLevel(logging.WARNING)
+        logging.getLogger('src.services.facescan.plugins.facenet.facenet').setLevel(logging.INFO)
+
+    def cost(self, new_x=None, img_names: Optional[Sequence[str]] = None):
+        """ Without `new_x` the default thresholds are evaluated, the previous candidate may have changed them """
+        new_x = new_x or self.default_x
+        # MTCNN reads stage thresholds on every call, so they are changed in place
+        self.detector.det_prob_threshold = new_x[0]
+        self.detector._face_detection_net._steps_threshold = list(new_x[1:])
+
+        total_errors = 0
+        for img_name in img_names or self.dataset:
+            img = cached_read_img(IMG_DIR / img_name)
+            with self.stage_cache.image(img_name):
+                boxes = self.detector.find_faces(img)
+            total_errors += calculate_errors(boxes, self.dataset[img_name].noses)
+        return total_errors
+
+
+def init_worker(img_names: List[str]):
+    """ Runs in spawned processes, so it lives outside of `__main__` """
+    global _task
+    init_runtime(logging_level=LOGGING_LEVEL)
+    _task = Facenet2018DetectionThresholdOptimization(img_names, ENV.STAGE_CACHE_SIZE)
+
+
+def evaluate(candidate: Tuple[Optional[Sequence[float]], Optional[Sequence[str]]]) -> int:
+    args, img_names = candidate
+    return _task.cost(args, img_names)
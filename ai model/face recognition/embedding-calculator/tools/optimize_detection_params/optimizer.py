@@ -12,9 +12,12 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
+import itertools
 import logging
+import math
 import time
 from collections import namedtuple
+from typing import Callable, Iterable, List, Sequence
 
 from src.services.utils.pyutils import get_current_dir
 from tools.optimize_detection_params.results_storage import ResultsStorage
@@ -25,23 +28,86 @@ Score = namedtuple('Score', 'cost args')
 logger = logging.getLogger(__name__)
 
 
+def get_halving_rungs(candidate_count: int, img_count: int, eta: int) -> List[int]:
+    """
+    Image counts of successive halving rungs, the last rung uses every image
+    >>> get_halving_rungs(81, img_count=30, eta=3)
+    [1, 2, 4, 10, 30]
+    >>> get_halving_rungs(5, img_count=30, eta=3)
+    [10, 30]
+    """
+    rung_count = 1
+    while candidate_count >= eta:
+        candidate_count //= eta
+        rung_count += 1
+    return sorted({math.ceil(img_count / eta ** k) for k in range(rung_count)})
+
+
 class Optimizer:
-    def __init__(self, task, results_storage: ResultsStorage, checkpoint_every_s):
-        self._task = task
+    """
+    Evaluates candidates with `evaluate((args, img_names)) -> cost` in a process pool.
+    Candidates are sorted before being split into chunks, so candidates sharing
+    upstream thresholds are evaluated by the same worker and reuse its cached stage outputs.
+    """
+
+    def __init__(self, pool, evaluate: Callable, results_storage: ResultsStorage,
+                 checkpoint_every_s, batch_size: int, processes: int):
+        self._pool = pool
+        self._evaluate = evaluate
         self._results_storage = results_storage
         self._checkpoint_every_s = checkpoint_every_s
+        self._batch_size = batch_size
+        self._processes = processes
+        self._last_checkpoint_s = time.time()
 
-    def optimize(self, get_new_args_iterator):
-        logger.info(f"Init cost: {self._task.cost()}")
-        last_checkpoint_s = time.time()
+    def _evaluate_batch(self, args_batch: List[Sequence[float]], img_names: Sequence[str] = None) -> List[Score]:
+        args_batch = sorted(args_batch, key=lambda args: tuple(args[1:]) + tuple(args[:1]))
+        chunksize = max(len(args_batch) // self._processes, 1)
+        costs = self._pool.map(self._evaluate, [(args, img_names) for args in args_batch], chunksize)
+        return [Score(cost, args) for cost, args in zip(costs, args_batch)]
+
+    def _checkpoint(self):
+        if (time.time() - self._last_checkpoint_s) > self._checkpoint_every_s:
+            self._results_storage.save()
+            self._last_checkpoint_s = time.time()
+
+    def optimize(self, get_new_args_iterator: Iterable[Sequence[float]]):
+        logger.info(f"Init cost: {self._pool.apply(self._evaluate, ((None, None),))}")
         try:
-            for args in get_new_args_iterator:
-                cost = self._task.cost(args)
-                self._results_storage.add_score(Score(cost, args))
-                logger.debug(f"{cost} <- {tuple(args)}")
-                if (time.time() - last_checkpoint_s) > self._checkpoint_every_s:
-                    self._results_storage.save()
-                    last_checkpoint_s = time.time()
+            args_iterator = iter(get_new_args_iterator)
+            while True:
+                args_batch = list(itertools.islice(args_iterator, self._batch_size))
+                if not args_batch:
+                    break
+                for score in self._evaluate_batch(args_batch):
+                    self._results_storage.add_score(score)
+                    logger.debug(f"{score.cost} <- {tuple(score.args)}")
+                self._checkpoint()
         except Exception as e:
             self._results_storage.save()
             raise e from None
+        self._results_storage.save()
+
+    def successive_halving(self, candidates: List[Sequence[float]], img_names: List[str], eta: int):
+        """
+        Evaluates all candidates on a small share of images, keeps the best 1/eta of them
+        and repeats with eta times more images, until the survivors are evaluated on all images
+        """
+        rungs = get_halving_rungs(len(candidates), len(img_names), eta)
+        try:
+            for rung_idx, img_count in enumerate(rungs):
+                scores = []
+                for start in range(0, len(candidates), self._batch_size):
+                    scores.extend(self._evaluate_batch(candidates[start:start + self._batch_size],
+                                                       img_names[:img_count]))
+                scores.sort(key=lambda score: score.cost)
+                logger.info(f'Halving rung {rung_idx + 1}/{len(rungs)}: {len(candidates)} candidates on '
+                            f'{img_count} images, best cost {scores[0].cost} <- {tuple(scores[0].args)}')
+                if img_count == len(img_names):
+                    for score in scores:
+                        self._results_storage.add_score(score)
+                    break
+                candidates = [score.args for score in scores[:max(len(scores) // eta, 1)]]
+                self._checkpoint()
+        finally:
+            self._results_storage.save()
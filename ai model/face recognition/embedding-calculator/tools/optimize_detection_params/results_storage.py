@@ -12,6 +12,8 @@
 #  or implied. See the License for the specific language governing
 #  permissions and limitations under the License.
 
+import heapq
+import itertools
 import time
 from pathlib import Path
 
@@ -19,22 +21,43 @@ import joblib
 
 
 class ResultsStorage:
-    def __init__(self):
-        self._scores = []
+    """
+    Keeps the `top_k` scores with the lowest cost in a bounded heap
+    >>> from collections import namedtuple
+    >>> Score = namedtuple('Score', 'cost args')
+    >>> storage = ResultsStorage(top_k=2, checkpoint_dir=None)
+    >>> for cost in (5, 1, 3, 4): storage.add_score(Score(cost, [cost / 10]))
+    >>> [score.cost for score in storage.best_scores()]
+    [1, 3]
+    """
+
+    def __init__(self, top_k: int = 100, checkpoint_dir='tmp'):
+        self._top_k = top_k
+        # max-heap by cost, the worst of the kept scores is replaced first
+        self._heap = []
+        self._counter = itertools.count()
         self._total_scores = 0
         timestamp_ms = int(round(time.time() * 1000))
-        self._checkpoint_filename = Path('tmp') / f'scores_top100_{timestamp_ms}.joblib'
+        self._checkpoint_filename = checkpoint_dir and Path(checkpoint_dir) / f'scores_top{top_k}_{timestamp_ms}.joblib'
+
+    def best_scores(self):
+        return [score for _, _, score in sorted(self._heap, reverse=True)]
 
     def save(self):
-        self._scores = sorted(self._scores, key=lambda x: x.cost)[:100]
-        joblib.dump(self._scores, self._checkpoint_filename)
+        scores = self.best_scores()
+        if not scores:
+            return
+        joblib.dump(scores, self._checkpoint_filename)
         print(f"[Best out of {self._total_scores}]:"
-              f" Cost = {self._scores[0].cost} <- {tuple(self._scores[0].args)}."
-              f" Saved top 100 to '{self._checkpoint_filename}'.", flush=True)
+              f" Cost = {scores[0].cost} <- {tuple(scores[0].args)}."
+              f" Saved top {self._top_k} to '{self._checkpoint_filename}'.", flush=True)
 
     def add_score(self, score):
-        self._scores.append(score)
         self._total_scores += 1
-        score_count = len(self._scores)
-        if score_count == 1 or score_count >= 5000:
+        item = (-score.cost, next(self._counter), score)
+        if len(self._heap) < self._top_k:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+        if self._total_scores == 1 and self._checkpoint_filename:
             self.save()
@@ -0,0 +1,80 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Hashable, Optional
+
+MTCNN_STAGES = ('_MTCNN__stage1', '_MTCNN__stage2', '_MTCNN__stage3')
+
+
+class StageCache:
+    """
+    Caches outputs of MTCNN stages. The output of the n-th stage depends only on the
+    image and the thresholds of stages 1..n, so candidates sharing upstream thresholds
+    reuse it. MTCNN calls its private stage methods by attribute, so they are wrapped
+    on the instance.
+    >>> class MTCNN:
+    ...     _steps_threshold = [0.5, 0.5, 0.5]
+    ...     calls = 0
+    ...     def _MTCNN__stage1(self, img, scales, status):
+    ...         self.calls += 1
+    ...         return 'boxes1', status
+    >>> net, cache = MTCNN(), StageCache(maxsize=10)
+    >>> cache.attach(net, stages=MTCNN_STAGES[:1])
+    >>> for threshold_b in (0.6, 0.7):
+    ...     net._steps_threshold = [0.5, threshold_b, 0.5]
+    ...     with cache.image('img.jpg'): _ = net._MTCNN__stage1(None, None, None)
+    >>> net.calls, cache.hits, cache.misses
+    (1, 1, 1)
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._outputs = OrderedDict()
+        self._img_key: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+
+    def attach(self, net, stages=MTCNN_STAGES):
+        for stage_idx, name in enumerate(stages):
+            setattr(net, name, self._wrap(net, stage_idx, getattr(net, name)))
+
+    @contextmanager
+    def image(self, img_key: Hashable):
+        """ Outputs are cached only for calls inside the block """
+        self._img_key = img_key
+        try:
+            yield
+        finally:
+            self._img_key = None
+
+    def _wrap(self, net, stage_idx: int, stage):
+        @functools.wraps(stage)
+        def wrapper(*args):
+            if self._img_key is None:
+                return stage(*args)
+            key = (self._img_key, stage_idx, tuple(net._steps_threshold[:stage_idx + 1]))
+            if key in self._outputs:
+                self.hits += 1
+                self._outputs.move_to_end(key)
+                return self._outputs[key]
+            self.misses += 1
+            output = stage(*args)
+            self._outputs[key] = output
+            if len(self._outputs) > self._maxsize:
+                self._outputs.popitem(last=False)
+            return output
+        return wrapper
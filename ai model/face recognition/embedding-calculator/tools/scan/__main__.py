@@ -13,8 +13,13 @@
 #  permissions and limitations under the License.
 
 import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from sample_images import IMG_DIR
 from sample_images.annotations import name_2_annotation, SAMPLE_IMAGES
@@ -27,8 +32,10 @@ from src.services.facescan.scanner.test.calculate_errors import calculate_errors
 from src.services.imgtools.read_img import read_img
 from src.services.utils.pyutils import get_env, Constants, get_env_split, get_env_bool, s
 from tools._save_img import save_img
+from tools.benchmark_pipeline.stage_stats import summarize_timings
 
 logger = logging.getLogger(__name__)
+ScanResult = namedtuple('ScanResult', 'img_name faces latency_ms error')
 
 
 class ENV(Constants):
@@ -43,6 +50,9 @@ class ENV(Constants):
     else:
         IMG_NAMES = get_env_split('IMG_NAMES')
     SAVE_IMG_str = get_env('SAVE_IMG', 'true').lower()
+    # images are scanned concurrently in batches, a batch is finished before the next one is sent
+    WORKERS = int(get_env('WORKERS', '1'))
+    BATCH_SIZE = int(get_env('BATCH_SIZE', '32'))
 
     LOGGING_LEVEL_NAME = ENV_MAIN.LOGGING_LEVEL_NAME
 
@@ -51,9 +61,18 @@ SAVE_IMG = Constants.str_to_bool(ENV.SAVE_IMG_str)
 SAVE_IMG_ON_ERROR = ENV.SAVE_IMG_str == 'on_error'
 
 
-def _scan_faces_remote(ml_url: str, img_name: str):
-    files = {'file': open(IMG_DIR / img_name, 'rb')}
-    res = requests.post(f"{ml_url}/scan_faces", files=files)
+def _create_session(workers: int) -> requests.Session:
+    """ Keeps a connection alive for every worker """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _scan_faces_remote(session: requests.Session, ml_url: str, img_name: str):
+    files = {'file': (img_name, (IMG_DIR / img_name).read_bytes())}
+    res = session.post(f"{ml_url}/scan_faces", files=files)
     if res.status_code == 400 and NoFaceFoundError.description in res.json()['message']:
         return []
     assert res.status_code == 200, res.content
@@ -65,11 +84,31 @@ def _scan_faces_local(img_name):
     return scanner.scan(img)
 
 
-def _scan_faces(img_name: str):
-    if ENV.USE_REMOTE:
-        return _scan_faces_remote(ENV.ML_URL, img_name)
-    else:
-        return _scan_faces_local(img_name)
+def _scan_faces(img_name: str, session: Optional[requests.Session]) -> ScanResult:
+    start = time.perf_counter()
+    faces, error = None, None
+    try:
+        if ENV.USE_REMOTE:
+            faces = _scan_faces_remote(session, ENV.ML_URL, img_name)
+        else:
+            faces = _scan_faces_local(img_name)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        logger.error(f"Failed to scan '{img_name}': {error}")
+    return ScanResult(img_name, faces, (time.perf_counter() - start) * 1000, error)
+
+
+def _scan_all(img_names: List[str]) -> Iterator[ScanResult]:
+    """ Yields results in the order of images """
+    session = _create_session(ENV.WORKERS) if ENV.USE_REMOTE else None
+    try:
+        with ThreadPoolExecutor(ENV.WORKERS) as executor:
+            for start in range(0, len(img_names), ENV.BATCH_SIZE):
+                batch = img_names[start:start + ENV.BATCH_SIZE]
+                yield from executor.map(lambda img_name: _scan_faces(img_name, session), batch)
+    finally:
+        if session:
+            session.close()
 
 
 def _calculate_errors(boxes, noses, img_name):
@@ -85,13 +124,32 @@ def _calculate_errors(boxes, noses, img_name):
     return error_count
 
 
+def _log_throughput(results: List[ScanResult], elapsed_s: float):
+    failed = sum(1 for result in results if result.error)
+    message = (f"Scanned {len(results)} image{s(len(results))} in {elapsed_s:.1f}s "
+               f"({len(results) / elapsed_s:.2f} images/s with {ENV.WORKERS} worker{s(ENV.WORKERS)}), "
+               f"failed requests: {failed} ({failed / max(len(results), 1):.1%})")
+    latencies_ms = [result.latency_ms for result in results if not result.error]
+    if latencies_ms:
+        summary = summarize_timings(latencies_ms)
+        message += (f", latency p50 {summary['p50_ms']:.0f}ms, p95 {summary['p95_ms']:.0f}ms, "
+                    f"p99 {summary['p99_ms']:.0f}ms")
+    logger.info(message)
+
+
 if __name__ == '__main__':
     init_runtime(logging_level=LOGGING_LEVEL)
     logger.info(ENV.to_json() if ENV_MAIN.IS_DEV_ENV else ENV.to_str())
 
     total_error_count = 0
-    for img_name in ENV.IMG_NAMES:
-        boxes = [face.box for face in _scan_faces(img_name)]
+    results = []
+    start_s = time.perf_counter()
+    for result in _scan_all(ENV.IMG_NAMES):
+        results.append(result)
+        if result.error:
+            continue
+        img_name = result.img_name
+        boxes = [face.box for face in result.faces]
         noses = name_2_annotation.get(img_name)
 
         error_count = _calculate_errors(boxes, noses, img_name)
@@ -100,7 +158,10 @@ if __name__ == '__main__':
         if SAVE_IMG or SAVE_IMG_ON_ERROR and error_count:
             img = read_img(IMG_DIR / img_name)
             save_img(img, boxes, noses, img_name)
+    _log_throughput(results, time.perf_counter() - start_s)
 
-    if total_error_count:
-        logger.error(f"Found a total of {total_error_count} error{s(total_error_count)}")
+    failed_count = sum(1 for result in results if result.error)
+    if total_error_count or failed_count:
+        logger.error(f"Found a total of {total_error_count} error{s(total_error_count)}, "
+                     f"{failed_count} image{s(failed_count)} failed to scan")
         exit(1)
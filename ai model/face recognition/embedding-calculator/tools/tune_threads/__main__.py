@@ -0,0 +1,84 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import logging
+import multiprocessing
+import os
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from src.constants import ENV_MAIN, LOGGING_LEVEL
+from src.init_runtime import init_runtime
+from tools.tune_threads.constants import ENV
+from tools.tune_threads.worker import run_worker
+
+logger = logging.getLogger(__name__)
+
+
+def _get_configurations(workers: List[int], threads: List[int], cpu_count: int) -> List[Tuple[int, int]]:
+    """
+    Configurations that do not oversubscribe cores
+    >>> _get_configurations([1, 2, 4], [1, 2], cpu_count=4)
+    [(1, 1), (1, 2), (2, 1), (2, 2), (4, 1)]
+    """
+    return [(w, t) for w in workers for t in threads if w * t <= cpu_count]
+
+
+def _get_thread_env(workers: int, threads: int) -> Dict[str, str]:
+    return dict(UWSGI_PROCESSES=str(workers), MODEL_REPLICAS='1', INTRA_OP_THREADS=str(threads),
+                OMP_THREADS=str(threads), CV2_THREADS=str(threads))
+
+
+@contextmanager
+def _patched_environ(env: Dict[str, str]):
+    """ Spawned processes inherit the environment, so settings are read before frameworks are imported """
+    original = dict(os.environ)
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(original)
+
+
+def _measure_throughput(workers: int, threads: int) -> float:
+    """ Returns processed images per second of all workers together """
+    ctx = multiprocessing.get_context('spawn')
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    processes = [ctx.Process(target=run_worker, args=(ENV.IMG_NAMES, ENV.DURATION_S, barrier, results))
+                 for _ in range(workers)]
+    with _patched_environ(_get_thread_env(workers, threads)):
+        for process in processes:
+            process.start()
+    processed = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return processed / ENV.DURATION_S
+
+
+if __name__ == '__main__':
+    init_runtime(logging_level=LOGGING_LEVEL)
+    logger.info(ENV.to_json() if ENV_MAIN.IS_DEV_ENV else ENV.to_str())
+
+    throughputs = {}
+    for workers, threads in _get_configurations(ENV.WORKERS, ENV.THREADS, ENV.CPU_COUNT):
+        throughputs[workers, threads] = _measure_throughput(workers, threads)
+        logger.info(f'{workers} worker(s) x {threads} thread(s): {throughputs[workers, threads]:.2f} images/s')
+
+    print(f"{'workers':>8} {'threads':>8} {'images/s':>10}")
+    for (workers, threads), throughput in sorted(throughputs.items(), key=lambda k: k[1], reverse=True):
+        print(f'{workers:>8} {threads:>8} {throughput:>10.2f}')
+    best_workers, best_threads = max(throughputs, key=throughputs.get)
+    print('\nRecommended configuration:')
+    print(' '.join(f'{name}={value}' for name, value in _get_thread_env(best_workers, best_threads).items()))
@@ -0,0 +1,33 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import os
+
+from sample_images.annotations import SAMPLE_IMAGES
+from src.constants import ENV_MAIN
+from src.services.utils.pyutils import Constants, get_env, get_env_split
+
+
+class ENV(Constants):
+    WORKERS = [int(k) for k in get_env_split('WORKERS', '1 2 4 8')]
+    THREADS = [int(k) for k in get_env_split('THREADS', '1 2 4 8')]
+    CPU_COUNT = int(get_env('CPU_COUNT', str(os.cpu_count() or 1)))
+    DURATION_S = float(get_env('DURATION_S', '20'))
+    FACE_PLUGINS = get_env_split('FACE_PLUGINS', 'calculator')
+    if get_env('IMG_NAMES', '') == '':
+        IMG_NAMES = [i.img_name for i in SAMPLE_IMAGES if i.include_to_tests]
+    else:
+        IMG_NAMES = get_env_split('IMG_NAMES')
+
+    LOGGING_LEVEL_NAME = ENV_MAIN.LOGGING_LEVEL_NAME
@@ -0,0 +1,39 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import time
+from typing import List
+
+from sample_images import IMG_DIR
+from src.constants import LOGGING_LEVEL
+from src.init_runtime import init_runtime
+from src.services.facescan.plugins.managers import plugin_manager
+from src.services.imgtools.read_img import read_img
+from tools.tune_threads.constants import ENV
+
+
+def run_worker(img_names: List[str], duration_s: float, barrier, results):
+    """ Runs in spawned processes, so it lives outside of `__main__` """
+    init_runtime(logging_level=LOGGING_LEVEL)
+    imgs = [read_img(IMG_DIR / img_name) for img_name in img_names]
+    detector = plugin_manager.detector
+    face_plugins = plugin_manager.filter_face_plugins(ENV.FACE_PLUGINS)
+    detector(imgs[0], face_plugins=face_plugins)  # loads models
+
+    barrier.wait()
+    processed, start = 0, time.time()
+    while time.time() - start < duration_s:
+        detector(imgs[processed % len(imgs)], face_plugins=face_plugins)
+        processed += 1
+    results.put(processed)
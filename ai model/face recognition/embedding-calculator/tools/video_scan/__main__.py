@@ -0,0 +1,88 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import List, TextIO
+
+from src.constants import ENV_MAIN, LOGGING_LEVEL
+from src.init_runtime import init_runtime
+from src.services.facescan.plugins.managers import plugin_manager
+from src.services.utils.pyutils import s
+from tools.video_scan.constants import ENV
+from tools.video_scan.tracker import IouTracker, Track
+from tools.video_scan.video_reader import VideoReader
+
+logger = logging.getLogger(__name__)
+
+
+def _write_tracks(tracks: List[Track], video_path: str, fps: float, output: TextIO) -> int:
+    written = 0
+    for track in tracks:
+        if track.embedding is None:
+            continue
+        output.write(json.dumps({
+            'video': video_path,
+            'track_id': track.track_id,
+            'first_frame': track.first_frame,
+            'last_frame': track.last_frame,
+            'start_s': round(track.first_frame / fps, 3),
+            'end_s': round(track.last_frame / fps, 3),
+            'embedding_frame': track.embedding_frame,
+            'box': track.best_box.to_json(),
+            'embedding': [float(k) for k in track.embedding],
+        }) + '\n')
+        written += 1
+    return written
+
+
+def scan_video(video_path: str, output: TextIO):
+    detector, calculator = plugin_manager.detector, plugin_manager.calculator
+    reader = VideoReader(video_path, frame_stride=ENV.FRAME_STRIDE, queue_size=ENV.DECODE_QUEUE_SIZE)
+    tracker = IouTracker(iou_threshold=ENV.IOU_THRESHOLD, landmark_tolerance=ENV.LANDMARK_TOLERANCE,
+                         max_missed_frames=ENV.MAX_MISSED_FRAMES, quality_gain=ENV.QUALITY_GAIN)
+
+    start = time.time()
+    processed_frames = embedded_faces = written_tracks = 0
+    last_frame_idx = 0
+    for frame_idx, frame in reader:
+        boxes = detector.find_faces(frame)
+        for track in tracker.update(frame_idx, boxes):
+            track.set_embedding(calculator.calc_embedding(detector.crop_face(frame, track.best_box)))
+            embedded_faces += 1
+        written_tracks += _write_tracks(tracker.pop_finished(), video_path, reader.fps, output)
+        processed_frames += 1
+        last_frame_idx = frame_idx
+    written_tracks += _write_tracks(tracker.finish(), video_path, reader.fps, output)
+
+    elapsed_s = time.time() - start
+    video_s = (last_frame_idx + 1) / reader.fps
+    logger.info(f"'{video_path}': {written_tracks} track{s(written_tracks)}, "
+                f"{embedded_faces} embedding{s(embedded_faces)} from {processed_frames} processed frames, "
+                f"{video_s:.1f}s of video in {elapsed_s:.1f}s ({video_s / max(elapsed_s, 1e-6):.1f}x real-time)")
+
+
+if __name__ == '__main__':
+    init_runtime(logging_level=LOGGING_LEVEL)
+    logger.info(ENV.to_json() if ENV_MAIN.IS_DEV_ENV else ENV.to_str())
+
+    output_dir = Path(ENV.OUTPUT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for video_path in ENV.VIDEO_PATHS:
+        output_path = output_dir / f'{Path(video_path).stem}_tracks.jsonl'
+        with output_path.open('w') as output_file:
+            scan_video(video_path, output_file)
+        logger.info(f"Saved tracks to '{output_path}'")
@@ -0,0 +1,31 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from src.constants import ENV_MAIN
+from src.services.utils.pyutils import Constants, get_env, get_env_split
+
+
+class ENV(Constants):
+    VIDEO_PATHS = get_env_split('VIDEO_PATHS', ' ')
+    OUTPUT_DIR = get_env('OUTPUT_DIR', 'tmp')
+
+    FRAME_STRIDE = int(get_env('FRAME_STRIDE', '5'))
+    DECODE_QUEUE_SIZE = int(get_env('DECODE_QUEUE_SIZE', '32'))
+
+    IOU_THRESHOLD = float(get_env('IOU_THRESHOLD', '0.3'))
+    LANDMARK_TOLERANCE = float(get_env('LANDMARK_TOLERANCE', '0.2'))
+    MAX_MISSED_FRAMES = int(get_env('MAX_MISSED_FRAMES', '3'))
+    QUALITY_GAIN = float(get_env('QUALITY_GAIN', '1.25'))
+
+    LOGGING_LEVEL_NAME = ENV_MAIN.LOGGING_LEVEL_NAME
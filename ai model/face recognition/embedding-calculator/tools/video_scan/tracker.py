@@ -0,0 +1,161 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+from typing import List, Optional
+
+import attr
+import numpy as np
+
+from src.services.dto.bounding_box import BoundingBoxDTO
+from src.services.imgtools.types import Array1D
+
+
+def box_quality(box: BoundingBoxDTO) -> float:
+    """
+    Bigger and more confident faces give better embeddings.
+    >>> box_quality(BoundingBoxDTO(0, 0, 40, 20, 0.5))
+    10.0
+    """
+    return box.probability * min(box.width, box.height)
+
+
+def landmarks_distance(box: BoundingBoxDTO, other: BoundingBoxDTO) -> Optional[float]:
+    """
+    Mean distance between corresponding landmarks relative to the box width.
+    >>> landmarks_distance(BoundingBoxDTO(0, 0, 10, 10, 1, np_landmarks=np.array([[2, 2], [8, 2]])),\
+                           BoundingBoxDTO(1, 0, 11, 10, 1, np_landmarks=np.array([[3, 2], [9, 2]])))
+    0.1
+    >>> landmarks_distance(BoundingBoxDTO(0, 0, 10, 10, 1), BoundingBoxDTO(0, 0, 10, 10, 1)) is None
+    True
+    """
+    landmarks, other_landmarks = box._np_landmarks, other._np_landmarks
+    if not len(landmarks) or landmarks.shape != other_landmarks.shape:
+        return None
+    distance = np.linalg.norm(np.asarray(landmarks, dtype=float) - other_landmarks, axis=1).mean()
+    return float(distance / max(box.width, 1))
+
+
+@attr.s(auto_attribs=True)
+class Track:
+    track_id: int
+    box: BoundingBoxDTO
+    first_frame: int
+    last_frame: int
+    best_box: BoundingBoxDTO
+    best_frame: int
+    missed_frames: int = 0
+    embedding: Optional[Array1D] = None
+    embedding_frame: Optional[int] = None
+    embedded_quality: float = 0.
+
+    @property
+    def best_quality(self) -> float:
+        return box_quality(self.best_box)
+
+    def update(self, frame_idx: int, box: BoundingBoxDTO):
+        self.box = box
+        self.last_frame = frame_idx
+        self.missed_frames = 0
+        if box_quality(box) > self.best_quality:
+            self.best_box = box
+            self.best_frame = frame_idx
+
+    def needs_embedding(self, frame_idx: int, quality_gain: float) -> bool:
+        if self.best_frame != frame_idx:
+            return False
+        return self.embedding is None or self.best_quality >= self.embedded_quality * quality_gain
+
+    def set_embedding(self, embedding: Array1D):
+        self.embedding = embedding
+        self.embedding_frame = self.best_frame
+        self.embedded_quality = self.best_quality
+
+
+class IouTracker:
+    """
+    Greedily matches boxes of consecutive frames by IoU, falling back to landmarks for fast-moving faces.
+    >>> tracker = IouTracker(iou_threshold=0.3, landmark_tolerance=0.2, max_missed_frames=1, quality_gain=1.25)
+    >>> [t.track_id for t in tracker.update(0, [BoundingBoxDTO(0, 0, 100, 100, 0.9)])]
+    [0]
+    >>> tracker.tracks[0].set_embedding(np.zeros(1))
+    >>> [t.track_id for t in tracker.update(1, [BoundingBoxDTO(5, 5, 105, 105, 0.95)])]
+    []
+    >>> [t.track_id for t in tracker.update(2, [BoundingBoxDTO(5, 5, 155, 155, 0.95)])]
+    [0]
+    >>> tracker.update(3, []), tracker.pop_finished()
+    ([], [])
+    >>> tracker.update(4, []), [t.track_id for t in tracker.pop_finished()]
+    ([], [0])
+    """
+
+    def __init__(self, iou_threshold: float, landmark_tolerance: float,
+                 max_missed_frames: int, quality_gain: float):
+        self._iou_threshold = iou_threshold
+        self._landmark_tolerance = landmark_tolerance
+        self._max_missed_frames = max_missed_frames
+        self._quality_gain = quality_gain
+        self._next_track_id = 0
+        self.tracks: List[Track] = []
+        self._finished: List[Track] = []
+
+    def _match_score(self, track: Track, box: BoundingBoxDTO) -> float:
+        iou = track.box.iou(box)
+        if iou >= self._iou_threshold:
+            return iou
+        distance = landmarks_distance(track.box, box)
+        if distance is not None and distance <= self._landmark_tolerance:
+            # ranked below any IoU match
+            return self._iou_threshold * (1 - distance / self._landmark_tolerance)
+        return 0.
+
+    def update(self, frame_idx: int, boxes: List[BoundingBoxDTO]) -> List[Track]:
+        """ Returns tracks whose embedding should be calculated from the given frame """
+        candidates = sorted(((self._match_score(track, box), track_idx, box_idx)
+                             for track_idx, track in enumerate(self.tracks)
+                             for box_idx, box in enumerate(boxes)), reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        for score, track_idx, box_idx in candidates:
+            if score <= 0:
+                break
+            if track_idx in matched_tracks or box_idx in matched_boxes:
+                continue
+            self.tracks[track_idx].update(frame_idx, boxes[box_idx])
+            matched_tracks.add(track_idx)
+            matched_boxes.add(box_idx)
+
+        active_tracks = []
+        for track_idx, track in enumerate(self.tracks):
+            if track_idx not in matched_tracks:
+                track.missed_frames += 1
+            if track.missed_frames > self._max_missed_frames:
+                self._finished.append(track)
+            else:
+                active_tracks.append(track)
+        for box_idx, box in enumerate(boxes):
+            if box_idx not in matched_boxes:
+                active_tracks.append(Track(track_id=self._next_track_id, box=box,
+                                           first_frame=frame_idx, last_frame=frame_idx,
+                                           best_box=box, best_frame=frame_idx))
+                self._next_track_id += 1
+        self.tracks = active_tracks
+        return [t for t in self.tracks if t.needs_embedding(frame_idx, self._quality_gain)]
+
+    def pop_finished(self) -> List[Track]:
+        finished, self._finished = self._finished, []
+        return finished
+
+    def finish(self) -> List[Track]:
+        self._finished.extend(self.tracks)
+        self.tracks = []
+        return self.pop_finished()
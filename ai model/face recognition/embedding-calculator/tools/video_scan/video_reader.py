@@ -0,0 +1,94 @@
+#  Copyright (c) 2020 the original author or authors
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#       https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+#  or implied. See the License for the specific language governing
+#  permissions and limitations under the License.
+
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Iterator, Tuple, Union
+
+import cv2
+
+from src.services.imgtools.types import Array3D
+
+logger = logging.getLogger(__name__)
+_END_OF_VIDEO = object()
+
+
+class VideoReader:
+    """
+    Decodes a local video file in a background thread, so that decoding overlaps with inference.
+    Only every `frame_stride`-th frame is decoded, the rest are grabbed without decoding.
+    """
+
+    def __init__(self, path: Union[Path, str], frame_stride: int = 1, queue_size: int = 32):
+        assert frame_stride >= 1
+        self._path = str(path)
+        self._frame_stride = frame_stride
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._stopped = threading.Event()
+        self._error = None
+
+        capture = cv2.VideoCapture(self._path)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video '{self._path}'")
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+
+    def __iter__(self) -> Iterator[Tuple[int, Array3D]]:
+        thread = threading.Thread(target=self._decode, name=f'decode-{Path(self._path).name}', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = self._frames.get()
+                if item is _END_OF_VIDEO:
+                    break
+                yield item
+        finally:
+            self._stopped.set()
+            thread.join()
+        if self._error:
+            raise self._error
+
+    def _put(self, item) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self):
+        capture = cv2.VideoCapture(self._path)
+        try:
+            frame_idx = 0
+            while not self._stopped.is_set():
+                if frame_idx % self._frame_stride:
+                    if not capture.grab():
+                        break
+                else:
+                    success, frame = capture.read()
+                    if not success:
+                        break
+                    if not self._put((frame_idx, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))):
+                        break
+                frame_idx += 1
+        except Exception as e:
+            logger.exception(f"Failed to decode '{self._path}'")
+            self._error = e
+        finally:
+            capture.release()
+            self._put(_END_OF_VIDEO)